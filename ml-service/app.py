@@ -1,171 +1,278 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import joblib
 import numpy as np
 import os
+import traceback
+from collections import namedtuple
+from batch_engine import encode_students, predict_from_proba, render_results, predictions_body, DECISION_THRESHOLD
+from batch_engine import NUMERIC_ERROR, is_number, request_students
+from batch_engine import read_ndjson, chunked, to_ndjson, dumps
+from micro_batcher import MicroBatcher, MICROBATCH_ENABLED
+from job_queue import JobQueue, add_job_routes
+from hot_reload import ModelReloader, WARMUP_STUDENT, add_reload_routes, group_by_snapshot
+from prediction_cache import PredictionCache
+from service_utils import limit_threads
+from recommendations import adaptive_questioning
+from metrics import instrument_app, set_model_info, stage
+from talent_pipeline import file_checksum
+from tree_compiler import CompiledForest, load_or_compile
 
 app = Flask(__name__)
 CORS(app)
+instrument_app(app)
 
 # Load model and encoder
 MODEL_PATH = "stem_talent_model.pkl"
 ENCODER_PATH = "label_encoder.pkl"
+COMPILED_MODEL_PATH = "stem_talent_model.npz"
 
+# Score with the NumPy-compiled trees (see tree_compiler.py) instead of XGBoost
+COMPILED_PREDICTOR = os.environ.get('ML_COMPILED_PREDICTOR', 'true').lower() == 'true'
+
+# Records scored per chunk by /batch-predict/stream
+STREAM_CHUNK_SIZE = int(os.environ.get('ML_STREAM_CHUNK_SIZE', 1000))
+
+# Everything one model version needs, swapped as a whole on reload (see hot_reload.py)
+LoadedModel = namedtuple('LoadedModel', ['model', 'label_encoder', 'version'])
+
+active = None  # the LoadedModel being served; requests read it once
+# active's fields, for tools that use the model directly (bulk_score.py, benchmark.py)
 model = None
 label_encoder = None
+model_version = None
+
+# Scored students per model version, invalidated when a reload installs a new one;
+# compiled and XGBoost workers differ in the last float bits, so they don't share entries
+prediction_cache = PredictionCache('baseline', variant='compiled' if COMPILED_PREDICTOR else 'xgboost')
+
+def model_available():
+    """Whether the artifacts build_model loads are on disk, without loading them"""
+    return os.path.exists(MODEL_PATH) and os.path.exists(ENCODER_PATH)
+
+def build_model(previous=None):
+    """Load a LoadedModel from the artifacts on disk, without serving it"""
+    if not model_available():
+        raise FileNotFoundError("Model not found. Please train the model first.")
+    version = file_checksum(MODEL_PATH)
+    if COMPILED_PREDICTOR:
+        # Reuses the compiled arrays of this model version, so XGBoost is not even imported
+        predictor = load_or_compile(MODEL_PATH, COMPILED_MODEL_PATH, version)
+    else:
+        predictor = joblib.load(MODEL_PATH)
+    # Built after fork on reload, so the worker's thread limit must be applied here too
+    return LoadedModel(limit_threads(predictor), joblib.load(ENCODER_PATH), version)
+
+def warm_up(loaded):
+    """Score WARMUP_STUDENT with a new LoadedModel, raising if it can't"""
+    features, _, errors = encode_students([WARMUP_STUDENT], loaded.label_encoder)
+    if errors:
+        raise ValueError(f"Warm-up student rejected: {errors[0]}")
+    probabilities = loaded.model.predict_proba(features)
+    if probabilities.shape != (1, 2) or not np.all((probabilities >= 0) & (probabilities <= 1)):
+        raise ValueError(f"Invalid warm-up prediction {probabilities}")
+
+def install(loaded):
+    global active, model, label_encoder, model_version
+    active = loaded
+    model, label_encoder, model_version = loaded
+    prediction_cache.invalidate(loaded.version)
+    set_model_info("baseline", loaded.version)
+
+reloader = ModelReloader('baseline', build_model, warm_up, install, [MODEL_PATH, ENCODER_PATH])
 
 def load_model():
-    global model, label_encoder
-    if os.path.exists(MODEL_PATH) and os.path.exists(ENCODER_PATH):
-        model = joblib.load(MODEL_PATH)
-        label_encoder = joblib.load(ENCODER_PATH)
+    try:
+        reloader.reload('startup')
         print("Model loaded successfully!")
-    else:
-        print("Model not found. Please train the model first.")
-
-def adaptive_questioning(proba, threshold=0.6):
-    """Provide adaptive recommendations based on STEM potential probability"""
-    if 0.4 < proba < threshold:
-        return {
-            "recommendation": "intermediate",
-            "message": "Ask more about recent projects or favorite STEM subjects.",
-            "next_steps": [
-                "Explore recent STEM projects",
-                "Identify favorite STEM subjects",
-                "Assess hands-on experience"
-            ]
-        }
-    elif proba >= threshold:
-        return {
-            "recommendation": "advanced",
-            "message": "Recommend advanced STEM pathway and mentorship.",
-            "next_steps": [
-                "Connect with STEM mentors",
-                "Enroll in advanced courses",
-                "Participate in competitions",
-                "Join research programs"
-            ]
-        }
-    else:
-        return {
-            "recommendation": "beginner",
-            "message": "Suggest exposure to beginner STEM experiences.",
-            "next_steps": [
-                "Introduce foundational STEM concepts",
-                "Provide hands-on activities",
-                "Build interest through games",
-                "Connect with supportive community"
-            ]
-        }
+    except FileNotFoundError as e:
+        print(e)
+
+def predict_proba(predictor, features):
+    with stage('xgboost', rows=len(features)):
+        return predictor.predict_proba(features)
+
+def score_rows(rows):
+    """Score (LoadedModel, encoded features) pairs, one predict_proba call per model version"""
+    results = [None] * len(rows)
+    for loaded, indices in group_by_snapshot(rows):
+        probabilities = predict_proba(loaded.model, np.vstack([rows[i][1] for i in indices]))
+        for i, prediction, proba in zip(indices, predict_from_proba(probabilities), probabilities[:, 1]):
+            results[i] = (prediction, proba)
+    return results
+
+
+batcher = MicroBatcher(score_rows)
+
 
 @app.route('/health', methods=['GET'])
 def health():
+    current = active
     return jsonify({
         "status": "healthy",
-        "model_loaded": model is not None
+        "model_loaded": current is not None,
+        "model_version": current.version if current else None,
+        "compiled_predictor": isinstance(current.model, CompiledForest) if current else False,
+        "reload": reloader.stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "micro_batcher": batcher.stats() if MICROBATCH_ENABLED else None,
+        "jobs": jobs.stats()
     })
 
+def predict_student(data):
+    """
+    Validate and score one student dict.
+
+    Returns:
+        (response body dict, HTTP status)
+    """
+    # One model version for the whole request, even if a reload lands meanwhile
+    current = active
+    if current is None:
+        return {"error": "Model not loaded"}, 503
+
+    # Extract features
+    math_score = data.get('math_score')
+    science_score = data.get('science_score')
+    project_score = data.get('project_score')
+    gender = data.get('gender')
+    socioeconomic_index = data.get('socioeconomic_index')
+
+    # Validate inputs
+    if None in [math_score, science_score, project_score, gender, socioeconomic_index]:
+        return {"error": "Missing required fields"}, 400
+
+    # Encode gender
+    try:
+        with stage('encode_gender'):
+            gender_encoded = current.label_encoder.transform([gender])[0]
+    except:
+        return {"error": f"Invalid gender value. Must be one of: {list(current.label_encoder.classes_)}"}, 400
+    if not all(is_number(value) for value in [math_score, science_score, project_score, socioeconomic_index]):
+        return {"error": NUMERIC_ERROR}, 400
+
+    # Prepare input, as scored and cached
+    student_input = prediction_cache.quantize(np.array([
+        math_score,
+        science_score,
+        project_score,
+        gender_encoded,
+        socioeconomic_index
+    ], dtype=np.float32))
+
+    proba = prediction_cache.lookup(current.version, student_input[None])[0]
+    if np.isnan(proba):
+        # Make prediction, batched with concurrent requests when enabled
+        if MICROBATCH_ENABLED:
+            prediction, proba = batcher.submit((current, student_input))
+        else:
+            prediction, proba = score_rows([(current, student_input)])[0]
+        prediction_cache.store(current.version, student_input[None], [proba])
+    else:
+        prediction = proba > DECISION_THRESHOLD
+
+    # Get adaptive recommendations
+    recommendation = adaptive_questioning(proba)
+
+    return {
+        "stem_potential": int(prediction),
+        "confidence": float(proba),
+        "recommendation": recommendation
+    }, 200
+
 @app.route('/predict', methods=['POST'])
 def predict():
-    if model is None:
+    if active is None:
         return jsonify({"error": "Model not loaded"}), 500
 
     try:
-        data = request.get_json()
-
-        # Extract features
-        math_score = data.get('math_score')
-        science_score = data.get('science_score')
-        project_score = data.get('project_score')
-        gender = data.get('gender')
-        socioeconomic_index = data.get('socioeconomic_index')
+        with stage('parse_json'):
+            data = request.get_json()
 
-        # Validate inputs
-        if None in [math_score, science_score, project_score, gender, socioeconomic_index]:
-            return jsonify({"error": "Missing required fields"}), 400
+        body, status = predict_student(data)
 
-        # Encode gender
-        try:
-            gender_encoded = label_encoder.transform([gender])[0]
-        except:
-            return jsonify({"error": f"Invalid gender value. Must be one of: {list(label_encoder.classes_)}"}), 400
-
-        # Prepare input
-        student_input = np.array([[
-            math_score,
-            science_score,
-            project_score,
-            gender_encoded,
-            socioeconomic_index
-        ]])
-
-        # Make prediction
-        prediction = model.predict(student_input)[0]
-        proba = model.predict_proba(student_input)[0][1]
-
-        # Get adaptive recommendations
-        recommendation = adaptive_questioning(proba)
-
-        return jsonify({
-            "stem_potential": int(prediction),
-            "confidence": float(proba),
-            "recommendation": recommendation
-        })
+        with stage('serialize'):
+            return jsonify(body), status
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def score_students(students):
+    """
+    Validate, encode and score a list of student dicts in one model call.
+
+    Returns:
+        One serialized JSON result per student (see batch_engine.render_results)
+    """
+    current = active
+
+    # Validate and encode every row up front, then score the cohort in one call
+    with stage('validate_encode', rows=len(students)):
+        features, valid_idx, errors = encode_students(students, current.label_encoder)
+
+    if len(valid_idx):
+        # Only students not already cached for this model version reach the model
+        probabilities = prediction_cache.predict_proba(
+            current.version, prediction_cache.quantize(features), lambda rows: predict_proba(current.model, rows)
+        )
+        predictions = predict_from_proba(probabilities)
+    else:
+        probabilities = predictions = np.empty((0, 2))
+
+    with stage('serialize', rows=len(students)):
+        return render_results(students, valid_idx, errors, predictions, probabilities)
+
 @app.route('/batch-predict', methods=['POST'])
 def batch_predict():
-    if model is None:
+    if active is None:
         return jsonify({"error": "Model not loaded"}), 500
 
     try:
-        data = request.get_json()
-        students = data.get('students', [])
-
-        if not students:
-            return jsonify({"error": "No students provided"}), 400
-
-        results = []
-        for student in students:
-            math_score = student.get('math_score')
-            science_score = student.get('science_score')
-            project_score = student.get('project_score')
-            gender = student.get('gender')
-            socioeconomic_index = student.get('socioeconomic_index')
-
-            try:
-                gender_encoded = label_encoder.transform([gender])[0]
-                student_input = np.array([[
-                    math_score,
-                    science_score,
-                    project_score,
-                    gender_encoded,
-                    socioeconomic_index
-                ]])
-
-                prediction = model.predict(student_input)[0]
-                proba = model.predict_proba(student_input)[0][1]
-                recommendation = adaptive_questioning(proba)
-
-                results.append({
-                    "student_id": student.get('id'),
-                    "stem_potential": int(prediction),
-                    "confidence": float(proba),
-                    "recommendation": recommendation
-                })
-            except Exception as e:
-                results.append({
-                    "student_id": student.get('id'),
-                    "error": str(e)
-                })
-
-        return jsonify({"predictions": results})
+        with stage('parse_json'):
+            data = request.get_json()
+        try:
+            students = request_students(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Rows are already serialized; splice them into the response body
+        rows = score_students(students)
+        return Response(predictions_body(rows), mimetype='application/json')
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/batch-predict/stream', methods=['POST'])
+def batch_predict_stream():
+    """
+    Score a newline-delimited JSON body of student records, one per line.
+
+    Records are read and scored STREAM_CHUNK_SIZE at a time, and each chunk's
+    results are written back as NDJSON lines (in input order) before the
+    next chunk is read, so memory stays flat for any cohort size.
+    """
+    if active is None:
+        return jsonify({"error": "Model not loaded"}), 500
+
+    def generate():
+        try:
+            for students in chunked(read_ndjson(request.stream), STREAM_CHUNK_SIZE):
+                yield to_ndjson(score_students(students))
+        except Exception as e:
+            # Headers are already sent, so report the failure as a final line
+            traceback.print_exc()
+            yield dumps({"error": str(e)}) + b'\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# Large cohorts submitted as background jobs, scored in chunks by score_students
+jobs = JobQueue(score_students)
+add_job_routes(app, jobs, lambda: active is not None)
+
+# POST /admin/reload, and artifact watching with ML_RELOAD_WATCH
+add_reload_routes(app, {'baseline': reloader})
+
 if __name__ == '__main__':
     load_model()
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    # Local development only; production runs through gunicorn (start.sh)
+    app.run(host='0.0.0.0', port=5001, debug=os.environ.get('ML_DEBUG', 'false').lower() == 'true')
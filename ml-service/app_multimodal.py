@@ -1,236 +1,493 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import joblib
 import numpy as np
 import os
-from multimodal_model import MultiModalTalentModel
+import threading
+import time
+import traceback
+from collections import namedtuple
+from talent_pipeline import ENCODE_BATCH_SIZE, BUNDLE_PATH, EXPORT_DIR
+from batch_engine import encode_students, predict_from_proba, render_results, predictions_body, DECISION_THRESHOLD
+from batch_engine import NUMERIC_ERROR, is_number, request_students
+from batch_engine import read_ndjson, chunked, to_ndjson, dumps
+from micro_batcher import MicroBatcher, MICROBATCH_ENABLED
+from job_queue import JobQueue, add_job_routes
+from hot_reload import ModelReloader, WARMUP_STUDENT, add_reload_routes, group_by_snapshot
+from prediction_cache import PredictionCache
+from service_utils import limit_threads
+from recommendations import adaptive_questioning
+from text_features import description_codes
+from behavior_features import activity_sequences, event_steps
+from metrics import instrument_app, set_model_info, stage
 
 app = Flask(__name__)
 CORS(app)
+instrument_app(app)
 
 # Load model and encoder
 MULTIMODAL_MODEL_PATH = "multimodal_stem_model.pkl"
 ENCODER_PATH = "label_encoder.pkl"
 CONFIG_PATH = "model_config.pkl"
 
+# Encoder runtime: "torch" (eager, from the bundle) or "onnx" (exported encoders, no torch needed)
+INFERENCE_BACKEND = os.environ.get('ML_INFERENCE_BACKEND', 'torch')
+
+# Dynamic int8 quantization of the text transformer (torch backend only, see quantize_report.py)
+QUANTIZE_TEXT = os.environ.get('ML_QUANTIZE_TEXT', 'false').lower() == 'true'
+
+# Rows per encoder forward pass in /batch-predict
+BATCH_SIZE = int(os.environ.get('ML_BATCH_SIZE', ENCODE_BATCH_SIZE))
+
+# Records scored per chunk by /batch-predict/stream
+STREAM_CHUNK_SIZE = int(os.environ.get('ML_STREAM_CHUNK_SIZE', 1000))
+
+# Embed every description at startup rather than on the first request
+# (ML_PREWARM_TEXT_CACHE is the deprecated name of this setting)
+PREWARM_DESCRIPTIONS = os.environ.get(
+    'ML_PREWARM_DESCRIPTIONS', os.environ.get('ML_PREWARM_TEXT_CACHE', 'true')
+).lower() == 'true'
+if 'ML_TEXT_CACHE_SIZE' in os.environ:
+    print("⚠️  ML_TEXT_CACHE_SIZE has no effect: descriptions are served from the description table.")
+
+# Load the model on a background thread so /health answers with "warming" meanwhile
+FAST_START = os.environ.get('ML_FAST_START', 'false').lower() == 'true'
+
+# Everything one model version needs, swapped as a whole on reload (see hot_reload.py)
+LoadedModel = namedtuple('LoadedModel', ['model', 'label_encoder', 'config', 'version', 'timings'])
+
+active = None  # the LoadedModel being served; requests read it once
+# active's fields, for tools that use the model directly (bulk_score.py, wsgi.py)
 multimodal_model = None
 label_encoder = None
 model_config = None
+model_checksum = None
+model_state = "not_loaded"  # not_loaded -> warming -> ready | failed
+startup_timings = {}
+
+# Scored students per model version, keyed on the numeric features plus the
+# description code; invalidated when a reload installs a new version. Backends
+# and the int8 text model score differently, so each keeps its own entries.
+prediction_cache = PredictionCache(
+    'multimodal', variant=INFERENCE_BACKEND + ('-int8' if QUANTIZE_TEXT and INFERENCE_BACKEND == 'torch' else '')
+)
+
+
+def model_available():
+    """Whether the artifacts build_model loads for INFERENCE_BACKEND are on disk, without loading them"""
+    if INFERENCE_BACKEND == 'onnx':
+        return os.path.isdir(EXPORT_DIR)
+    return os.path.exists(BUNDLE_PATH) or (os.path.exists(MULTIMODAL_MODEL_PATH) and os.path.exists(ENCODER_PATH))
+
+
+def build_model(previous=None):
+    """
+    Load a LoadedModel from the artifacts on disk, without serving it.
+
+    The torch backend reuses previous's text transformer (MiniLM never
+    changes between bundles), so a reload only restores the small encoders
+    and XGBoost.
+    """
+    timings = {}
+    start = time.perf_counter()
+    text_encoder = getattr(previous.model, 'text_encoder', None) if previous else None
+
+    if INFERENCE_BACKEND == 'onnx':
+        # Imported here so the torch backend never loads onnxruntime and vice versa
+        from onnx_backend import OnnxTalentModel
+        model, encoder, config, checksum = OnnxTalentModel.load_export(EXPORT_DIR)
+    elif os.path.exists(BUNDLE_PATH):
+        # Restore projector/encoder weights, XGBoost, encoder and config together
+        from multimodal_model import MultiModalTalentModel
+        model, encoder, config, checksum = MultiModalTalentModel.load_bundle(
+            BUNDLE_PATH, quantize_text=QUANTIZE_TEXT, text_encoder=text_encoder
+        )
+    elif os.path.exists(MULTIMODAL_MODEL_PATH) and os.path.exists(ENCODER_PATH):
+        # Legacy artifacts: projector/encoder weights were not saved
+        print("⚠️  No model bundle found, numeric projector weights will not match training.")
+        from multimodal_model import MultiModalTalentModel
+        model = MultiModalTalentModel(quantize_text=QUANTIZE_TEXT, text_encoder=text_encoder)
+        xgb_model = joblib.load(MULTIMODAL_MODEL_PATH)
+        model.set_xgb_model(xgb_model)
+
+        # Load encoder and config
+        encoder = joblib.load(ENCODER_PATH)
+        config = joblib.load(CONFIG_PATH) if os.path.exists(CONFIG_PATH) else {}
+        checksum = None
+    else:
+        raise FileNotFoundError("❌ Model not found. Please train the model first.")
+
+    # Built after fork on reload, so the worker's thread limit must be applied here too
+    limit_threads(model.xgb_model)
+    timings.update(model.load_timings)
+    timings['load_artifacts'] = time.perf_counter() - start
+
+    if PREWARM_DESCRIPTIONS:
+        phase_start = time.perf_counter()
+        model.description_table()
+        timings['description_table'] = time.perf_counter() - phase_start
+
+    timings['total'] = time.perf_counter() - start
+    timings = {phase: round(seconds, 3) for phase, seconds in timings.items()}
+    return LoadedModel(model, encoder, config, checksum, timings)
+
+
+def warm_up(loaded):
+    """Score WARMUP_STUDENT with a new LoadedModel, raising if it can't"""
+    numeric_input, _, errors = encode_students([WARMUP_STUDENT], loaded.label_encoder)
+    if errors:
+        raise ValueError(f"Warm-up student rejected: {errors[0]}")
+    codes = description_codes(
+        WARMUP_STUDENT['math_score'], WARMUP_STUDENT['science_score'], WARMUP_STUDENT['project_score']
+    )
+    # One login event, so models trained with activity run their GRU too
+    beh_data = [event_steps([{'eventType': 'user.login', 'createdAt': 0}])] if loaded.model.use_behavior else None
+    _, probabilities = loaded.model.predict_batch(
+        np.atleast_1d(codes), numeric_input, beh_data, batch_size=BATCH_SIZE
+    )
+    if probabilities.shape != (1, 2) or not np.all((probabilities >= 0) & (probabilities <= 1)):
+        raise ValueError(f"Invalid warm-up prediction {probabilities}")
+
+
+def install(loaded):
+    global active, multimodal_model, label_encoder, model_config, model_checksum, model_state, startup_timings
+    active = loaded
+    multimodal_model, label_encoder, model_config, model_checksum, startup_timings = loaded
+    model_state = "ready"
+    prediction_cache.invalidate(loaded.version)
+    set_model_info("multimodal", loaded.version)
+
+
+# Watches the artifacts of the configured backend
+reloader = ModelReloader(
+    'multimodal', build_model, warm_up, install,
+    [EXPORT_DIR] if INFERENCE_BACKEND == 'onnx' else [BUNDLE_PATH, MULTIMODAL_MODEL_PATH, ENCODER_PATH, CONFIG_PATH]
+)
 
 
 def load_model():
-    global multimodal_model, label_encoder, model_config
-    if os.path.exists(MULTIMODAL_MODEL_PATH) and os.path.exists(ENCODER_PATH):
-        # Load multimodal model
-        multimodal_model = MultiModalTalentModel()
-        xgb_model = joblib.load(MULTIMODAL_MODEL_PATH)
-        multimodal_model.set_xgb_model(xgb_model)
+    global model_state
+    model_state = "warming"
+    try:
+        reloader.reload('startup')
+    except FileNotFoundError as e:
+        model_state = "not_loaded"
+        print(e)
+        return
+    except Exception:
+        model_state = "failed"
+        traceback.print_exc()
+        raise
 
-        # Load encoder and config
-        label_encoder = joblib.load(ENCODER_PATH)
-        model_config = joblib.load(CONFIG_PATH) if os.path.exists(CONFIG_PATH) else {}
+    print("✅ Multimodal model loaded successfully!")
+    print(f"   Model accuracy: {model_config.get('accuracy', 'N/A')}")
+    print(f"   Fused embedding dimension: {model_config.get('fused_dim', 'N/A')}")
+    print(f"   Model checksum: {model_checksum or 'N/A'}")
+    print(f"   Startup timings (s): {startup_timings}")
 
-        print("✅ Multimodal model loaded successfully!")
-        print(f"   Model accuracy: {model_config.get('accuracy', 'N/A')}")
-        print(f"   Fused embedding dimension: {model_config.get('fused_dim', 'N/A')}")
-    else:
-        print("❌ Model not found. Please train the model first.")
 
+def start_background_load():
+    """Run load_model on a daemon thread and return immediately"""
+    global model_state
+    model_state = "warming"
+    thread = threading.Thread(target=load_model, name="model-loader", daemon=True)
+    thread.start()
+    return thread
 
-def generate_text_description(math_score, science_score, project_score):
-    """Generate a text description based on student scores"""
-    desc_parts = []
 
-    # Math ability
-    if math_score > 80:
-        desc_parts.append("strong mathematical skills")
-    elif math_score > 60:
-        desc_parts.append("moderate math proficiency")
-    else:
-        desc_parts.append("developing math abilities")
+def score_rows(rows):
+    """
+    Score (LoadedModel, description code, encoded features, activity steps)
+    items through the batched model path, one call per model version
+    """
+    results = [None] * len(rows)
+    for loaded, indices in group_by_snapshot(rows):
+        codes = np.array([rows[i][1] for i in indices])
+        beh_data = [rows[i][3] for i in indices] if loaded.model.use_behavior else None
+        predictions, probabilities = loaded.model.predict_batch(
+            codes, np.vstack([rows[i][2] for i in indices]), beh_data, batch_size=BATCH_SIZE
+        )
+        for i, prediction, proba in zip(indices, predictions, probabilities[:, 1]):
+            results[i] = (prediction, proba)
+    return results
 
-    # Science interest
-    if science_score > 80:
-        desc_parts.append("excellent scientific understanding")
-    elif science_score > 60:
-        desc_parts.append("good science foundation")
-    else:
-        desc_parts.append("emerging science interest")
 
-    # Project work
-    if project_score > 80:
-        desc_parts.append("outstanding project execution")
-    elif project_score > 60:
-        desc_parts.append("solid hands-on experience")
-    else:
-        desc_parts.append("growing practical skills")
-
-    return f"Student with {', '.join(desc_parts)}"
-
-
-def adaptive_questioning(proba, threshold=0.6):
-    """Provide adaptive recommendations based on STEM potential probability"""
-    if 0.4 < proba < threshold:
-        return {
-            "recommendation": "intermediate",
-            "message": "Ask more about recent projects or favorite STEM subjects.",
-            "next_steps": [
-                "Explore recent STEM projects",
-                "Identify favorite STEM subjects",
-                "Assess hands-on experience"
-            ]
-        }
-    elif proba >= threshold:
-        return {
-            "recommendation": "advanced",
-            "message": "Recommend advanced STEM pathway and mentorship.",
-            "next_steps": [
-                "Connect with STEM mentors",
-                "Enroll in advanced courses",
-                "Participate in competitions",
-                "Join research programs"
-            ]
-        }
-    else:
-        return {
-            "recommendation": "beginner",
-            "message": "Suggest exposure to beginner STEM experiences.",
-            "next_steps": [
-                "Introduce foundational STEM concepts",
-                "Provide hands-on activities",
-                "Build interest through games",
-                "Connect with supportive community"
-            ]
-        }
+batcher = MicroBatcher(score_rows, name='predict_multimodal')
 
 
 @app.route('/health', methods=['GET'])
 def health():
+    if model_state == "warming":
+        status = "warming"
+    elif model_state == "failed":
+        status = "unhealthy"
+    else:
+        status = "healthy"
+
+    current = active
     return jsonify({
-        "status": "healthy",
-        "model_loaded": multimodal_model is not None,
+        "status": status,
+        "model_loaded": current is not None,
+        "model_state": model_state,
+        "startup_timings": current.timings if current else {},
         "model_type": "multimodal",
-        "accuracy": model_config.get('accuracy') if model_config else None,
-        "embedding_dim": model_config.get('fused_dim') if model_config else None
+        "inference_backend": INFERENCE_BACKEND,
+        "uses_activity": current.model.use_behavior if current else None,
+        "text_quantized": QUANTIZE_TEXT and INFERENCE_BACKEND == 'torch',
+        "accuracy": current.config.get('accuracy') if current else None,
+        "embedding_dim": current.config.get('fused_dim') if current else None,
+        "model_checksum": current.version if current else None,
+        "reload": reloader.stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "description_table": current.model.description_table_stats() if current else None,
+        "micro_batcher": batcher.stats() if MICROBATCH_ENABLED else None,
+        "jobs": jobs.stats()
     })
 
 
+def predict_student(data):
+    """
+    Validate and score one student dict.
+
+    Returns:
+        (response body dict, HTTP status)
+    """
+    # One model version for the whole request, even if a reload lands meanwhile
+    current = active
+    if current is None:
+        return {"error": "Model not loaded"}, 503
+
+    # Extract features
+    math_score = data.get('math_score')
+    science_score = data.get('science_score')
+    project_score = data.get('project_score')
+    gender = data.get('gender')
+    socioeconomic_index = data.get('socioeconomic_index')
+
+    # Validate inputs
+    if None in [math_score, science_score, project_score, gender, socioeconomic_index]:
+        return {"error": "Missing required fields"}, 400
+
+    # Encode gender
+    try:
+        with stage('encode_gender'):
+            gender_encoded = current.label_encoder.transform([gender])[0]
+    except:
+        return {"error": f"Invalid gender value. Must be one of: {list(current.label_encoder.classes_)}"}, 400
+    if not all(is_number(value) for value in [math_score, science_score, project_score, socioeconomic_index]):
+        return {"error": NUMERIC_ERROR}, 400
+
+    # Prepare numeric input
+    numeric_input = np.array([
+        math_score,
+        science_score,
+        project_score,
+        gender_encoded,
+        socioeconomic_index
+    ], dtype=np.float32)
+
+    # Text feature, as an index into the description embedding table
+    with stage('text_description'):
+        text_code = int(description_codes(math_score, science_score, project_score))
+
+    # Activity log as GRU steps, for models trained with behavior sequences
+    steps = None
+    if current.model.use_behavior:
+        try:
+            steps = event_steps(data.get('activity'))
+        except ValueError as e:
+            return {"error": f"Invalid activity: {e}"}, 400
+
+    # Everything the model scores, as cached: numeric features, then the code
+    row = prediction_cache.quantize(np.append(numeric_input, text_code))[None]
+
+    # Students with logged activity are always scored, their log changes with every event
+    cacheable = steps is None or len(steps) == 0
+    proba = prediction_cache.lookup(current.version, row)[0] if cacheable else np.nan
+    if np.isnan(proba):
+        # Make prediction, batched with concurrent requests when enabled
+        item = (current, text_code, row[0, :-1], steps)
+        if MICROBATCH_ENABLED:
+            prediction, proba = batcher.submit(item)
+        else:
+            prediction, proba = score_rows([item])[0]
+        if cacheable:
+            prediction_cache.store(current.version, row, [proba])
+    else:
+        prediction = proba > DECISION_THRESHOLD
+
+    prediction = int(prediction)
+    proba = float(proba)
+
+    # Get adaptive recommendations
+    recommendation = adaptive_questioning(proba)
+
+    return {
+        "stem_potential": prediction,
+        "confidence": proba,
+        "recommendation": recommendation,
+        "model_type": "multimodal"
+    }, 200
+
+
 @app.route('/predict', methods=['POST'])
 def predict():
-    if multimodal_model is None:
+    if active is None:
+        if model_state == "warming":
+            return jsonify({"error": "Model is still loading, retry shortly"}), 503
         return jsonify({"error": "Model not loaded"}), 500
 
     try:
-        data = request.get_json()
+        with stage('parse_json'):
+            data = request.get_json()
 
-        # Extract features
-        math_score = data.get('math_score')
-        science_score = data.get('science_score')
-        project_score = data.get('project_score')
-        gender = data.get('gender')
-        socioeconomic_index = data.get('socioeconomic_index')
+        body, status = predict_student(data)
 
-        # Validate inputs
-        if None in [math_score, science_score, project_score, gender, socioeconomic_index]:
-            return jsonify({"error": "Missing required fields"}), 400
-
-        # Encode gender
-        try:
-            gender_encoded = label_encoder.transform([gender])[0]
-        except:
-            return jsonify({"error": f"Invalid gender value. Must be one of: {list(label_encoder.classes_)}"}), 400
-
-        # Prepare numeric input
-        numeric_input = np.array([[
-            math_score,
-            science_score,
-            project_score,
-            gender_encoded,
-            socioeconomic_index
-        ]])
-
-        # Generate text description
-        text_input = [generate_text_description(math_score, science_score, project_score)]
-
-        # Make prediction using multimodal model
-        predictions, probabilities = multimodal_model.predict(text_input, numeric_input)
-
-        prediction = int(predictions[0])
-        proba = float(probabilities[0][1])
-
-        # Get adaptive recommendations
-        recommendation = adaptive_questioning(proba)
-
-        return jsonify({
-            "stem_potential": prediction,
-            "confidence": proba,
-            "recommendation": recommendation,
-            "model_type": "multimodal"
-        })
+        with stage('serialize'):
+            return jsonify(body), status
 
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 
+def predict_cached_rows(model, rows, sequences=None):
+    """Class probabilities of prediction_cache rows (numeric features, then the description code)"""
+    return model.predict_batch(
+        rows[:, -1].astype(np.int64), np.ascontiguousarray(rows[:, :-1]), sequences, batch_size=BATCH_SIZE
+    )[1]
+
+
+def predict_rows(current, rows, sequences=None):
+    """
+    Class probabilities of prediction_cache rows, scoring only what isn't cached.
+
+    Students with logged activity (non-empty sequences) bypass the cache and
+    are scored with their sequences.
+    """
+    def predict_proba(rows):
+        return predict_cached_rows(current.model, rows)
+
+    if sequences is None:
+        return prediction_cache.predict_proba(current.version, rows, predict_proba)
+
+    active_idx = np.flatnonzero([len(sequence) > 0 for sequence in sequences])
+    idle = np.ones(len(rows), dtype=bool)
+    idle[active_idx] = False
+    probabilities = np.empty((len(rows), 2), dtype=np.float32)
+    if idle.any():
+        probabilities[idle] = prediction_cache.predict_proba(current.version, rows[idle], predict_proba)
+    if len(active_idx):
+        probabilities[active_idx] = predict_cached_rows(
+            current.model, rows[active_idx], [sequences[i] for i in active_idx]
+        )
+    return probabilities
+
+
+def score_students(students):
+    """
+    Validate, encode and score a list of student dicts through the batched model path.
+
+    Returns:
+        One serialized JSON result per student (see batch_engine.render_results)
+    """
+    current = active
+
+    # Validate and encode every row up front, then score the cohort in mini-batches
+    with stage('validate_encode', rows=len(students)):
+        numeric_input, valid_idx, errors = encode_students(students, current.label_encoder)
+
+    # Activity logs as GRU steps, for models trained with behavior sequences
+    sequences = None
+    if current.model.use_behavior and len(valid_idx):
+        with stage('activity_steps', rows=len(valid_idx)):
+            sequences, keep, activity_errors = activity_sequences(students, valid_idx)
+        if activity_errors:
+            errors.update(activity_errors)
+            numeric_input, valid_idx = numeric_input[keep], valid_idx[keep]
+
+    if len(valid_idx):
+        # Describe from the raw scores so float32 rounding never shifts a band edge
+        with stage('text_description', rows=len(valid_idx)):
+            scores = np.array([
+                [students[i]['math_score'], students[i]['science_score'], students[i]['project_score']]
+                for i in valid_idx
+            ], dtype=np.float64)
+            text_input = description_codes(scores[:, 0], scores[:, 1], scores[:, 2])
+        # Only students not already cached for this model version reach the model
+        probabilities = predict_rows(
+            current, prediction_cache.quantize(np.column_stack([numeric_input, text_input])), sequences
+        )
+        predictions = predict_from_proba(probabilities)
+    else:
+        predictions = probabilities = np.empty((0, 2))
+
+    with stage('serialize', rows=len(students)):
+        return render_results(students, valid_idx, errors, predictions, probabilities)
+
+
 @app.route('/batch-predict', methods=['POST'])
 def batch_predict():
-    if multimodal_model is None:
+    if active is None:
+        if model_state == "warming":
+            return jsonify({"error": "Model is still loading, retry shortly"}), 503
         return jsonify({"error": "Model not loaded"}), 500
 
     try:
-        data = request.get_json()
-        students = data.get('students', [])
-
-        if not students:
-            return jsonify({"error": "No students provided"}), 400
-
-        results = []
-        for student in students:
-            math_score = student.get('math_score')
-            science_score = student.get('science_score')
-            project_score = student.get('project_score')
-            gender = student.get('gender')
-            socioeconomic_index = student.get('socioeconomic_index')
-
-            try:
-                gender_encoded = label_encoder.transform([gender])[0]
-                numeric_input = np.array([[
-                    math_score,
-                    science_score,
-                    project_score,
-                    gender_encoded,
-                    socioeconomic_index
-                ]])
-
-                text_input = [generate_text_description(math_score, science_score, project_score)]
-
-                predictions, probabilities = multimodal_model.predict(text_input, numeric_input)
-                prediction = int(predictions[0])
-                proba = float(probabilities[0][1])
-                recommendation = adaptive_questioning(proba)
-
-                results.append({
-                    "student_id": student.get('id'),
-                    "stem_potential": prediction,
-                    "confidence": proba,
-                    "recommendation": recommendation
-                })
-            except Exception as e:
-                results.append({
-                    "student_id": student.get('id'),
-                    "error": str(e)
-                })
-
-        return jsonify({"predictions": results, "model_type": "multimodal"})
+        with stage('parse_json'):
+            data = request.get_json()
+        try:
+            students = request_students(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Rows are already serialized; splice them into the response body
+        rows = score_students(students)
+        return Response(predictions_body(rows, model_type="multimodal"), mimetype='application/json')
 
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/batch-predict/stream', methods=['POST'])
+def batch_predict_stream():
+    """
+    Score a newline-delimited JSON body of student records, one per line.
+
+    Records are read and scored STREAM_CHUNK_SIZE at a time, and each chunk's
+    results are written back as NDJSON lines (in input order) before the
+    next chunk is read, so memory stays flat for any cohort size.
+    """
+    if active is None:
+        if model_state == "warming":
+            return jsonify({"error": "Model is still loading, retry shortly"}), 503
+        return jsonify({"error": "Model not loaded"}), 500
+
+    def generate():
+        try:
+            for students in chunked(read_ndjson(request.stream), STREAM_CHUNK_SIZE):
+                yield to_ndjson(score_students(students))
+        except Exception as e:
+            # Headers are already sent, so report the failure as a final line
+            traceback.print_exc()
+            yield dumps({"error": str(e)}) + b'\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+# Large cohorts submitted as background jobs, scored in chunks by score_students
+jobs = JobQueue(score_students)
+add_job_routes(app, jobs, lambda: active is not None)
+
+# POST /admin/reload, and artifact watching with ML_RELOAD_WATCH
+add_reload_routes(app, {'multimodal': reloader})
+
+
 if __name__ == '__main__':
-    load_model()
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    if FAST_START:
+        start_background_load()
+    else:
+        load_model()
+    # Local development only; production runs through gunicorn (start.sh)
+    app.run(host='0.0.0.0', port=5001, debug=os.environ.get('ML_DEBUG', 'false').lower() == 'true')
@@ -0,0 +1,157 @@
+"""
+Baseline and multimodal models served side by side from one process.
+
+    ML_TRAFFIC_SPLIT=baseline=0.9,multimodal=0.1 python app_router.py
+    ML_SHADOW_MODEL=multimodal python app_router.py
+
+Both services (app.py, app_multimodal.py) are imported and loaded here, each
+with its own model and label encoder, and requests are routed between them by
+a ModelRegistry (see model_registry.py): by traffic share, with an optional
+shadow model scored in the background for comparison. Responses carry the
+"model_type" that produced them. In production: ML_SERVICE_APP=router.
+"""
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask_cors import CORS
+import os
+import traceback
+import app as baseline_service
+import app_multimodal as multimodal_service
+from batch_engine import predictions_body, request_students, read_ndjson, chunked, to_ndjson, dumps
+from job_queue import JobQueue, add_job_routes
+from hot_reload import add_reload_routes
+from metrics import instrument_app, stage
+from model_registry import ModelRegistry, ServedModel
+
+app = Flask(__name__)
+CORS(app)
+instrument_app(app)
+
+# Records scored per chunk by /batch-predict/stream
+STREAM_CHUNK_SIZE = int(os.environ.get('ML_STREAM_CHUNK_SIZE', 1000))
+
+# Load the multimodal model on a background thread, serving the baseline meanwhile
+FAST_START = multimodal_service.FAST_START
+
+registry = ModelRegistry()
+registry.register(ServedModel(
+    'baseline', baseline_service.predict_student, baseline_service.score_students,
+    lambda: baseline_service.active is not None, lambda: baseline_service.model_version
+))
+registry.register(ServedModel(
+    'multimodal', multimodal_service.predict_student, multimodal_service.score_students,
+    lambda: multimodal_service.active is not None, lambda: multimodal_service.model_checksum
+))
+registry.validate()
+
+
+def load_model():
+    baseline_service.load_model()
+    multimodal_service.load_model()
+
+
+def start_background_load():
+    """Load the baseline now and the multimodal model on a daemon thread"""
+    baseline_service.load_model()
+    return multimodal_service.start_background_load()
+
+
+def models_ready():
+    return any(model.is_ready() for model in registry.models.values())
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({
+        "status": "healthy" if models_ready() else "warming",
+        "registry": registry.stats(),
+        "reload": {name: reloader.stats() for name, reloader in reloaders.items()},
+        "prediction_cache": {
+            'baseline': baseline_service.prediction_cache.stats(),
+            'multimodal': multimodal_service.prediction_cache.stats()
+        },
+        "jobs": jobs.stats()
+    })
+
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    if not models_ready():
+        return jsonify({"error": "Model not loaded"}), 503
+
+    try:
+        with stage('parse_json'):
+            data = request.get_json()
+
+        body, status, model = registry.predict(data)
+
+        with stage('serialize'):
+            return jsonify({**body, "model_type": model.name}), status
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/batch-predict', methods=['POST'])
+def batch_predict():
+    if not models_ready():
+        return jsonify({"error": "Model not loaded"}), 503
+
+    try:
+        with stage('parse_json'):
+            data = request.get_json()
+        try:
+            students = request_students(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # The whole batch goes to one model; rows are already serialized
+        rows, model = registry.score_students(students)
+        return Response(predictions_body(rows, model_type=model.name), mimetype='application/json')
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/batch-predict/stream', methods=['POST'])
+def batch_predict_stream():
+    """
+    Score a newline-delimited JSON body of student records, one per line.
+
+    The stream is routed once, so every chunk is scored by the same model.
+    """
+    if not models_ready():
+        return jsonify({"error": "Model not loaded"}), 503
+
+    model = registry.route()
+
+    def generate():
+        try:
+            for students in chunked(read_ndjson(request.stream), STREAM_CHUNK_SIZE):
+                rows, _ = registry.score_students(students, model=model)
+                yield to_ndjson(rows)
+        except Exception as e:
+            # Headers are already sent, so report the failure as a final line
+            traceback.print_exc()
+            yield dumps({"error": str(e)}) + b'\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+# Background jobs are scored by the model with the largest traffic share, without shadowing
+jobs = JobQueue(lambda students: registry.score_students(students, model=registry.default, shadow=False)[0])
+add_job_routes(app, jobs, lambda: registry.default.is_ready())
+
+# POST /admin/reload[?model=baseline|multimodal] reloads each service's model in place
+reloaders = {'baseline': baseline_service.reloader, 'multimodal': multimodal_service.reloader}
+add_reload_routes(app, reloaders)
+
+
+if __name__ == '__main__':
+    if FAST_START:
+        start_background_load()
+    else:
+        load_model()
+    # Local development only; production runs through gunicorn (start.sh)
+    app.run(host='0.0.0.0', port=5001, debug=os.environ.get('ML_DEBUG', 'false').lower() == 'true')
@@ -0,0 +1,204 @@
+import json
+import math
+import numpy as np
+from recommendations import TIERS, tier_codes
+
+try:
+    import orjson
+    dumps = orjson.dumps
+except ImportError:
+    def dumps(value):
+        """Compact JSON bytes, the stdlib fallback for orjson.dumps"""
+        return json.dumps(value, separators=(',', ':')).encode()
+
+# Raw request fields, in the column order the models were trained on
+FEATURE_FIELDS = ['math_score', 'science_score', 'project_score', 'gender', 'socioeconomic_index']
+NUMERIC_FIELDS = ['math_score', 'science_score', 'project_score', 'socioeconomic_index']
+GENDER_COLUMN = 3
+NUMERIC_ERROR = f"Invalid numeric value. Fields {NUMERIC_FIELDS} must be finite numbers"
+FLOAT32_MAX = float(np.finfo(np.float32).max)  # larger scores would be inf as features
+
+# XGBClassifier.predict labels a binary row positive when P(1) > 0.5
+DECISION_THRESHOLD = 0.5
+
+# Constant JSON fragments spliced into every serialized result
+LABEL_JSON = (b'0', b'1')
+TIER_JSON = tuple(dumps(tier) for tier in TIERS)
+
+
+def is_number(value):
+    """
+    True for JSON numbers that are finite as float32 features; numeric
+    strings and booleans are rejected, not coerced, and so are NaN, infinity
+    and numbers too large for float32 (such as 10**400)
+    """
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return False
+    try:
+        return math.isfinite(value) and abs(value) <= FLOAT32_MAX
+    except OverflowError:
+        return False
+
+
+def request_students(data):
+    """
+    The students list of a batch request body.
+
+    Raises:
+        ValueError: If the body has no "students" list, or it is empty
+    """
+    students = data.get('students', []) if isinstance(data, dict) else None
+    if not isinstance(students, list):
+        raise ValueError("students must be a list of student records")
+    if not students:
+        raise ValueError("No students provided")
+    return students
+
+
+def gender_codes(label_encoder):
+    """Map each known gender to the code label_encoder.transform would return"""
+    return {gender: code for code, gender in enumerate(label_encoder.classes_)}
+
+
+def encode_students(students, label_encoder):
+    """
+    Validate and encode a list of student dicts into one feature matrix.
+
+    Args:
+        students: List of dicts with the FEATURE_FIELDS keys
+        label_encoder: Fitted LabelEncoder for the gender column
+
+    Returns:
+        (features, valid_idx, errors) where features is a contiguous float32
+        array of shape (len(valid_idx), 5) holding only the valid rows,
+        valid_idx maps each feature row back to its position in students, and
+        errors maps the position of every rejected row to its error message.
+    """
+    codes = gender_codes(label_encoder)
+    features = np.empty((len(students), len(FEATURE_FIELDS)), dtype=np.float32)
+    valid = np.zeros(len(students), dtype=bool)
+    errors = {}
+
+    for i, student in enumerate(students):
+        try:
+            values = [student.get(field) for field in FEATURE_FIELDS]
+        except AttributeError:
+            errors[i] = "Invalid student record"
+            continue
+
+        if None in values:
+            errors[i] = "Missing required fields"
+            continue
+
+        try:
+            gender_encoded = codes.get(values[GENDER_COLUMN])
+        except TypeError:
+            gender_encoded = None
+        if gender_encoded is None:
+            errors[i] = f"Invalid gender value. Must be one of: {list(label_encoder.classes_)}"
+            continue
+
+        if not all(is_number(values[column]) for column in range(len(values)) if column != GENDER_COLUMN):
+            errors[i] = NUMERIC_ERROR
+            continue
+
+        features[i] = [
+            values[0],
+            values[1],
+            values[2],
+            gender_encoded,
+            values[4]
+        ]
+        valid[i] = True
+
+    valid_idx = np.flatnonzero(valid)
+    return np.ascontiguousarray(features[valid_idx]), valid_idx, errors
+
+
+def predict_from_proba(probabilities):
+    """Derive class labels from predict_proba output without a second model call"""
+    return (probabilities[:, 1] > DECISION_THRESHOLD).astype(int)
+
+
+def render_results(students, valid_idx, errors, predictions, probabilities):
+    """
+    Serialize the per-student results of one scored cohort, in request order.
+
+    Rows that failed validation get their error at their original index;
+    scored rows get the same fields the single-row endpoints return. The
+    recommendation is spliced in from its pre-serialized tier, and all
+    confidences are encoded in a single call.
+
+    Returns:
+        List of JSON byte strings, one object per student
+    """
+    rows = [None] * len(students)
+
+    for i, message in errors.items():
+        student = students[i]
+        rows[i] = dumps({
+            "student_id": student.get('id') if isinstance(student, dict) else None,
+            "error": message
+        })
+
+    if len(valid_idx):
+        confidence = probabilities[:, 1]
+        # Floats never contain commas, so one encoded list splits cleanly per row
+        confidences = dumps(confidence.tolist())[1:-1].split(b',')
+        tiers = tier_codes(confidence).tolist()
+        labels = np.asarray(predictions).tolist()
+        for row, i in enumerate(valid_idx.tolist()):
+            rows[i] = b''.join((
+                b'{"student_id":', dumps(students[i].get('id')),
+                b',"stem_potential":', LABEL_JSON[labels[row]],
+                b',"confidence":', confidences[row],
+                b',"recommendation":', TIER_JSON[tiers[row]],
+                b'}'
+            ))
+
+    return rows
+
+
+def predictions_body(rows, **fields):
+    """JSON body {"predictions": [...rows], **fields} from render_results rows"""
+    body = b'{"predictions":[' + b','.join(rows) + b']'
+    if fields:
+        body += b',' + dumps(fields)[1:]
+    else:
+        body += b'}'
+    return body
+
+
+def read_ndjson(stream):
+    """
+    Yield one record per line of a newline-delimited JSON byte stream.
+
+    Lines are read incrementally, so the whole payload is never in memory.
+    Blank lines are skipped; lines that aren't valid JSON yield None, which
+    encode_students reports as an invalid record.
+    """
+    for line in iter(stream.readline, b''):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def chunked(records, size):
+    """Group an iterable into lists of at most size items"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def to_ndjson(rows):
+    """Join render_results rows as newline-delimited JSON"""
+    return b''.join(row + b'\n' for row in rows)
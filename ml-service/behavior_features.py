@@ -0,0 +1,183 @@
+"""
+Behavioral feature: a student's activity log as a sequence of GRU steps.
+
+Events are ActivityLog documents as the Node API stores them
+(src/models/activityLog.model.js), in any order:
+
+    {"eventType": "quiz.submitted", "createdAt": "2024-09-02T14:05:00.000Z",
+     "payload": {"score": 82, "durationSeconds": 600}}
+
+createdAt may also be epoch seconds. Each event becomes one STEP_DIM vector,
+oldest first:
+
+    [0, 24)  eventType, hashed into EVENT_TYPE_BUCKETS one-hot columns
+    24       log1p(hours since the previous event)
+    25       log1p(days before the latest event)
+    26, 27   hour of day (UTC), as sin/cos
+    28, 29   day of week, as sin/cos
+    30       payload.score / 100, when numeric
+    31       log1p(payload.durationSeconds / 60), when numeric
+
+Students have logs of very different lengths, so sequences are never padded
+to a common length: see length_buckets and TalentPipeline.encode_behavior.
+"""
+import os
+import zlib
+from datetime import datetime, timezone
+from functools import lru_cache
+import numpy as np
+
+STEP_DIM = 32  # BehaviorEncoder input size
+EVENT_TYPE_BUCKETS = 24
+# Most recent events kept per student, bounding the GRU's work per request
+MAX_EVENTS = int(os.environ.get('ML_MAX_ACTIVITY_EVENTS', 256))
+# Sequences per behavior encoder call
+BEHAVIOR_BATCH_SIZE = int(os.environ.get('ML_BEHAVIOR_BATCH_SIZE', 256))
+
+GAP_COLUMN, RECENCY_COLUMN, HOUR_COLUMN, WEEKDAY_COLUMN, SCORE_COLUMN, DURATION_COLUMN = 24, 25, 26, 28, 30, 31
+
+EMPTY_STEPS = np.zeros((0, STEP_DIM), dtype=np.float32)
+
+
+@lru_cache(maxsize=1024)
+def event_type_bucket(event_type):
+    return zlib.crc32(event_type.encode()) % EVENT_TYPE_BUCKETS
+
+
+def event_time(value):
+    """Epoch seconds of a createdAt value (ISO 8601 string or number; naive times are UTC)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            pass
+        else:
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+            return moment.timestamp()
+    raise ValueError(f"createdAt must be an ISO 8601 time or epoch seconds, got {value!r}")
+
+
+def _payload_number(payload, field):
+    value = payload.get(field)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return 0.0
+
+
+def event_steps(events, max_events=MAX_EVENTS):
+    """
+    Featurize one student's activity log.
+
+    Args:
+        events: List of ActivityLog documents, or None for no activity
+
+    Returns:
+        float32 array of shape (min(len(events), max_events), STEP_DIM),
+        holding the most recent events, oldest first
+
+    Raises:
+        ValueError: If events is not a list of events with an eventType and createdAt
+    """
+    if events is None:
+        return EMPTY_STEPS
+    if not isinstance(events, list):
+        raise ValueError("activity must be a list of events")
+    if not events:
+        return EMPTY_STEPS
+
+    buckets, times, scores, durations = [], [], [], []
+    for event in events:
+        if not isinstance(event, dict) or not isinstance(event.get('eventType'), str):
+            raise ValueError("every activity event needs a string eventType")
+        payload = event.get('payload')
+        payload = payload if isinstance(payload, dict) else {}
+        buckets.append(event_type_bucket(event['eventType']))
+        times.append(event_time(event.get('createdAt')))
+        scores.append(_payload_number(payload, 'score'))
+        durations.append(_payload_number(payload, 'durationSeconds'))
+
+    order = np.argsort(times, kind='stable')[-max_events:]
+    times = np.asarray(times)[order]
+    steps = np.zeros((len(order), STEP_DIM), dtype=np.float32)
+    steps[np.arange(len(order)), np.asarray(buckets)[order]] = 1
+
+    steps[:, GAP_COLUMN] = np.log1p(np.diff(times, prepend=times[0]) / 3600)
+    steps[:, RECENCY_COLUMN] = np.log1p((times[-1] - times) / 86400)
+    hour = 2 * np.pi * (times % 86400) / 86400
+    steps[:, HOUR_COLUMN], steps[:, HOUR_COLUMN + 1] = np.sin(hour), np.cos(hour)
+    # The epoch fell on a Thursday; weekday 0 is Monday
+    weekday = 2 * np.pi * ((times // 86400 + 3) % 7) / 7
+    steps[:, WEEKDAY_COLUMN], steps[:, WEEKDAY_COLUMN + 1] = np.sin(weekday), np.cos(weekday)
+    steps[:, SCORE_COLUMN] = np.asarray(scores)[order] / 100
+    steps[:, DURATION_COLUMN] = np.log1p(np.maximum(np.asarray(durations)[order], 0) / 60)
+    return steps
+
+
+def activity_sequences(students, valid_idx, field='activity'):
+    """
+    Featurize the activity logs of the students encode_students accepted.
+
+    Returns:
+        (sequences, keep, errors) where sequences holds the event_steps of
+        every accepted log, keep masks valid_idx down to those students, and
+        errors maps the position of every rejected student to its message
+    """
+    sequences = []
+    keep = np.ones(len(valid_idx), dtype=bool)
+    errors = {}
+    for row, i in enumerate(valid_idx.tolist()):
+        try:
+            sequences.append(event_steps(students[i].get(field)))
+        except ValueError as e:
+            errors[i] = f"Invalid activity: {e}"
+            keep[row] = False
+    return sequences, keep, errors
+
+
+def sequence_lengths(sequences):
+    """Events per sequence (None counts as an empty log)"""
+    return np.fromiter(
+        (len(sequence) if sequence is not None else 0 for sequence in sequences), dtype=np.int64, count=len(sequences)
+    )
+
+
+def length_buckets(lengths, max_rows=BEHAVIOR_BATCH_SIZE, exact=False):
+    """
+    Group sequence indices into batches of similar length.
+
+    Indices are ordered by length and cut every max_rows, so each batch pads
+    only to its own longest sequence; with exact, batches are also cut
+    wherever the length changes, so nothing is padded at all.
+
+    Returns:
+        List of index arrays, shortest sequences first
+    """
+    order = np.argsort(lengths, kind='stable')
+    cuts = set(range(0, len(order), max_rows))
+    if exact:
+        cuts.update((np.flatnonzero(np.diff(lengths[order])) + 1).tolist())
+    cuts = sorted(cuts) + [len(order)]
+    return [order[start:end] for start, end in zip(cuts[:-1], cuts[1:])]
+
+
+def pad_sequences(sequences):
+    """
+    Stack sequences into one zero-padded batch.
+
+    Returns:
+        (padded, lengths): float32 array of shape (n, longest, STEP_DIM) and
+        the int64 length of each sequence
+    """
+    lengths = sequence_lengths(sequences)
+    padded = np.zeros((len(sequences), lengths.max(initial=0), STEP_DIM), dtype=np.float32)
+    for row, sequence in enumerate(sequences):
+        padded[row, :len(sequence)] = sequence
+    return padded, lengths
+
+
+def split_steps(steps, lengths):
+    """Inverse of concatenating sequences: cut (total_steps, STEP_DIM) rows back into per-student sequences"""
+    return np.split(steps, np.cumsum(lengths)[:-1])
@@ -0,0 +1,227 @@
+"""
+Benchmark the ML service prediction paths.
+
+    python benchmark.py [--services baseline multimodal] [--out bench.json]
+                        [--compare previous.json --threshold 0.2]
+
+Run from the directory holding the trained artifacts. Each service is measured
+in its own process (so memory numbers are per worker) through three paths:
+single /predict calls and /batch-predict via the Flask test client, and the
+scoring path called in-process without Flask. Every repeat posts the same
+students, so the prediction cache is disabled to time the models rather than
+cache hits. Results are written as JSON.
+With --compare, any latency or throughput that regresses by more than
+--threshold versus the previous run fails the job.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import numpy as np
+from batch_engine import FEATURE_FIELDS
+from synthetic_cohort import generate_cohort, POPULATION_GENDER_P
+
+SERVICES = {'baseline': 'app', 'multimodal': 'app_multimodal'}
+BATCH_SIZES = [1, 10, 100, 1000]
+SINGLE_REQUESTS = 200
+BATCH_REPEATS = 5
+REGRESSION_THRESHOLD = 0.2  # fail when 20% slower than the compared run
+
+
+def synthetic_students(n, seed=42):
+    """Student request payloads from the training cohort generator, with observed gender shares"""
+    cohort = generate_cohort(n, seed, gender_p=POPULATION_GENDER_P)
+    cohort['gender'] = cohort['gender'].astype(str)
+    return cohort[['id'] + FEATURE_FIELDS].to_dict('records')
+
+
+def latency_summary(seconds, rows_per_call=1):
+    """Percentiles in milliseconds plus rows/sec over a list of call durations"""
+    timings = np.array(seconds) * 1000
+    return {
+        'calls': len(timings),
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'p99_ms': float(np.percentile(timings, 99)),
+        'rows_per_sec': float(rows_per_call * len(timings) / (timings.sum() / 1000))
+    }
+
+
+def timed(fn, repeats):
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def in_process_scorer(service_name, service):
+    """Validation, encoding and model call in-process, bypassing Flask and JSON"""
+    from batch_engine import encode_students
+
+    if service_name == 'baseline':
+        def score(students):
+            features, _, _ = encode_students(students, service.label_encoder)
+            return service.model.predict_proba(features)
+    else:
+        from text_features import description_codes
+
+        def score(students):
+            features, _, _ = encode_students(students, service.label_encoder)
+            scores = np.array(
+                [[s['math_score'], s['science_score'], s['project_score']] for s in students], dtype=np.float64
+            )
+            codes = description_codes(scores[:, 0], scores[:, 1], scores[:, 2])
+            return service.multimodal_model.predict_batch(codes, features, batch_size=service.BATCH_SIZE)
+    return score
+
+
+def run_service(service_name, batch_sizes, single_requests):
+    """Benchmark one service; runs inside its own process"""
+    # Read by prediction_cache at import; a shared disk tier would also carry hits across runs
+    os.environ['ML_PREDICTION_CACHE_SIZE'] = '0'
+    os.environ.pop('ML_PREDICTION_CACHE_PATH', None)
+    service = __import__(SERVICES[service_name])
+    if service.prediction_cache.enabled:
+        raise RuntimeError("prediction_cache was imported before the benchmark could disable it")
+    start = time.perf_counter()
+    service.load_model()
+    load_seconds = time.perf_counter() - start
+    if getattr(service, 'model', None) is None and getattr(service, 'multimodal_model', None) is None:
+        return {'error': 'Model not loaded'}
+
+    client = service.app.test_client()
+    students = synthetic_students(max(max(batch_sizes), single_requests))
+
+    # Warm up both endpoints before timing
+    client.post('/predict', json=students[0])
+    client.post('/batch-predict', json={'students': students[:10]})
+
+    singles = iter(students)
+    result = {
+        'load_seconds': load_seconds,
+        'predict': latency_summary(
+            timed(lambda: client.post('/predict', json=next(singles)), single_requests)
+        ),
+        'batch_predict': {},
+        'in_process': {}
+    }
+
+    score = in_process_scorer(service_name, service)
+    for size in batch_sizes:
+        payload = {'students': students[:size]}
+        result['batch_predict'][str(size)] = latency_summary(
+            timed(lambda: client.post('/batch-predict', json=payload), BATCH_REPEATS), size
+        )
+        result['in_process'][str(size)] = latency_summary(
+            timed(lambda: score(students[:size]), BATCH_REPEATS), size
+        )
+
+    # ru_maxrss is in KB on Linux
+    result['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def _run_in_child(service_name, batch_sizes, single_requests, queue):
+    queue.put(run_service(service_name, batch_sizes, single_requests))
+
+
+def run_isolated(service_name, batch_sizes, single_requests):
+    """Run one service benchmark in a fresh process so RSS is per worker"""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_in_child, args=(service_name, batch_sizes, single_requests, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def find_regressions(current, previous, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare two benchmark runs.
+
+    Returns:
+        List of messages for every p50/p95 latency that grew, or rows/sec that
+        fell, by more than threshold (as a fraction)
+    """
+    regressions = []
+
+    def check(label, now, before):
+        for key in ('p50_ms', 'p95_ms'):
+            if before[key] > 0 and now[key] > before[key] * (1 + threshold):
+                regressions.append(f"{label} {key}: {before[key]:.3f} -> {now[key]:.3f}")
+        if now['rows_per_sec'] < before['rows_per_sec'] * (1 - threshold):
+            regressions.append(f"{label} rows_per_sec: {before['rows_per_sec']:.1f} -> {now['rows_per_sec']:.1f}")
+
+    for service, result in current['results'].items():
+        old = previous.get('results', {}).get(service)
+        if not old or 'error' in result or 'error' in old:
+            continue
+        check(f"{service} /predict", result['predict'], old['predict'])
+        for path in ('batch_predict', 'in_process'):
+            for size, summary in result[path].items():
+                if size in old[path]:
+                    check(f"{service} {path}[{size}]", summary, old[path][size])
+    return regressions
+
+
+def print_summary(results):
+    for service, result in results.items():
+        if 'error' in result:
+            print(f"{service}: skipped ({result['error']})")
+            continue
+        print(f"\n{service}  (load {result['load_seconds']:.2f}s, peak RSS {result['peak_rss_mb']:.0f} MB)")
+        single = result['predict']
+        print(f"  /predict         p50 {single['p50_ms']:8.3f} ms  p95 {single['p95_ms']:8.3f} ms  p99 {single['p99_ms']:8.3f} ms")
+        for path in ('batch_predict', 'in_process'):
+            for size, summary in result[path].items():
+                print(f"  {path:<14}{size:>5} rows  p50 {summary['p50_ms']:8.3f} ms  {summary['rows_per_sec']:12.0f} rows/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--services', nargs='+', choices=list(SERVICES), default=list(SERVICES))
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=BATCH_SIZES)
+    parser.add_argument('--requests', type=int, default=SINGLE_REQUESTS)
+    parser.add_argument('--out', default='bench.json')
+    parser.add_argument('--compare', help='previous benchmark JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpu_count': multiprocessing.cpu_count(),
+            'batch_sizes': args.batch_sizes,
+            'single_requests': args.requests,
+            'prediction_cache': False
+        },
+        'results': {
+            service: run_isolated(service, args.batch_sizes, args.requests)
+            for service in args.services
+        }
+    }
+
+    print_summary(report['results'])
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = find_regressions(report, previous, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for message in regressions:
+                print(f"  {message}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}")
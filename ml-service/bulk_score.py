@@ -0,0 +1,199 @@
+"""
+Offline bulk scoring of student records, without the web service.
+
+    python bulk_score.py students.csv scores.parquet [--model baseline|multimodal]
+                         [--workers 4] [--chunk-size 50000]
+
+Reads CSV or Parquet input in chunks (columns: id, math_score, science_score,
+project_score, gender, socioeconomic_index) and shards the chunks across a
+process pool. Every worker loads the model once, through the same load_model()
+the Flask apps use, and is pinned to a single CPU thread so throughput scales
+with --workers. Results stream to a Parquet file in input order with one row
+per student: id, stem_potential, confidence, recommendation and error.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from batch_engine import FEATURE_FIELDS, NUMERIC_ERROR, NUMERIC_FIELDS, gender_codes, predict_from_proba
+from recommendations import TIER_NAMES, tier_codes
+from text_features import description_codes
+
+SERVICES = {'baseline': 'app', 'multimodal': 'app_multimodal'}
+CHUNK_SIZE = 50000
+OUTPUT_SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('stem_potential', pa.int8()),
+    ('confidence', pa.float32()),
+    ('recommendation', pa.string()),
+    ('error', pa.string())
+])
+
+# Set in each worker by _init_worker
+_service = None
+_service_name = None
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    """Yield DataFrames of at most chunk_size rows from a CSV or Parquet file"""
+    if path.endswith('.parquet'):
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def encode_frame(frame, label_encoder):
+    """
+    Vectorized counterpart of batch_engine.encode_students for a DataFrame.
+
+    Returns:
+        (features, valid_idx, errors) with the same meaning and messages
+    """
+    n = len(frame)
+    errors = np.full(n, None, dtype=object)
+
+    absent = [field for field in FEATURE_FIELDS if field not in frame.columns]
+    if absent:
+        errors[:] = "Missing required fields"
+        return np.empty((0, len(FEATURE_FIELDS)), dtype=np.float32), np.empty(0, dtype=int), errors
+
+    missing = frame[FEATURE_FIELDS].isna().any(axis=1).to_numpy()
+    gender = frame['gender'].map(gender_codes(label_encoder)).to_numpy(dtype=np.float32, na_value=np.nan)
+    numeric = frame[NUMERIC_FIELDS].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float32)
+
+    bad_gender = ~missing & np.isnan(gender)
+    bad_numeric = ~missing & ~bad_gender & np.isnan(numeric).any(axis=1)
+    errors[missing] = "Missing required fields"
+    errors[bad_gender] = f"Invalid gender value. Must be one of: {list(label_encoder.classes_)}"
+    errors[bad_numeric] = NUMERIC_ERROR
+
+    valid_idx = np.flatnonzero(~(missing | bad_gender | bad_numeric))
+    features = np.column_stack([
+        numeric[valid_idx, 0],
+        numeric[valid_idx, 1],
+        numeric[valid_idx, 2],
+        gender[valid_idx],
+        numeric[valid_idx, 3]
+    ])
+    return np.ascontiguousarray(features, dtype=np.float32), valid_idx, errors
+
+
+def _init_worker(service_name):
+    global _service, _service_name
+    # One CPU thread per process; parallelism comes from the pool
+    os.environ['OMP_NUM_THREADS'] = '1'
+    os.environ['ML_FAST_START'] = 'false'
+    os.environ['ML_MICROBATCH'] = 'false'
+    _service_name = service_name
+    _service = __import__(SERVICES[service_name])
+    _service.load_model()
+    if _service.active is None:
+        # load_model only prints a missing model; scoring every shard would fail on None
+        raise RuntimeError(f"No {service_name} model could be loaded")
+
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(1)
+    xgb_model = _service.model if service_name == 'baseline' else _service.multimodal_model.xgb_model
+    if hasattr(xgb_model, 'get_booster'):  # not the compiled baseline predictor
+        xgb_model.set_params(n_jobs=1)
+
+
+def score_chunk(frame):
+    """Score one DataFrame chunk in a worker, returning an Arrow table"""
+    features, valid_idx, errors = encode_frame(frame, _service.label_encoder)
+
+    if _service_name == 'baseline':
+        probabilities = _service.model.predict_proba(features) if len(valid_idx) else np.empty((0, 2))
+    else:
+        scores = frame.iloc[valid_idx][['math_score', 'science_score', 'project_score']]
+        scores = scores.apply(pd.to_numeric).to_numpy(dtype=np.float64)
+        codes = description_codes(scores[:, 0], scores[:, 1], scores[:, 2])
+        if len(valid_idx):
+            _, probabilities = _service.multimodal_model.predict_batch(
+                codes, features, batch_size=_service.BATCH_SIZE
+            )
+        else:
+            probabilities = np.empty((0, 2))
+
+    n = len(frame)
+    stem_potential = np.zeros(n, dtype=np.int8)
+    confidence = np.full(n, np.nan, dtype=np.float32)
+    recommendation = np.full(n, None, dtype=object)
+    stem_potential[valid_idx] = predict_from_proba(probabilities)
+    confidence[valid_idx] = probabilities[:, 1]
+    recommendation[valid_idx] = np.array(TIER_NAMES, dtype=object)[tier_codes(probabilities[:, 1])]
+    scored = np.zeros(n, dtype=bool)
+    scored[valid_idx] = True
+
+    ids = frame['id'].astype(str).to_numpy(dtype=object) if 'id' in frame.columns else np.full(n, None, dtype=object)
+    return pa.table({
+        'id': pa.array(ids, type=pa.string()),
+        'stem_potential': pa.array(stem_potential, type=pa.int8(), mask=~scored),
+        'confidence': pa.array(confidence, type=pa.float32(), mask=~scored),
+        'recommendation': pa.array(recommendation, type=pa.string()),
+        'error': pa.array(errors, type=pa.string())
+    }, schema=OUTPUT_SCHEMA)
+
+
+def bulk_score(input_path, output_path, service_name, workers, chunk_size=CHUNK_SIZE):
+    """
+    Score input_path into output_path with a pool of workers.
+
+    At most 2 * workers chunks are in flight, so memory is bounded regardless
+    of input size, and results are written in input order.
+
+    Returns:
+        Number of rows written
+
+    Raises:
+        FileNotFoundError: If the model's artifacts are not in the working directory
+    """
+    if not __import__(SERVICES[service_name]).model_available():
+        raise FileNotFoundError(
+            f"❌ No {service_name} model in {os.getcwd()}. Please train the model first."
+        )
+
+    rows = 0
+    pending = deque()
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker, initargs=(service_name,)) as pool, \
+            pq.ParquetWriter(output_path, OUTPUT_SCHEMA) as writer:
+        for frame in read_chunks(input_path, chunk_size):
+            pending.append(pool.submit(score_chunk, frame))
+            if len(pending) >= 2 * workers:
+                table = pending.popleft().result()
+                writer.write_table(table)
+                rows += table.num_rows
+        while pending:
+            table = pending.popleft().result()
+            writer.write_table(table)
+            rows += table.num_rows
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='CSV or .parquet file of student records')
+    parser.add_argument('output', help='Parquet file to write scores to')
+    parser.add_argument('--model', choices=list(SERVICES), default='baseline')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        rows = bulk_score(args.input, args.output, args.model, args.workers, args.chunk_size)
+    except FileNotFoundError as e:
+        sys.exit(str(e))
+    elapsed = time.perf_counter() - start
+    print(f"✅ Scored {rows} students with {args.workers} worker(s) in {elapsed:.1f}s "
+          f"({rows / elapsed:.0f} rows/s) -> {args.output}")
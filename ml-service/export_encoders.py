@@ -0,0 +1,195 @@
+"""
+Export the multimodal encoders for the ONNX inference backend.
+
+    python export_encoders.py [--bundle multimodal_bundle.pkl] [--out encoders_export]
+
+Compiles TextEncoder, NumericProjector and BehaviorEncoder from a trained
+bundle to ONNX with dynamic batch (and sequence) axes, falling back to
+TorchScript for any encoder the ONNX exporter rejects. The XGBoost head,
+label encoder and model config are copied next to them so serving never has
+to unpickle torch tensors. Finishes with a parity check against the eager
+encoders and exits non-zero if outputs drift past --tolerance.
+"""
+import argparse
+import inspect
+import json
+import os
+import sys
+import joblib
+import numpy as np
+import torch
+import torch.nn as nn
+from multimodal_model import (
+    MultiModalTalentModel, TEXT_MODEL, TEXT_MAX_LENGTH, TEXT_EMBED_DIM,
+    NUMERIC_INPUT_DIM, NUM_PROJ_DIM, BEHAVIOR_INPUT_DIM, GRU_HIDDEN
+)
+from onnx_backend import OnnxTalentModel, EXPORT_FORMAT_VERSION, MANIFEST_FILE, SERVING_FILE
+from talent_pipeline import BUNDLE_PATH, EXPORT_DIR, file_checksum
+from text_features import DESCRIPTIONS
+
+ONNX_OPSET = 14
+PARITY_TOLERANCE = 1e-4
+
+
+class TextExport(nn.Module):
+    """TextEncoder minus the tokenizer: token ids and mask in, CLS embedding out"""
+
+    def __init__(self, text_encoder):
+        super().__init__()
+        self.model = text_encoder.model
+
+    def forward(self, input_ids, attention_mask):
+        out = self.model(input_ids=input_ids, attention_mask=attention_mask)
+        return out.last_hidden_state[:, 0, :]
+
+
+def export_module(module, sample_inputs, input_names, dynamic_axes, out_dir, name):
+    """
+    Export one encoder, preferring ONNX and falling back to TorchScript.
+
+    Returns:
+        Manifest entry with the written file name and its format
+    """
+    onnx_path = os.path.join(out_dir, f"{name}.onnx")
+    options = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        # Stick to the TorchScript-based exporter, which handles dynamic_axes directly
+        options['dynamo'] = False
+
+    try:
+        torch.onnx.export(
+            module, sample_inputs, onnx_path,
+            input_names=input_names,
+            output_names=['embedding'],
+            dynamic_axes={**dynamic_axes, 'embedding': {0: 'batch'}},
+            opset_version=ONNX_OPSET,
+            **options
+        )
+        return {'file': f"{name}.onnx", 'format': 'onnx'}
+    except Exception as e:
+        print(f"  ⚠️  ONNX export of {name} failed ({e}), falling back to TorchScript")
+        if os.path.exists(onnx_path):
+            os.remove(onnx_path)
+
+    script_path = os.path.join(out_dir, f"{name}.pt")
+    torch.jit.trace(module, sample_inputs).save(script_path)
+    return {'file': f"{name}.pt", 'format': 'torchscript'}
+
+
+def export_encoders(bundle_path, out_dir):
+    """Write the exported encoders, tokenizer, serving artifacts and manifest to out_dir"""
+    model, label_encoder, model_config, bundle_checksum = MultiModalTalentModel.load_bundle(bundle_path)
+    os.makedirs(out_dir, exist_ok=True)
+
+    tokenizer = model.text_encoder.tokenizer
+    tokenizer.save_pretrained(out_dir)
+    sample = tokenizer(["Student with", "Student with strong skills"], padding=True, return_tensors='pt')
+
+    with torch.no_grad():
+        encoders = {
+            'text': export_module(
+                TextExport(model.text_encoder).eval(),
+                (sample['input_ids'], sample['attention_mask']),
+                ['input_ids', 'attention_mask'],
+                {'input_ids': {0: 'batch', 1: 'tokens'}, 'attention_mask': {0: 'batch', 1: 'tokens'}},
+                out_dir, 'text_encoder'
+            ),
+            'numeric': export_module(
+                model.num_projector,
+                (torch.zeros(2, NUMERIC_INPUT_DIM),),
+                ['numeric'],
+                {'numeric': {0: 'batch'}},
+                out_dir, 'numeric_projector'
+            ),
+            'behavior': export_module(
+                model.beh_encoder,
+                (torch.zeros(2, 3, BEHAVIOR_INPUT_DIM),),
+                ['behavior'],
+                {'behavior': {0: 'batch', 1: 'steps'}},
+                out_dir, 'behavior_encoder'
+            )
+        }
+
+    serving_path = os.path.join(out_dir, SERVING_FILE)
+    joblib.dump({
+        'xgb_model': model.xgb_model,
+        'label_encoder': label_encoder,
+        'model_config': model_config
+    }, serving_path)
+
+    manifest = {
+        'format_version': EXPORT_FORMAT_VERSION,
+        'text_model': TEXT_MODEL,
+        'max_length': TEXT_MAX_LENGTH,
+        'pad_token': tokenizer.pad_token,
+        'pad_token_id': tokenizer.pad_token_id,
+        'text_embed_dim': TEXT_EMBED_DIM,
+        'num_proj_dim': NUM_PROJ_DIM,
+        'behavior_dim': GRU_HIDDEN,
+        'use_behavior': model.use_behavior,
+        'encoders': encoders,
+        'encoder_checksum': model.encoder_checksum(),
+        'bundle_checksum': bundle_checksum,
+        'serving_checksum': file_checksum(serving_path)
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return model, manifest
+
+
+def check_parity(eager_model, out_dir, tolerance=PARITY_TOLERANCE):
+    """
+    Compare exported encoders against the eager torch ones.
+
+    Runs every possible description at two batch sizes (to exercise the
+    dynamic axes), plus random numeric inputs and behavior sequences of
+    varying length (packed in torch, same-length batches in the export).
+
+    Returns:
+        Max absolute difference per modality
+    """
+    exported, _, _, _ = OnnxTalentModel.load_export(out_dir)
+    rng = np.random.default_rng(0)
+    texts = list(DESCRIPTIONS)
+    numeric = rng.normal(60, 20, (len(texts), NUMERIC_INPUT_DIM)).astype(np.float32)
+    behavior = [
+        rng.normal(0, 1, (length, BEHAVIOR_INPUT_DIM)).astype(np.float32)
+        for length in rng.integers(0, 12, len(texts))
+    ]
+
+    diffs = {
+        'text': max(
+            np.abs(eager_model.encode_text(texts) - exported.encode_text(texts)).max(),
+            np.abs(eager_model.encode_text(texts[:1]) - exported.encode_text(texts[:1])).max()
+        ),
+        'fused': np.abs(
+            eager_model.encode_features(texts, numeric, behavior)
+            - exported.encode_features(texts, numeric, behavior)
+        ).max()
+    }
+
+    for name, diff in diffs.items():
+        status = "✓" if diff <= tolerance else "✗"
+        print(f"  {status} {name}: max abs diff {diff:.2e} (tolerance {tolerance:.0e})")
+    return diffs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bundle', default=BUNDLE_PATH)
+    parser.add_argument('--out', default=EXPORT_DIR)
+    parser.add_argument('--tolerance', type=float, default=PARITY_TOLERANCE)
+    args = parser.parse_args()
+
+    print(f"Exporting encoders from {args.bundle} to {args.out}/ ...")
+    eager_model, manifest = export_encoders(args.bundle, args.out)
+    for name, entry in manifest['encoders'].items():
+        print(f"  ✓ {name}: {entry['file']} ({entry['format']})")
+
+    print("Checking parity against eager PyTorch...")
+    diffs = check_parity(eager_model, args.out, args.tolerance)
+    if max(diffs.values()) > args.tolerance:
+        print("❌ Exported encoders do not match eager outputs")
+        sys.exit(1)
+    print("✅ Export complete")
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import numpy as np
+from talent_pipeline import ENCODE_BATCH_SIZE
+
+# Root directory for precomputed fused embeddings
+FEATURE_STORE_DIR = os.environ.get('ML_FEATURE_STORE_DIR', 'feature_store')
+
+
+def data_fingerprint(text_data, num_data, beh_data=None):
+    """SHA-256 over the exact rows to be encoded, so a changed dataset never reuses stale features"""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(num_data, dtype=np.float32).tobytes())
+    if beh_data is not None:
+        # Activity sequences, each with its length so boundaries can't shift
+        for sequence in beh_data:
+            digest.update(np.int64(len(sequence)).tobytes())
+            digest.update(np.ascontiguousarray(sequence, dtype=np.float32).tobytes())
+    if isinstance(text_data, np.ndarray):
+        # Description codes
+        digest.update(np.ascontiguousarray(text_data, dtype=np.int64).tobytes())
+    else:
+        for text in text_data:
+            digest.update(text.encode())
+            digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def feature_path(encoder_checksum, name, fingerprint, root=FEATURE_STORE_DIR):
+    """
+    Location of one stored embedding matrix.
+
+    Features are grouped by encoder_checksum (the model version), so every file
+    under one directory was produced by the same projector/encoder weights.
+    """
+    return os.path.join(root, encoder_checksum[:16], f"{name}-{fingerprint[:16]}.npy")
+
+
+def load_or_encode(model, text_data, num_data, name, root=FEATURE_STORE_DIR, batch_size=ENCODE_BATCH_SIZE,
+                   beh_data=None):
+    """
+    Return fused embeddings for the given rows, encoding them only once.
+
+    On a miss, rows are encoded in mini-batches of batch_size and written
+    straight into a memory-mapped .npy file, so peak memory stays bounded by
+    one batch. On a hit, the stored file is memory-mapped read-only.
+
+    Args:
+        model: MultiModalTalentModel used for encoding
+        text_data: Description codes (see text_features) or list of text strings
+        num_data: NumPy array of shape (n_samples, NUMERIC_INPUT_DIM)
+        name: Label for the split (e.g. "train", "test")
+        beh_data: Activity sequences (see TalentPipeline.encode_behavior) or None
+
+    Returns:
+        (embeddings, hit) where embeddings is a read-only memory-mapped array
+    """
+    encoder_checksum = model.encoder_checksum()
+    fingerprint = data_fingerprint(text_data, num_data, beh_data)
+    path = feature_path(encoder_checksum, name, fingerprint, root)
+
+    if os.path.exists(path):
+        return np.load(path, mmap_mode='r'), True
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    embeddings = np.lib.format.open_memmap(
+        tmp_path, mode='w+', dtype=np.float32, shape=(len(text_data), model.get_fused_dim())
+    )
+
+    for start in range(0, len(text_data), batch_size):
+        end = start + batch_size
+        embeddings[start:end] = model.encode_features(
+            text_data[start:end], num_data[start:end], beh_data[start:end] if beh_data is not None else None
+        )
+
+    embeddings.flush()
+    del embeddings
+    os.replace(tmp_path, path)
+
+    with open(f"{path[:-len('.npy')]}.json", 'w') as f:
+        json.dump({
+            'encoder_checksum': encoder_checksum,
+            'data_fingerprint': fingerprint,
+            'rows': len(text_data),
+            'fused_dim': model.get_fused_dim()
+        }, f, indent=2)
+
+    return np.load(path, mmap_mode='r'), False
@@ -0,0 +1,42 @@
+"""
+Gunicorn settings for the ML service (used by start.sh).
+
+CPU thread-pinning policy: every worker gets
+ML_THREADS_PER_WORKER = max(1, cores // ML_WORKERS) threads, unless set
+explicitly. The same number is used for OpenMP/MKL, torch intra-op threads and
+XGBoost nthread, so ML_WORKERS * ML_THREADS_PER_WORKER never exceeds the
+cores and workers don't oversubscribe each other. Request concurrency inside a
+worker comes from ML_WORKER_THREADS (gthread worker) and does not add CPU
+threads to model calls.
+"""
+import os
+
+cores = os.cpu_count() or 1
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+workers = int(os.environ.get('ML_WORKERS', max(1, min(cores, 4))))
+worker_class = 'gthread'
+threads = int(os.environ.get('ML_WORKER_THREADS', 4))
+threads_per_worker = int(os.environ.get('ML_THREADS_PER_WORKER', max(1, cores // workers)))
+
+# Must be set before torch/numpy start their thread pools in the master
+os.environ.setdefault('OMP_NUM_THREADS', str(threads_per_worker))
+os.environ.setdefault('MKL_NUM_THREADS', str(threads_per_worker))
+
+# Load the model once in the master, then fork workers that share its memory.
+# Fast-start mode loads in a background thread, which fork would not carry over.
+preload_app = os.environ.get('ML_FAST_START', 'false').lower() != 'true'
+
+# Graceful shutdown: on SIGTERM workers stop accepting and finish in-flight requests
+timeout = int(os.environ.get('ML_WORKER_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('ML_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.pin_threads(threads_per_worker)
+    server.log.info(f"Worker {worker.pid} pinned to {threads_per_worker} CPU thread(s)")
@@ -0,0 +1,255 @@
+import hmac
+import os
+import threading
+import time
+import traceback
+from metrics import RELOADS
+from service_utils import ProcessLocal, utc_timestamp
+
+# Model hot reload (POST /admin/reload, or watching the artifact files)
+RELOAD_WATCH = os.environ.get('ML_RELOAD_WATCH', 'false').lower() == 'true'
+RELOAD_INTERVAL = float(os.environ.get('ML_RELOAD_INTERVAL', 5))  # seconds between artifact checks
+ADMIN_TOKEN = os.environ.get('ML_ADMIN_TOKEN', '')  # /admin/reload is disabled while unset
+
+# Scored by every newly built model before it is swapped in
+WARMUP_STUDENT = {
+    'id': 'warmup',
+    'math_score': 80,
+    'science_score': 75,
+    'project_score': 70,
+    'gender': 'Female',
+    'socioeconomic_index': 0.5
+}
+
+
+class ReloadInProgress(Exception):
+    pass
+
+
+def group_by_snapshot(items):
+    """
+    Group micro-batched (snapshot, ...) items by the model snapshot they were
+    submitted with, so a batch straddling a reload scores each request on
+    the version it started with.
+
+    Returns:
+        List of (snapshot, item indices), in order of first appearance
+    """
+    groups = {}
+    for i, item in enumerate(items):
+        groups.setdefault(id(item[0]), (item[0], []))[1].append(i)
+    return list(groups.values())
+
+
+class ModelReloader:
+    """
+    Builds a new version of a service's model off the request path, checks
+    it, then swaps it in.
+
+    A service keeps its whole loaded state (model, label encoder, version)
+    in one snapshot object published by a single assignment, and every
+    request reads that reference once. Swapping is therefore atomic, and
+    requests already in flight finish on the snapshot they started with.
+    A failed build or warm-up leaves the current snapshot serving.
+
+    Reloads are triggered with POST /admin/reload (see add_reload_routes),
+    or by a watcher thread when the files in watch_paths change (enabled with
+    ML_RELOAD_WATCH). Under gunicorn each worker holds its own model, and the
+    admin endpoint only reaches the worker that answers it, so multi-worker
+    deployments should enable the watcher: every worker then picks up new
+    artifacts by itself.
+    """
+
+    def __init__(self, name, build, warm_up, install, watch_paths,
+                 watch=RELOAD_WATCH, interval=RELOAD_INTERVAL):
+        """
+        Args:
+            build: Callable taking the current snapshot (or None) and
+                returning a new one, without touching the live state
+            warm_up: Callable taking a new snapshot; raises if it can't score
+            install: Callable publishing a snapshot to the service
+            watch_paths: Artifact files (or directories) whose changes trigger a reload
+        """
+        self.name = name
+        self.build = build
+        self.warm_up = warm_up
+        self.install = install
+        self.watch_paths = list(watch_paths)
+        self.watch = watch
+        self.interval = interval
+        self.current = None
+        self.reloads = 0
+        self.failures = 0
+        self.last = None
+        self._signature = None
+        self._watcher = ProcessLocal(self._start_watcher)
+        self._reload_lock = threading.Lock()
+
+    def _artifact_signature(self):
+        signature = []
+        for path in self.watch_paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def reload(self, reason='admin'):
+        """
+        Build, warm up and install a new snapshot in the calling thread.
+
+        Returns:
+            The reload record (as in stats()['last'])
+
+        Raises:
+            ReloadInProgress: If another reload is running
+            Exception: Whatever build or warm_up raised; nothing is swapped
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgress(f"A {self.name} model reload is already running")
+        try:
+            return self._reload(reason)
+        finally:
+            self._reload_lock.release()
+
+    def _reload(self, reason):
+        record = {"reason": reason, "status": "running", "started_at": utc_timestamp(),
+                  "finished_at": None, "seconds": None, "version": None, "error": None}
+        self.last = record
+        start = time.perf_counter()
+        # Taken before reading, so a file replaced mid-build triggers another reload
+        signature = self._artifact_signature()
+        try:
+            snapshot = self.build(self.current)
+            self.warm_up(snapshot)
+        except Exception as e:
+            self._signature = signature  # don't retry until the artifacts change again
+            self.failures += 1
+            record.update(status="failed", error=str(e))
+            RELOADS.labels(self.name, 'failed').inc()
+            raise
+        finally:
+            record.update(finished_at=utc_timestamp(), seconds=round(time.perf_counter() - start, 3))
+
+        self.install(snapshot)
+        self.current = snapshot
+        self._signature = signature
+        self.reloads += 1
+        record.update(status="succeeded", version=getattr(snapshot, 'version', None))
+        RELOADS.labels(self.name, 'succeeded').inc()
+        return record
+
+    def start(self, reason='admin'):
+        """
+        Run reload() on a background thread.
+
+        Raises:
+            ReloadInProgress: If another reload is running
+        """
+        if self._reload_lock.locked():
+            raise ReloadInProgress(f"A {self.name} model reload is already running")
+
+        def run():
+            try:
+                self.reload(reason)
+            except ReloadInProgress:
+                pass
+            except Exception:
+                traceback.print_exc()
+
+        thread = threading.Thread(target=run, name=f"{self.name}-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def ensure_watcher(self):
+        # Each gunicorn worker holds its own model, so each watches for itself
+        if self.watch:
+            self._watcher.get()
+
+    def _start_watcher(self):
+        thread = threading.Thread(target=self._watch, name=f"{self.name}-watcher", daemon=True)
+        thread.start()
+        return thread
+
+    def _watch(self):
+        previous = self._artifact_signature()
+        while True:
+            time.sleep(self.interval)
+            signature = self._artifact_signature()
+            # Reload once the artifacts differ from what was loaded and have
+            # stopped changing, so a file still being copied isn't read
+            if signature != self._signature and signature == previous:
+                print(f"↻ {self.name} model artifacts changed, reloading...")
+                try:
+                    record = self.reload('file_change')
+                    print(f"✅ {self.name} model reloaded: {record['version']} in {record['seconds']}s")
+                except ReloadInProgress:
+                    pass
+                except Exception as e:
+                    print(f"❌ {self.name} model reload failed, still serving the previous version: {e}")
+            previous = signature
+
+    def stats(self):
+        """Reload counters and the last reload, for /health"""
+        return {
+            "watching": self.watch,
+            "reloading": self._reload_lock.locked(),
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last": self.last
+        }
+
+
+def add_reload_routes(app, reloaders, token=ADMIN_TOKEN):
+    """
+    Add the model reload endpoint to a Flask app, and start file watchers.
+
+        POST /admin/reload[?model=name][&wait=true]   header X-Admin-Token: <ML_ADMIN_TOKEN>
+
+    Without wait the reload runs in the background (202); with wait=true the
+    response reports its outcome (200, or 500 with the previous model still
+    serving). Answers 409 while a reload is already running.
+
+    Args:
+        reloaders: Dict of model name -> ModelReloader
+    """
+    from flask import jsonify, request
+
+    @app.before_request
+    def _ensure_watchers():
+        for reloader in reloaders.values():
+            reloader.ensure_watcher()
+
+    @app.route('/admin/reload', methods=['POST'])
+    def reload_model():
+        if not token:
+            return jsonify({"error": "Reload endpoint disabled, set ML_ADMIN_TOKEN to enable it"}), 403
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+            return jsonify({"error": "Invalid admin token"}), 403
+
+        names = [request.args['model']] if 'model' in request.args else list(reloaders)
+        unknown = [name for name in names if name not in reloaders]
+        if unknown:
+            return jsonify({"error": f"Unknown model {unknown[0]!r}, expected one of {list(reloaders)}"}), 400
+
+        wait = request.args.get('wait', 'false').lower() == 'true'
+        results = {}
+        status = 200 if wait else 202
+        for name in names:
+            try:
+                if wait:
+                    results[name] = reloaders[name].reload('admin')
+                else:
+                    reloaders[name].start('admin')
+                    results[name] = {"status": "started"}
+            except ReloadInProgress as e:
+                results[name] = {"status": "running", "error": str(e)}
+                status = 409
+            except Exception:
+                traceback.print_exc()
+                results[name] = reloaders[name].last
+                status = 500
+        return jsonify({"reload": results}), status
+
+    return app
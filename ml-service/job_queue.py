@@ -0,0 +1,225 @@
+import json
+import os
+import re
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from batch_engine import chunked, request_students
+from metrics import JOBS, JOBS_ACTIVE
+from service_utils import ProcessLocal, utc_timestamp
+
+# Asynchronous batch jobs (POST /jobs)
+JOB_WORKERS = int(os.environ.get('ML_JOB_WORKERS', 1))  # jobs scored at once per process
+MAX_PENDING_JOBS = int(os.environ.get('ML_MAX_PENDING_JOBS', 8))  # queued + running per process
+JOB_CHUNK_SIZE = int(os.environ.get('ML_JOB_CHUNK_SIZE', 500))  # rows per model call inside a job
+JOB_TTL_SECONDS = float(os.environ.get('ML_JOB_TTL_SECONDS', 3600))  # how long finished jobs are kept
+JOB_DIR = os.environ.get('ML_JOB_DIR', 'jobs')
+
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """
+    Runs large batch predictions in the background, a chunk at a time.
+
+    Status and results are written to job_dir rather than kept in memory, so
+    any gunicorn worker on the host can answer a poll for a job another
+    worker accepted. Each job is scored in chunks of chunk_size rows, which
+    bounds how long it holds the model between interactive /predict calls.
+    """
+
+    def __init__(self, score_fn, job_dir=JOB_DIR, workers=JOB_WORKERS,
+                 max_pending=MAX_PENDING_JOBS, chunk_size=JOB_CHUNK_SIZE, ttl=JOB_TTL_SECONDS):
+        """
+        Args:
+            score_fn: Callable taking a list of student dicts and returning
+                one serialized JSON result (bytes) per student, in order
+        """
+        self.score_fn = score_fn
+        self.job_dir = job_dir
+        self.workers = workers
+        self.max_pending = max_pending
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self._executor = ProcessLocal(self._new_executor)
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def _path(self, job_id, kind):
+        return os.path.join(self.job_dir, f"{job_id}.{kind}.json")
+
+    def _write(self, job_id, kind, payload):
+        path = self._path(job_id, kind)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    def _new_executor(self):
+        self._active = 0  # jobs accepted before fork run in the parent only
+        return ThreadPoolExecutor(self.workers, thread_name_prefix="batch-job")
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.job_dir):
+            path = os.path.join(self.job_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass  # removed by another worker
+
+    def submit(self, students):
+        """
+        Accept a job and return its initial status without scoring anything.
+
+        Raises:
+            JobQueueFull: when max_pending jobs are already queued or running
+        """
+        with self._lock:
+            executor = self._executor.get()
+            if self._active >= self.max_pending:
+                raise JobQueueFull(f"Too many pending jobs (limit {self.max_pending}), retry later")
+            self._active += 1
+            JOBS_ACTIVE.labels().set(self._active)
+
+        try:
+            os.makedirs(self.job_dir, exist_ok=True)
+            self._purge_expired()
+
+            job_id = uuid.uuid4().hex
+            status = {
+                "job_id": job_id,
+                "status": "queued",
+                "total": len(students),
+                "processed": 0,
+                "progress": 0.0,
+                "created_at": utc_timestamp(),
+                "started_at": None,
+                "finished_at": None,
+                "error": None
+            }
+            self._write(job_id, 'status', status)
+            executor.submit(self._run, job_id, students, dict(status))
+        except BaseException:
+            # The job never reached the executor, so _run will not release its slot
+            self._release()
+            raise
+        return status
+
+    def _run(self, job_id, students, status):
+        try:
+            status.update(status="running", started_at=utc_timestamp())
+            self._write(job_id, 'status', status)
+
+            # Rows go straight to disk, so a finished chunk is never held in memory
+            path = self._path(job_id, 'results')
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(b'{"predictions":[')
+                for chunk in chunked(students, self.chunk_size):
+                    rows = self.score_fn(chunk)
+                    if status["processed"]:
+                        f.write(b',')
+                    f.write(b','.join(rows))
+                    status["processed"] += len(rows)
+                    status["progress"] = status["processed"] / len(students)
+                    self._write(job_id, 'status', status)
+                f.write(b']}')
+            os.replace(tmp_path, path)
+            status["status"] = "succeeded"
+        except Exception as e:
+            traceback.print_exc()
+            status.update(status="failed", error=str(e))
+        finally:
+            try:
+                status["finished_at"] = utc_timestamp()
+                self._write(job_id, 'status', status)
+            finally:
+                JOBS.labels(status["status"]).inc()
+                self._release()
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+            JOBS_ACTIVE.labels().set(self._active)
+
+    def status(self, job_id):
+        """Current status dict of a job, or None if it is unknown or expired"""
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id, 'status')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def results_path(self, job_id):
+        """Path of a finished job's {"predictions": [...]} JSON file"""
+        return self._path(job_id, 'results')
+
+    def stats(self):
+        """Limits and load for /health"""
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "active": self._active,
+            "chunk_size": self.chunk_size
+        }
+
+
+def add_job_routes(app, jobs, model_ready):
+    """
+    Add the asynchronous batch job API to a Flask app.
+
+        POST /jobs                 {"students": [...]} -> 202 with the job status
+        GET  /jobs/<id>            status, processed rows and progress
+        GET  /jobs/<id>/results    {"predictions": [...]} once the job succeeded
+
+    Args:
+        model_ready: Callable returning True once the model can score
+    """
+    from flask import jsonify, request, send_file
+
+    @app.route('/jobs', methods=['POST'])
+    def submit_job():
+        if not model_ready():
+            return jsonify({"error": "Model not loaded"}), 503
+
+        try:
+            students = request_students(request.get_json())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            status = jobs.submit(students)
+        except JobQueueFull as e:
+            return jsonify({"error": str(e)}), 429
+        except OSError as e:
+            return jsonify({"error": f"Could not store job: {e}"}), 500
+        return jsonify(status), 202, {"Location": f"/jobs/{status['job_id']}"}
+
+    @app.route('/jobs/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        status = jobs.status(job_id)
+        if status is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(status)
+
+    @app.route('/jobs/<job_id>/results', methods=['GET'])
+    def job_results(job_id):
+        status = jobs.status(job_id)
+        if status is None:
+            return jsonify({"error": "Job not found"}), 404
+        if status["status"] != "succeeded":
+            return jsonify(status), 409
+        # Already serialized by the job, so stream the file as is
+        return send_file(os.path.abspath(jobs.results_path(job_id)), mimetype='application/json')
+
+    return app
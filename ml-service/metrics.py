@@ -0,0 +1,228 @@
+import threading
+import time
+
+# Upper bounds for latency histograms, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Upper bounds for batch size histograms, in rows
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+# Upper bounds for differences between two models' probabilities
+CONFIDENCE_DELTA_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed bucket bounds (Prometheus style)"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+                    break
+
+    def snapshot(self):
+        """
+        Returns:
+            Dict with cumulative bucket counts keyed by upper bound ("+Inf" last),
+            plus the observation sum and count
+        """
+        with self._lock:
+            cumulative = {}
+            running = 0
+            for bound, count in zip(self.buckets, self._counts):
+                running += count
+                cumulative[str(bound)] = running
+            cumulative["+Inf"] = self._count
+            return {"buckets": cumulative, "sum": self._sum, "count": self._count}
+
+
+class _Metric:
+    """A named metric family with one child per combination of label values"""
+
+    type = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{self._label_text(values)} {child.value}"]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+
+class LabeledHistogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        super().__init__(name, help_text, labelnames)
+
+    def _new_child(self):
+        return Histogram(self.buckets)
+
+    def _render_child(self, values, child):
+        snapshot = child.snapshot()
+        lines = [
+            f"{self.name}_bucket{self._label_text(values, [('le', bound)])} {count}"
+            for bound, count in snapshot["buckets"].items()
+        ]
+        lines.append(f"{self.name}_sum{self._label_text(values)} {snapshot['sum']}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {snapshot['count']}")
+        return lines
+
+
+REGISTRY = []
+
+REQUESTS = Counter('ml_requests_total', 'HTTP requests handled', ['endpoint', 'status'])
+REQUEST_ERRORS = Counter('ml_request_errors_total', 'HTTP requests answered with a 4xx/5xx status', ['endpoint', 'status'])
+REQUEST_LATENCY = LabeledHistogram('ml_request_latency_seconds', 'End-to-end request handling time', ['endpoint'])
+STAGE_LATENCY = LabeledHistogram('ml_stage_latency_seconds', 'Time spent in each prediction stage', ['stage'])
+BATCH_ROWS = LabeledHistogram('ml_batch_rows', 'Rows scored per model call', ['stage'], BATCH_SIZE_BUCKETS)
+MICROBATCH_SIZE = LabeledHistogram('ml_microbatch_size_rows', 'Requests per micro-batch', ['batcher'], BATCH_SIZE_BUCKETS)
+MICROBATCH_QUEUE_WAIT = LabeledHistogram('ml_microbatch_queue_wait_seconds', 'Time a request waited for its micro-batch', ['batcher'])
+JOBS = Counter('ml_jobs_total', 'Batch jobs finished, by final status', ['status'])
+JOBS_ACTIVE = Gauge('ml_jobs_active', 'Batch jobs queued or running in this worker')
+MODEL_INFO = Gauge('ml_model_info', 'Loaded model (value is always 1)', ['model_type', 'model_version'])
+MODEL_LATENCY = LabeledHistogram('ml_model_latency_seconds', 'Scoring time per model, as primary or shadow', ['model', 'role'])
+MODEL_PREDICTIONS = Counter('ml_model_predictions_total', 'Students scored per model, as primary or shadow', ['model', 'role'])
+SHADOW_COMPARISONS = Counter('ml_shadow_comparisons_total', 'Students scored by both models, by label agreement', ['primary', 'shadow', 'outcome'])
+SHADOW_CONFIDENCE_DELTA = LabeledHistogram('ml_shadow_confidence_delta', 'Absolute confidence difference between primary and shadow', ['primary', 'shadow'], CONFIDENCE_DELTA_BUCKETS)
+PREDICTION_CACHE_LOOKUPS = Counter('ml_prediction_cache_lookups_total', 'Students looked up in the prediction cache, by result', ['model', 'result'])
+PREDICTION_CACHE_HIT_RATIO = Gauge('ml_prediction_cache_hit_ratio', 'Share of prediction cache lookups answered from the cache in this worker', ['model'])
+RELOADS = Counter('ml_model_reloads_total', 'Model reloads, by outcome', ['model', 'status'])
+SHADOW_DROPPED = Counter('ml_shadow_dropped_total', 'Shadow scorings skipped because the shadow queue was full', ['shadow'])
+
+
+class stage:
+    """
+    Time a block of code into ml_stage_latency_seconds.
+
+        with stage('xgboost', rows=len(features)):
+            probabilities = model.predict_proba(features)
+
+    When rows is given, the batch size is also recorded in ml_batch_rows.
+    """
+
+    __slots__ = ('_histogram', '_rows', '_name', '_start')
+
+    def __init__(self, name, rows=None):
+        self._name = name
+        self._histogram = STAGE_LATENCY.labels(name)
+        self._rows = rows
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start)
+        if self._rows is not None:
+            BATCH_ROWS.labels(self._name).observe(self._rows)
+        return False
+
+
+def set_model_info(model_type, model_version):
+    """Publish the loaded model as ml_model_info, replacing any previous version of the same type"""
+    with MODEL_INFO._lock:
+        for labels in [labels for labels in MODEL_INFO._children if labels[0] == model_type]:
+            del MODEL_INFO._children[labels]
+    MODEL_INFO.labels(model_type, model_version or "unversioned").set(1)
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def instrument_app(app):
+    """
+    Count and time every request of a Flask app, and add GET /metrics.
+
+    Metrics live in process memory, so under gunicorn each worker reports its own.
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        if endpoint != '/metrics':
+            status = str(response.status_code)
+            REQUESTS.labels(endpoint, status).inc()
+            if response.status_code >= 400:
+                REQUEST_ERRORS.labels(endpoint, status).inc()
+            # Observed when the server closes the response, so a streamed
+            # body's generation time counts too
+            start = g.metrics_start
+            response.call_on_close(lambda: REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - start))
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+    return app
@@ -0,0 +1,99 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from metrics import MICROBATCH_SIZE, MICROBATCH_QUEUE_WAIT
+
+# Dynamic batching of concurrent /predict calls
+MICROBATCH_ENABLED = os.environ.get('ML_MICROBATCH', 'true').lower() == 'true'
+MAX_BATCH_SIZE = int(os.environ.get('ML_MAX_BATCH_SIZE', 64))
+MAX_WAIT_MS = float(os.environ.get('ML_MAX_WAIT_MS', 5))
+
+
+class MicroBatcher:
+    """
+    Collects single-row requests from many threads and scores them together.
+
+    A batch takes every item already queued behind its first one. An item
+    that finds the queue empty is dispatched at once, so an uncontended
+    request pays no batching delay. When other requests are queued too, the
+    batch waits for more until max_batch_size items are queued or max_wait_ms
+    has passed since its first item arrived, whichever comes first. Items
+    that arrive while a batch is being scored queue up for the next one.
+    Each caller blocks in submit() until its own result is ready.
+    """
+
+    def __init__(self, score_fn, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, name='predict'):
+        """
+        Args:
+            score_fn: Callable taking a list of items and returning a list of
+                results in the same order
+            name: Label for this batcher's histograms on /metrics
+        """
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batch_sizes = MICROBATCH_SIZE.labels(name)
+        self.queue_wait = MICROBATCH_QUEUE_WAIT.labels(name)
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, item):
+        """Queue one item and block until its result is ready (re-raises scoring errors)"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future.result()
+
+    def _ensure_worker(self):
+        # Started lazily so a worker forked from a preloaded master gets its own thread
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                    self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Take whatever is already queued; wait for more only while
+                # other requests are in flight, so a lone request never waits
+                if len(batch) > 1 and remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            dispatched = time.perf_counter()
+            self.batch_sizes.observe(len(batch))
+            for _, _, enqueued in batch:
+                self.queue_wait.observe(dispatched - enqueued)
+
+            try:
+                results = self.score_fn([item for item, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        """Batch size and queue wait histograms"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot()
+        }
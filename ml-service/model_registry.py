@@ -0,0 +1,229 @@
+import json
+import os
+import random
+import threading
+import time
+import traceback
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from metrics import MODEL_LATENCY, MODEL_PREDICTIONS, SHADOW_COMPARISONS, SHADOW_CONFIDENCE_DELTA, SHADOW_DROPPED
+from service_utils import ProcessLocal
+
+# Share of traffic per model, e.g. "baseline=0.9,multimodal=0.1" (normalized to sum to 1)
+TRAFFIC_SPLIT = os.environ.get('ML_TRAFFIC_SPLIT', 'baseline=1')
+# Model also scored on every routed request, off the response path ("" for none)
+SHADOW_MODEL = os.environ.get('ML_SHADOW_MODEL', '') or None
+SHADOW_WORKERS = int(os.environ.get('ML_SHADOW_WORKERS', 1))
+SHADOW_MAX_PENDING = int(os.environ.get('ML_SHADOW_MAX_PENDING', 100))  # queued shadow scorings per process
+
+
+def parse_traffic_split(text):
+    """
+    Parse "name=share,..." into a dict of shares summing to 1.
+
+    Raises:
+        ValueError: If the text is malformed or no share is positive
+    """
+    shares = {}
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        name, _, share = part.partition('=')
+        shares[name.strip()] = float(share) if share.strip() else 1.0
+    total = sum(shares.values())
+    if total <= 0 or any(share < 0 for share in shares.values()):
+        raise ValueError(f"Invalid traffic split {text!r}, expected e.g. 'baseline=0.9,multimodal=0.1'")
+    return {name: share / total for name, share in shares.items() if share > 0}
+
+
+class ServedModel:
+    """One model the registry can route to, described by its service's scoring functions"""
+
+    def __init__(self, name, predict_student, score_students, is_ready, version):
+        """
+        Args:
+            predict_student: Callable taking a student dict and returning
+                (response body dict, HTTP status)
+            score_students: Callable taking a list of student dicts and
+                returning one serialized JSON result (bytes) per student
+            is_ready: Callable returning True once the model is loaded
+            version: Callable returning the loaded model's checksum
+        """
+        self.name = name
+        self.predict_student = predict_student
+        self.score_students = score_students
+        self.is_ready = is_ready
+        self.version = version
+
+
+class ModelRegistry:
+    """
+    Routes requests between models by traffic share, optionally scoring a
+    shadow model on the same input in the background.
+
+    A request goes to one primary model, picked by a hash of the student id
+    when there is one (so a student always sees the same model) and at random
+    otherwise. The shadow model's results are only compared with the
+    primary's, in ml_shadow_comparisons_total and ml_shadow_confidence_delta,
+    never returned. Shadow work runs on its own threads and is dropped once
+    max_pending scorings are queued, so it never holds up a response.
+    """
+
+    def __init__(self, traffic_split=TRAFFIC_SPLIT, shadow=SHADOW_MODEL,
+                 shadow_workers=SHADOW_WORKERS, max_pending=SHADOW_MAX_PENDING):
+        self.models = {}
+        self.shares = parse_traffic_split(traffic_split)
+        self.shadow_name = shadow
+        self.shadow_workers = shadow_workers
+        self.max_pending = max_pending
+        self._executor = ProcessLocal(self._new_executor)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def register(self, model):
+        self.models[model.name] = model
+        return model
+
+    def validate(self):
+        """
+        Raises:
+            ValueError: If the traffic split or shadow names an unregistered model
+        """
+        unknown = [name for name in [*self.shares, self.shadow_name] if name and name not in self.models]
+        if unknown:
+            raise ValueError(f"Unknown model(s) {unknown}, expected one of {list(self.models)}")
+
+    @property
+    def default(self):
+        """The model with the largest traffic share"""
+        return self.models[max(self.shares, key=self.shares.get)]
+
+    @property
+    def shadow(self):
+        return self.models.get(self.shadow_name)
+
+    def route(self, key=None):
+        """
+        Pick the primary model for a request.
+
+        While the picked model is still loading (or failed to load), falls
+        back to the default model if it is ready, then to any other ready
+        model; the default is returned only when none is ready.
+        """
+        point = zlib.crc32(str(key).encode()) / 2 ** 32 if key is not None else random.random()
+        chosen = None
+        for name, share in self.shares.items():
+            chosen = self.models[name]
+            point -= share
+            if point < 0:
+                break
+        if chosen.is_ready():
+            return chosen
+        fallbacks = [self.default, *(self.models[name] for name in self.shares), *self.models.values()]
+        return next((model for model in fallbacks if model.is_ready()), self.default)
+
+    def predict(self, data):
+        """
+        Score one student dict with its routed model.
+
+        Returns:
+            (response body dict, HTTP status, model)
+        """
+        model = self.route(data.get('id'))
+        start = time.perf_counter()
+        body, status = model.predict_student(data)
+        self._observe(model, 'primary', start, 1)
+        if status == 200:
+            self._submit_shadow(model, self._shadow_predict, data, body)
+        return body, status, model
+
+    def score_students(self, students, model=None, shadow=True):
+        """
+        Score a list of student dicts with one model (routed unless given).
+
+        Returns:
+            (serialized results, model), see batch_engine.render_results
+        """
+        model = model or self.route()
+        start = time.perf_counter()
+        rows = model.score_students(students)
+        self._observe(model, 'primary', start, len(students))
+        if shadow:
+            self._submit_shadow(model, self._shadow_batch, students, rows)
+        return rows, model
+
+    def _observe(self, model, role, start, n_students):
+        MODEL_LATENCY.labels(model.name, role).observe(time.perf_counter() - start)
+        MODEL_PREDICTIONS.labels(model.name, role).inc(n_students)
+
+    def _new_executor(self):
+        self._pending = 0  # shadow scorings queued before fork run in the parent only
+        return ThreadPoolExecutor(self.shadow_workers, thread_name_prefix="shadow")
+
+    def _submit_shadow(self, primary, fn, payload, primary_result):
+        shadow = self.shadow
+        if shadow is None or shadow is primary or not shadow.is_ready():
+            return
+        with self._lock:
+            executor = self._executor.get()
+            if self._pending >= self.max_pending:
+                SHADOW_DROPPED.labels(shadow.name).inc()
+                return
+            self._pending += 1
+        executor.submit(self._run_shadow, fn, primary, shadow, payload, primary_result)
+
+    def _run_shadow(self, fn, primary, shadow, payload, primary_result):
+        try:
+            fn(primary, shadow, payload, primary_result)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _shadow_predict(self, primary, shadow, data, primary_body):
+        start = time.perf_counter()
+        body, status = shadow.predict_student(data)
+        self._observe(shadow, 'shadow', start, 1)
+        if status == 200:
+            self.compare(primary, shadow, [primary_body], [body])
+
+    def _shadow_batch(self, primary, shadow, students, primary_rows):
+        start = time.perf_counter()
+        rows = shadow.score_students(students)
+        self._observe(shadow, 'shadow', start, len(students))
+        self.compare(primary, shadow, map(json.loads, primary_rows), map(json.loads, rows))
+
+    @staticmethod
+    def compare(primary, shadow, primary_results, shadow_results):
+        """Record label agreement and confidence difference for every student both models scored"""
+        delta = SHADOW_CONFIDENCE_DELTA.labels(primary.name, shadow.name)
+        agree = SHADOW_COMPARISONS.labels(primary.name, shadow.name, 'agree')
+        disagree = SHADOW_COMPARISONS.labels(primary.name, shadow.name, 'disagree')
+        for ours, theirs in zip(primary_results, shadow_results):
+            if 'confidence' not in ours or 'confidence' not in theirs:
+                continue  # rejected input
+            delta.observe(abs(ours['confidence'] - theirs['confidence']))
+            (agree if ours['stem_potential'] == theirs['stem_potential'] else disagree).inc()
+
+    def stats(self):
+        """Per-model readiness and traffic share, plus shadow agreement so far in this process"""
+        shadow = {"model": self.shadow_name, "pending": self._pending if self._executor.created else 0}
+        if self.shadow_name:
+            shadow["disagreement_rate"] = {}
+            for primary in self.models.keys() - {self.shadow_name}:
+                agree = SHADOW_COMPARISONS.labels(primary, self.shadow_name, 'agree').value
+                disagree = SHADOW_COMPARISONS.labels(primary, self.shadow_name, 'disagree').value
+                if agree + disagree:
+                    shadow["disagreement_rate"][primary] = disagree / (agree + disagree)
+        return {
+            "models": {
+                name: {
+                    "ready": model.is_ready(),
+                    "version": model.version(),
+                    "traffic_share": self.shares.get(name, 0.0)
+                }
+                for name, model in self.models.items()
+            },
+            "shadow": shadow
+        }
@@ -1,24 +1,68 @@
 import torch
 import torch.nn as nn
-from transformers import AutoTokenizer, AutoModel
 import numpy as np
+import os
+import hashlib
+import joblib
+import time
+from talent_pipeline import TalentPipeline, file_checksum
+from behavior_features import STEP_DIM
+from metrics import stage
 
 # --- CONFIG ---
 TEXT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+TEXT_MODEL_PATH = os.environ.get('ML_TEXT_MODEL_PATH')  # local copy of TEXT_MODEL, loaded with no hub access
 TEXT_EMBED_DIM = 384
 NUMERIC_INPUT_DIM = 5  # math_score, science_score, project_score, gender_encoded, socioeconomic_index
 NUM_PROJ_DIM = 64
-BEHAVIOR_INPUT_DIM = 32
+BEHAVIOR_INPUT_DIM = STEP_DIM  # one activity log event, see behavior_features
 GRU_HIDDEN = 64
+TEXT_MAX_LENGTH = 128  # tokenizer truncation length
+BUNDLE_FORMAT_VERSION = 1  # bump when the bundle layout changes
 
 
 class TextEncoder(nn.Module):
     """Encodes text descriptions into embeddings using a pre-trained transformer model"""
 
-    def __init__(self):
+    def __init__(self, model_path=None):
+        """
+        Args:
+            model_path: Local directory holding a saved copy of TEXT_MODEL,
+                defaulting to TEXT_MODEL_PATH. When set, nothing is fetched
+                from the Hugging Face hub.
+        """
         super().__init__()
-        self.model = AutoModel.from_pretrained(TEXT_MODEL)
-        self.tokenizer = AutoTokenizer.from_pretrained(TEXT_MODEL)
+        self.load_timings = {}
+        self.quantized = False
+
+        # transformers is imported here, not at module level, so importing this
+        # module (and answering /health) doesn't wait on it
+        start = time.perf_counter()
+        from transformers import AutoTokenizer, AutoModel
+        self.load_timings['import_transformers'] = time.perf_counter() - start
+
+        model_path = model_path or TEXT_MODEL_PATH
+        source = model_path or TEXT_MODEL
+        local_only = model_path is not None
+
+        start = time.perf_counter()
+        self.tokenizer = AutoTokenizer.from_pretrained(source, local_files_only=local_only)
+        self.load_timings['load_tokenizer'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.model = AutoModel.from_pretrained(source, local_files_only=local_only)
+        self.load_timings['load_text_model'] = time.perf_counter() - start
+
+    def quantize(self):
+        """
+        Apply dynamic int8 quantization to the transformer's Linear layers.
+
+        Weights are stored as int8 and activations are quantized on the fly,
+        which shrinks the model and speeds up CPU inference at a small
+        accuracy cost.
+        """
+        self.model = torch.quantization.quantize_dynamic(self.model, {nn.Linear}, dtype=torch.qint8)
+        self.quantized = True
 
     def forward(self, text_list):
         """
@@ -27,15 +71,16 @@ class TextEncoder(nn.Module):
         Returns:
             Tensor of shape (batch_size, TEXT_EMBED_DIM)
         """
-        inputs = self.tokenizer(
-            text_list,
-            padding=True,
-            truncation=True,
-            return_tensors='pt',
-            max_length=128
-        )
-
-        with torch.no_grad():
+        with stage('tokenize', rows=len(text_list)):
+            inputs = self.tokenizer(
+                text_list,
+                padding=True,
+                truncation=True,
+                return_tensors='pt',
+                max_length=TEXT_MAX_LENGTH
+            )
+
+        with stage('transformer', rows=len(text_list)), torch.no_grad():
             out = self.model(**inputs)
 
         # Return CLS token embedding
@@ -71,28 +116,45 @@ class BehaviorEncoder(nn.Module):
         super().__init__()
         self.gru = nn.GRU(input_dim, hidden_dim, batch_first=True, dropout=0.2)
 
-    def forward(self, seq):
+    def forward(self, seq, lengths=None):
         """
         Args:
             seq: Tensor of shape (batch_size, seq_len, input_dim)
+            lengths: Optional int64 CPU tensor of the real (non-zero) length
+                of each zero-padded sequence; the GRU then stops at each
+                sequence's last step instead of running over the padding
         Returns:
             Tensor of shape (batch_size, hidden_dim)
         """
+        if lengths is not None:
+            seq = nn.utils.rnn.pack_padded_sequence(seq, lengths, batch_first=True, enforce_sorted=False)
         _, h = self.gru(seq)
         return h.squeeze(0)
 
 
-class MultiModalTalentModel:
+class MultiModalTalentModel(TalentPipeline):
     """
     Combines text, numeric, and behavioral features for talent detection.
     Uses separate encoders for each modality and fuses them for final prediction.
     """
 
-    def __init__(self):
-        self.text_encoder = TextEncoder()
+    def __init__(self, text_model_path=None, quantize_text=False, text_encoder=None,
+                 use_behavior=False):
+        """
+        Args:
+            text_encoder: Already loaded TextEncoder to share (e.g. with the
+                model being replaced on reload), instead of loading TEXT_MODEL again
+            use_behavior: Fuse a behavior embedding into every row (see TalentPipeline)
+        """
+        super().__init__(use_behavior, GRU_HIDDEN)
+        self.text_encoder = text_encoder or TextEncoder(text_model_path)
+        if quantize_text and not self.text_encoder.quantized:
+            start = time.perf_counter()
+            self.text_encoder.quantize()
+            self.text_encoder.load_timings['quantize_text_model'] = time.perf_counter() - start
         self.num_projector = NumericProjector()
         self.beh_encoder = BehaviorEncoder()
-        self.xgb_model = None
+        self.load_timings = dict(self.text_encoder.load_timings) if text_encoder is None else {}
 
         # Set encoders to eval mode
         self.text_encoder.eval()
@@ -104,62 +166,122 @@ class MultiModalTalentModel:
         Encode all modalities and fuse them into a single embedding.
 
         Args:
-            text_data: List of text strings
+            text_data: Description codes (see text_features) or list of text strings
             num_data: NumPy array of shape (n_samples, NUMERIC_INPUT_DIM)
-            beh_data: NumPy array of shape (n_samples, seq_len, BEHAVIOR_INPUT_DIM) or None
+            beh_data: List of (n_events, BEHAVIOR_INPUT_DIM) activity sequences
+                of any length, a dense (n_samples, seq_len, BEHAVIOR_INPUT_DIM)
+                array, or None
 
         Returns:
             NumPy array of fused embeddings
         """
-        # Encode text
-        text_emb = self.text_encoder(text_data)
+        # Encode text (description codes index the precomputed embedding table)
+        text_emb = torch.from_numpy(self.text_embeddings(text_data))
 
         # Encode numeric
-        num_tensor = torch.FloatTensor(num_data)
-        num_proj = self.num_projector(num_tensor)
-
-        # Encode behavior (if provided)
-        if beh_data is not None:
-            beh_tensor = torch.FloatTensor(beh_data)
-            beh_emb = self.beh_encoder(beh_tensor)
-            fused_emb = torch.cat([text_emb, num_proj, beh_emb], dim=1)
+        with stage('numeric_projector', rows=len(num_data)):
+            num_tensor = torch.FloatTensor(num_data)
+            num_proj = self.num_projector(num_tensor)
+
+        # Encode behavior (if provided, or the model was trained with it)
+        beh_emb = self.behavior_embeddings(beh_data, len(num_data))
+        if beh_emb is not None:
+            fused_emb = torch.cat([text_emb, num_proj, torch.from_numpy(beh_emb)], dim=1)
         else:
             # If no behavioral data, just concatenate text and numeric
             fused_emb = torch.cat([text_emb, num_proj], dim=1)
 
         return fused_emb.detach().numpy()
 
+    def encode_text(self, text_list):
+        """Run the transformer text encoder, returning a NumPy array"""
+        return self.text_encoder(text_list).numpy()
+
+    def run_behavior_encoder(self, padded, lengths):
+        """Run the GRU over packed sequences, so padding steps cost nothing"""
+        with torch.no_grad():
+            return self.beh_encoder(torch.from_numpy(padded), torch.from_numpy(lengths)).numpy()
+
     def get_fused_dim(self):
         """Get the dimension of the fused embedding"""
         if hasattr(self, '_fused_dim'):
             return self._fused_dim
-        # Default dimension (text + numeric, no behavior)
-        return TEXT_EMBED_DIM + NUM_PROJ_DIM
+        # Default dimension (text + numeric, plus behavior when trained with it)
+        return TEXT_EMBED_DIM + NUM_PROJ_DIM + (GRU_HIDDEN if self.use_behavior else 0)
 
-    def set_xgb_model(self, model):
-        """Set the trained XGBoost model"""
-        self.xgb_model = model
+    def encoder_checksum(self):
+        """
+        SHA-256 over the text model name and the projector/encoder weights.
 
-    def predict(self, text_data, num_data, beh_data=None):
+        Identifies everything that feeds encode_features, so precomputed
+        embeddings stay valid for as long as this value is unchanged.
+        """
+        digest = hashlib.sha256(TEXT_MODEL.encode())
+        if self.use_behavior:
+            digest.update(b'use_behavior')
+        for module in (self.num_projector, self.beh_encoder):
+            for name, tensor in module.state_dict().items():
+                digest.update(name.encode())
+                digest.update(tensor.detach().cpu().numpy().tobytes())
+        return digest.hexdigest()
+
+    def save_bundle(self, path, label_encoder, model_config):
         """
-        Make predictions using the full pipeline.
+        Save everything needed to rebuild this pipeline exactly.
 
-        Args:
-            text_data: List of text strings
-            num_data: NumPy array of numeric features
-            beh_data: NumPy array of behavioral features or None
+        The bundle holds the NumericProjector and BehaviorEncoder weights,
+        whether behavior embeddings are fused, the XGBoost model, the gender
+        label encoder and the model config.
+        The pre-trained text model is referenced by name.
 
         Returns:
-            Predictions and probabilities from XGBoost
+            SHA-256 checksum of the written bundle file
         """
         if self.xgb_model is None:
             raise ValueError("XGBoost model not set. Train the model first.")
 
-        # Get fused embeddings
-        fused_emb = self.encode_features(text_data, num_data, beh_data)
+        joblib.dump({
+            'format_version': BUNDLE_FORMAT_VERSION,
+            'text_model': TEXT_MODEL,
+            'num_projector': self.num_projector.state_dict(),
+            'beh_encoder': self.beh_encoder.state_dict(),
+            'use_behavior': self.use_behavior,
+            'encoder_checksum': self.encoder_checksum(),
+            'xgb_model': self.xgb_model,
+            'label_encoder': label_encoder,
+            'model_config': model_config
+        }, path)
+        return file_checksum(path)
+
+    @classmethod
+    def load_bundle(cls, path, **kwargs):
+        """
+        Restore a pipeline saved with save_bundle.
 
-        # Predict
-        predictions = self.xgb_model.predict(fused_emb)
-        probabilities = self.xgb_model.predict_proba(fused_emb)
+        Extra keyword arguments are passed to the constructor.
 
-        return predictions, probabilities
+        Returns:
+            (model, label_encoder, model_config, checksum)
+        """
+        bundle = joblib.load(path)
+        if bundle.get('format_version') != BUNDLE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported model bundle version {bundle.get('format_version')}, "
+                f"expected {BUNDLE_FORMAT_VERSION}"
+            )
+        if bundle['text_model'] != TEXT_MODEL:
+            raise ValueError(
+                f"Bundle was trained with text model {bundle['text_model']}, "
+                f"but {TEXT_MODEL} is configured"
+            )
+
+        # Bundles from before behavior sequences never fused them
+        model = cls(use_behavior=bundle.get('use_behavior', False), **kwargs)
+        model.num_projector.load_state_dict(bundle['num_projector'])
+        model.beh_encoder.load_state_dict(bundle['beh_encoder'])
+        model.set_xgb_model(bundle['xgb_model'])
+
+        if model.encoder_checksum() != bundle['encoder_checksum']:
+            raise ValueError("Restored encoder weights do not match the bundle checksum")
+
+        return model, bundle['label_encoder'], bundle['model_config'], file_checksum(path)
@@ -0,0 +1,137 @@
+"""
+ONNX Runtime inference backend for the multimodal pipeline.
+
+Loads the encoders written by export_encoders.py and runs them without
+PyTorch. Encoders that could only be exported as TorchScript fall back to
+torch.jit, which does import torch.
+"""
+import json
+import os
+import joblib
+import numpy as np
+from talent_pipeline import TalentPipeline, file_checksum
+from metrics import stage
+from service_utils import ProcessLocal
+
+EXPORT_FORMAT_VERSION = 1  # bump when the export layout changes
+MANIFEST_FILE = "manifest.json"
+SERVING_FILE = "serving.pkl"  # XGBoost head, label encoder and model config
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class ExportedEncoder:
+    """One exported encoder, run through ONNX Runtime or TorchScript"""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.format = fmt
+        # Sessions and thread pools don't survive fork, so each process builds its own
+        self._runner = ProcessLocal(self._load)
+
+    def _load(self):
+        if self.format == 'onnx':
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = int(os.environ.get('OMP_NUM_THREADS', 0))
+            options.inter_op_num_threads = 1
+            return ort.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+
+        import torch
+        return torch.jit.load(self.path)
+
+    def __call__(self, **inputs):
+        runner = self._runner.get()
+        if self.format == 'onnx':
+            return runner.run(None, inputs)[0]
+
+        import torch
+        with torch.no_grad():
+            return runner(*[torch.from_numpy(value) for value in inputs.values()]).numpy()
+
+
+class OnnxTalentModel(TalentPipeline):
+    """MultiModalTalentModel counterpart running exported encoders"""
+
+    # The exported GRU has no sequence lengths, so it runs same-length batches
+    PACKED_BEHAVIOR = False
+
+    def __init__(self, export_dir):
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(export_dir, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != EXPORT_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported encoder export version {manifest.get('format_version')}, "
+                f"expected {EXPORT_FORMAT_VERSION}"
+            )
+        super().__init__(manifest.get('use_behavior', False), manifest['behavior_dim'])
+        self.manifest = manifest
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(export_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.manifest['max_length'])
+        self.tokenizer.enable_padding(
+            pad_id=self.manifest['pad_token_id'], pad_token=self.manifest['pad_token']
+        )
+
+        self.encoders = {
+            name: ExportedEncoder(os.path.join(export_dir, entry['file']), entry['format'])
+            for name, entry in self.manifest['encoders'].items()
+        }
+
+    def encode_text(self, text_list):
+        """Tokenize and run the exported transformer, returning the CLS embeddings"""
+        with stage('tokenize', rows=len(text_list)):
+            encodings = self.tokenizer.encode_batch(list(text_list))
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        with stage('transformer', rows=len(text_list)):
+            return self.encoders['text'](input_ids=input_ids, attention_mask=attention_mask)
+
+    def encode_features(self, text_data, num_data, beh_data=None):
+        """
+        Encode all modalities and fuse them into a single embedding.
+
+        Same inputs and outputs as MultiModalTalentModel.encode_features.
+        """
+        text_emb = self.text_embeddings(text_data)
+        with stage('numeric_projector', rows=len(num_data)):
+            num_proj = self.encoders['numeric'](numeric=np.asarray(num_data, dtype=np.float32))
+
+        beh_emb = self.behavior_embeddings(beh_data, len(num_data))
+        if beh_emb is not None:
+            return np.concatenate([text_emb, num_proj, beh_emb], axis=1)
+        return np.concatenate([text_emb, num_proj], axis=1)
+
+    def run_behavior_encoder(self, padded, lengths):
+        return self.encoders['behavior'](behavior=padded)
+
+    def get_fused_dim(self):
+        """Get the dimension of the fused embedding"""
+        return (
+            self.manifest['text_embed_dim'] + self.manifest['num_proj_dim']
+            + (self.manifest['behavior_dim'] if self.use_behavior else 0)
+        )
+
+    def encoder_checksum(self):
+        """Checksum of the torch encoders this export was produced from"""
+        return self.manifest['encoder_checksum']
+
+    @classmethod
+    def load_export(cls, export_dir, **kwargs):
+        """
+        Load an export_encoders.py output directory.
+
+        Returns:
+            (model, label_encoder, model_config, checksum) like
+            MultiModalTalentModel.load_bundle, where checksum is that of the
+            bundle the export was made from
+        """
+        model = cls(export_dir, **kwargs)
+        serving = joblib.load(os.path.join(export_dir, SERVING_FILE))
+        if file_checksum(os.path.join(export_dir, SERVING_FILE)) != model.manifest['serving_checksum']:
+            raise ValueError("Exported serving artifacts do not match the manifest checksum")
+
+        model.set_xgb_model(serving['xgb_model'])
+        return model, serving['label_encoder'], serving['model_config'], model.manifest['bundle_checksum']
@@ -0,0 +1,289 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from metrics import PREDICTION_CACHE_HIT_RATIO, PREDICTION_CACHE_LOOKUPS
+
+# Cache of scored students, keyed on the model version and the exact features it scored
+PREDICTION_CACHE_SIZE = int(os.environ.get('ML_PREDICTION_CACHE_SIZE', 10000))  # entries per process (0 disables the cache)
+PREDICTION_CACHE_TTL = float(os.environ.get('ML_PREDICTION_CACHE_TTL', 3600))  # seconds an entry is reused (0 for no expiry)
+# Round features to this many decimals before scoring, so near-identical students share an entry ("" scores them exactly)
+PREDICTION_CACHE_DECIMALS = os.environ.get('ML_PREDICTION_CACHE_DECIMALS', '')
+# SQLite file shared by every worker process ("" keeps the cache in process memory only)
+PREDICTION_CACHE_PATH = os.environ.get('ML_PREDICTION_CACHE_PATH', '')
+PREDICTION_CACHE_DISK_SIZE = int(os.environ.get('ML_PREDICTION_CACHE_DISK_SIZE', 100000))  # entries across all models
+
+SQL_BATCH = 500  # keys per SELECT, below SQLite's bound parameter limit
+PRUNE_EVERY = 1000  # entries written between disk tier prunes
+
+
+class PredictionCache:
+    """
+    Positive-class probabilities of already scored students, per model version.
+
+    A key is one row of the float32 features a model scores, so two requests
+    that encode to the same features (80 and 80.0, for instance) share an
+    entry. With decimals set, rows are rounded first and the rounded row is
+    what gets scored, so a cached result is always exactly what the model
+    returns for its key. The version is part of every key, and invalidate()
+    drops the previous version's memory entries when a reload installs a new
+    one. Disk entries of old versions are left to expire, since during a
+    rolling reload other workers still read the version they serve.
+
+    Entries live in an in-process LRU (memory tier) and, when path is set,
+    in a SQLite file that all gunicorn workers share (disk tier), so a
+    student scored by one worker is a hit for the others. Disk tier errors,
+    such as a locked database, count as misses and are never raised.
+    """
+
+    def __init__(self, name, max_size=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL,
+                 decimals=PREDICTION_CACHE_DECIMALS, path=PREDICTION_CACHE_PATH,
+                 disk_size=PREDICTION_CACHE_DISK_SIZE, variant=None):
+        """
+        Args:
+            name: Model name, separating this cache's entries in a shared file
+            variant: How this process scores the model (e.g. its inference
+                backend), separating entries of workers whose probabilities
+                differ for the same model version
+            decimals: Rounding applied by quantize ("" or None for none)
+            path: SQLite file for the disk tier ("" or None for none)
+        """
+        self.name = name
+        self.scope = f"{name}/{variant}" if variant else name  # the model column of disk rows
+        self.max_size = max_size
+        self.ttl = ttl
+        self.decimals = int(decimals) if decimals not in ('', None) else None
+        self.path = path or None
+        self.disk_size = disk_size
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_errors = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._written = 0
+        self._hit_ratio = PREDICTION_CACHE_HIT_RATIO.labels(name)
+        self._lookups = {
+            result: PREDICTION_CACHE_LOOKUPS.labels(name, result)
+            for result in ('memory_hit', 'disk_hit', 'miss')
+        }
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def quantize(self, rows):
+        """The float32 rows to score and key on: rounded to decimals when set, with -0.0 as 0.0"""
+        rows = np.asarray(rows, dtype=np.float32)
+        if self.decimals is not None:
+            rows = np.round(rows, self.decimals)
+        return rows + np.float32(0)
+
+    def _keys(self, version, rows):
+        rows = np.ascontiguousarray(rows)
+        return [(version, key) for key in rows.view(f'V{rows.shape[1] * rows.itemsize}').ravel().tolist()]
+
+    def _expiry(self, now):
+        return now + self.ttl if self.ttl > 0 else float('inf')
+
+    def lookup(self, version, rows):
+        """
+        Cached positive-class probabilities of quantized rows.
+
+        Returns:
+            float32 array of len(rows), NaN where the row was not cached
+        """
+        positive = np.full(len(rows), np.nan, dtype=np.float32)
+        if not self.enabled or version is None or not len(rows):
+            return positive
+
+        keys = self._keys(version, rows)
+        now = time.time()
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    positive[i] = entry[0]
+                else:
+                    if entry is not None:
+                        del self._entries[key]
+                    missing.append(i)
+        memory_hits = len(keys) - len(missing)
+
+        disk_hits = 0
+        if missing and self.path:
+            found = self._disk_get(version, [keys[i][1] for i in missing])
+            if found:
+                promoted = []
+                for i in missing:
+                    entry = found.get(keys[i][1])
+                    if entry is not None:
+                        positive[i] = entry[0]
+                        promoted.append((keys[i], entry))
+                disk_hits = len(promoted)
+                with self._lock:
+                    for key, entry in promoted:
+                        self._entries[key] = entry
+                    self._evict()
+
+        self._count(memory_hits, disk_hits, len(missing) - disk_hits)
+        return positive
+
+    def store(self, version, rows, positive):
+        """Cache the positive-class probabilities the model returned for quantized rows"""
+        if not self.enabled or version is None or not len(rows):
+            return
+        keys = self._keys(version, rows)
+        expires = self._expiry(time.time())
+        positive = np.asarray(positive, dtype=np.float32).tolist()
+        with self._lock:
+            for key, value in zip(keys, positive):
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+            self._evict()
+        if self.path:
+            self._disk_put(version, [key for _, key in keys], positive, expires)
+
+    def predict_proba(self, version, rows, predict_proba):
+        """
+        Score quantized rows, calling predict_proba only for rows not cached.
+
+        Args:
+            predict_proba: Callable mapping rows to class probabilities of
+                shape (n, 2), as XGBClassifier.predict_proba
+
+        Returns:
+            float32 array of shape (len(rows), 2)
+        """
+        if not self.enabled or version is None:
+            return predict_proba(rows)
+
+        positive = self.lookup(version, rows)
+        missing = np.flatnonzero(np.isnan(positive))
+        if len(missing):
+            scored = predict_proba(rows[missing])[:, 1]
+            positive[missing] = scored
+            self.store(version, rows[missing], scored)
+        return np.column_stack([1 - positive, positive])
+
+    def invalidate(self, version):
+        """
+        Drop every memory entry that is not for version, e.g. once a reload
+        installed it. The disk tier keeps old versions until they expire or
+        are pruned: workers that haven't reloaded yet still look them up.
+        """
+        with self._lock:
+            self._entries = OrderedDict((key, entry) for key, entry in self._entries.items() if key[0] == version)
+
+    def _evict(self):
+        # Called with self._lock held
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _count(self, memory_hits, disk_hits, misses):
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.disk_hits += disk_hits
+            self.misses += misses
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hit_ratio = (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+        self._lookups['memory_hit'].inc(memory_hits)
+        self._lookups['disk_hit'].inc(disk_hits)
+        self._lookups['miss'].inc(misses)
+        self._hit_ratio.set(hit_ratio)
+
+    def _connection(self):
+        # One connection per thread, opened again after fork so workers never share one
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=0.05, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                " model TEXT, version TEXT, key BLOB, positive REAL, expires REAL,"
+                " PRIMARY KEY (model, version, key)) WITHOUT ROWID"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS predictions_expires ON predictions (expires)")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _disk_execute(self, sql, params=()):
+        try:
+            return self._connection().execute(sql, params)
+        except sqlite3.Error:
+            self.disk_errors += 1
+            return None
+
+    def _disk_get(self, version, keys):
+        found = {}
+        now = time.time()
+        for start in range(0, len(keys), SQL_BATCH):
+            batch = keys[start:start + SQL_BATCH]
+            cursor = self._disk_execute(
+                "SELECT key, positive, expires FROM predictions WHERE model = ? AND version = ?"
+                f" AND expires > ? AND key IN ({','.join('?' * len(batch))})",
+                (self.scope, version, now, *batch)
+            )
+            if cursor is None:
+                break
+            found.update((key, (positive, expires)) for key, positive, expires in cursor)
+        return found
+
+    def _disk_put(self, version, keys, positive, expires):
+        try:
+            connection = self._connection()
+            with self._lock:
+                self._written += len(keys)
+                prune = self._written >= PRUNE_EVERY
+                if prune:
+                    self._written = 0
+            connection.execute("BEGIN")
+            try:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)",
+                    [(self.scope, version, key, value, expires) for key, value in zip(keys, positive)]
+                )
+                if prune:
+                    # Expired entries first, then the oldest beyond disk_size
+                    connection.execute("DELETE FROM predictions WHERE expires <= ?", (time.time(),))
+                    connection.execute(
+                        "DELETE FROM predictions WHERE (model, version, key) IN ("
+                        " SELECT model, version, key FROM predictions ORDER BY expires"
+                        " LIMIT max(0, (SELECT count(*) FROM predictions) - ?))",
+                        (self.disk_size,)
+                    )
+                connection.execute("COMMIT")
+            except sqlite3.Error:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            self.disk_errors += 1
+
+    def stats(self):
+        """Counters for /health"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "decimals": self.decimals,
+                "disk_path": self.path,
+                "scope": self.scope,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_errors": self.disk_errors,
+                "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else None
+            }
@@ -0,0 +1,118 @@
+"""
+Measure dynamic int8 quantization of the TextEncoder against fp32.
+
+    python quantize_report.py [--bundle multimodal_bundle.pkl] [--tolerance 0.01]
+
+Loads each variant in a fresh process and reports the text model's
+serialized weight size, how much the process's resident memory (RSS) grew
+to load and run the model, and forward latency, then re-scores the held-out
+split saved by train_multimodal_model.py with both. Exits non-zero if
+quantized accuracy falls more than --tolerance below fp32.
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+import torch
+from sklearn.metrics import accuracy_score
+from multimodal_model import MultiModalTalentModel
+from talent_pipeline import BUNDLE_PATH
+from text_features import DESCRIPTIONS
+from behavior_features import split_steps
+
+HOLDOUT_PATH = "multimodal_holdout.npz"
+ACCURACY_TOLERANCE = 0.01  # max allowed absolute accuracy drop
+LATENCY_BATCH_SIZE = 32
+LATENCY_REPEATS = 20
+
+
+def weights_mb(module):
+    """Serialized state_dict size, which counts packed int8 weights correctly"""
+    buffer = io.BytesIO()
+    torch.save(module.state_dict(), buffer)
+    return buffer.tell() / 1e6
+
+
+def text_latency_ms(model, batch_size=LATENCY_BATCH_SIZE, repeats=LATENCY_REPEATS):
+    """Median transformer forward time for one batch, bypassing the description table"""
+    texts = (list(DESCRIPTIONS) * (batch_size // len(DESCRIPTIONS) + 1))[:batch_size]
+    model.encode_text(texts)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.encode_text(texts)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def holdout_accuracy(model, holdout):
+    # Activity sequences are only saved when the model was trained with them
+    sequences = None
+    if 'behavior_lengths' in holdout:
+        sequences = split_steps(holdout['behavior_steps'], holdout['behavior_lengths'])
+    predictions, _ = model.predict_batch(holdout['codes'], holdout['numeric'], sequences)
+    return accuracy_score(holdout['labels'], predictions)
+
+
+def resident_mb():
+    """Current resident set size of this process (Linux)"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+
+
+def measure_variant(bundle_path, holdout_path, quantize):
+    """Load, time and score one variant; runs in its own process so RSS growth is its own"""
+    holdout = np.load(holdout_path)
+    # Imported up front so the library's own memory is not counted as the model's
+    from transformers import AutoModel, AutoTokenizer  # noqa: F401
+    rss_before = resident_mb()
+    model, _, _, _ = MultiModalTalentModel.load_bundle(bundle_path, quantize_text=quantize)
+    latency_ms = text_latency_ms(model)
+    return {
+        'weights_mb': weights_mb(model.text_encoder.model),
+        'rss_mb': resident_mb() - rss_before,
+        'latency_ms': latency_ms,
+        'accuracy': holdout_accuracy(model, holdout)
+    }
+
+
+def _measure_in_child(bundle_path, holdout_path, quantize, queue):
+    queue.put(measure_variant(bundle_path, holdout_path, quantize))
+
+
+def report(bundle_path, holdout_path):
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+    for name, quantize in (('fp32', False), ('int8', True)):
+        queue = ctx.Queue()
+        process = ctx.Process(target=_measure_in_child, args=(bundle_path, holdout_path, quantize, queue))
+        process.start()
+        results[name] = queue.get()
+        process.join()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bundle', default=BUNDLE_PATH)
+    parser.add_argument('--holdout', default=HOLDOUT_PATH)
+    parser.add_argument('--tolerance', type=float, default=ACCURACY_TOLERANCE)
+    args = parser.parse_args()
+
+    results = report(args.bundle, args.holdout)
+    fp32, int8 = results['fp32'], results['int8']
+
+    print(f"{'':<12}{'fp32':>12}{'int8':>12}")
+    print(f"{'weights MB':<12}{fp32['weights_mb']:>12.1f}{int8['weights_mb']:>12.1f}   (serialized text model)")
+    print(f"{'RSS MB':<12}{fp32['rss_mb']:>12.1f}{int8['rss_mb']:>12.1f}   (resident memory added by loading and running)")
+    print(f"{'latency ms':<12}{fp32['latency_ms']:>12.2f}{int8['latency_ms']:>12.2f}   (batch of {LATENCY_BATCH_SIZE})")
+    print(f"{'accuracy':<12}{fp32['accuracy']:>12.4f}{int8['accuracy']:>12.4f}")
+
+    drop = fp32['accuracy'] - int8['accuracy']
+    if drop > args.tolerance:
+        print(f"❌ Accuracy dropped {drop:.4f}, more than the {args.tolerance:.4f} tolerance")
+        sys.exit(1)
+    print(f"✅ Accuracy drop {drop:.4f} within {args.tolerance:.4f} tolerance")
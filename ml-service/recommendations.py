@@ -0,0 +1,69 @@
+import os
+import numpy as np
+
+# Recommendation tiers on P(STEM potential): advanced at or above ADVANCED_THRESHOLD,
+# intermediate strictly between the two thresholds, beginner otherwise
+ADVANCED_THRESHOLD = float(os.environ.get('ML_ADVANCED_THRESHOLD', 0.6))
+INTERMEDIATE_THRESHOLD = float(os.environ.get('ML_INTERMEDIATE_THRESHOLD', 0.4))
+
+# Indexed by tier code (see tier_codes)
+TIERS = (
+    {
+        "recommendation": "beginner",
+        "message": "Suggest exposure to beginner STEM experiences.",
+        "next_steps": [
+            "Introduce foundational STEM concepts",
+            "Provide hands-on activities",
+            "Build interest through games",
+            "Connect with supportive community"
+        ]
+    },
+    {
+        "recommendation": "intermediate",
+        "message": "Ask more about recent projects or favorite STEM subjects.",
+        "next_steps": [
+            "Explore recent STEM projects",
+            "Identify favorite STEM subjects",
+            "Assess hands-on experience"
+        ]
+    },
+    {
+        "recommendation": "advanced",
+        "message": "Recommend advanced STEM pathway and mentorship.",
+        "next_steps": [
+            "Connect with STEM mentors",
+            "Enroll in advanced courses",
+            "Participate in competitions",
+            "Join research programs"
+        ]
+    }
+)
+TIER_NAMES = tuple(tier["recommendation"] for tier in TIERS)
+
+
+def tier_codes(probabilities, threshold=ADVANCED_THRESHOLD):
+    """
+    Vectorized tier lookup.
+
+    Returns:
+        Integer array indexing TIERS, one code per probability
+    """
+    probabilities = np.asarray(probabilities)
+    return np.where(
+        probabilities >= threshold, 2,
+        np.where(probabilities > INTERMEDIATE_THRESHOLD, 1, 0)
+    )
+
+
+def adaptive_questioning(proba, threshold=ADVANCED_THRESHOLD):
+    """
+    Provide adaptive recommendations based on STEM potential probability.
+
+    Returns the shared tier dict, so callers must not modify it.
+    """
+    if INTERMEDIATE_THRESHOLD < proba < threshold:
+        return TIERS[1]
+    elif proba >= threshold:
+        return TIERS[2]
+    else:
+        return TIERS[0]
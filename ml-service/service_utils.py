@@ -0,0 +1,63 @@
+import os
+import threading
+import time
+
+# CPU threads one model may use in this process, set in each gunicorn worker
+# by wsgi.pin_threads (None keeps the libraries' defaults)
+_thread_limit = None
+
+
+def utc_timestamp():
+    """Current UTC time as ISO 8601 to the second, e.g. 2024-09-02T14:05:00Z"""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+class ProcessLocal:
+    """
+    A resource built on first use, and built again in every forked process.
+
+    gunicorn preloads the app in the master and forks the workers from it,
+    and threads, thread pools and runtime sessions don't survive a fork. So
+    the executors, watcher threads and sessions of the service are created
+    lazily through get(), which gives each worker its own.
+    """
+
+    def __init__(self, factory):
+        """
+        Args:
+            factory: Callable building the resource, called once per process
+        """
+        self.factory = factory
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def created(self):
+        """Whether this process has built the resource yet"""
+        return self._pid == os.getpid()
+
+    def get(self):
+        if not self.created:
+            with self._lock:
+                if not self.created:
+                    self._value = self.factory()
+                    self._pid = os.getpid()
+        return self._value
+
+
+def set_thread_limit(n_threads):
+    global _thread_limit
+    _thread_limit = n_threads
+
+
+def limit_threads(xgb_model):
+    """
+    Apply the thread limit to an XGBoost model, e.g. one a reload just built.
+
+    Models without set_params (such as a CompiledForest) are single-threaded
+    and returned as they are.
+    """
+    if _thread_limit is not None and hasattr(xgb_model, 'set_params'):
+        xgb_model.set_params(n_jobs=_thread_limit)
+    return xgb_model
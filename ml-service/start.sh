@@ -1,6 +1,7 @@
 #!/bin/bash
 
 # Start the ML service
+# ML_SERVICE_APP=baseline|multimodal|router selects the model, see gunicorn.conf.py for tuning
 cd "$(dirname "$0")"
 source venv/bin/activate
-python app.py
+exec gunicorn -c gunicorn.conf.py wsgi:app
@@ -0,0 +1,162 @@
+"""
+Synthetic student cohorts for training, benchmarks and stress tests.
+
+    python synthetic_cohort.py students.parquet [--rows 10000000] [--seed 42]
+                               [--population-genders] [--positive-rate 0.5]
+
+Rows are generated a chunk at a time with NumPy, so a 10M-row cohort streams
+to Parquet in bounded memory. Class and gender balance are set by the draw
+probabilities instead of resampling, so no student is duplicated.
+"""
+import argparse
+import os
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+# Sorted, so category codes equal LabelEncoder codes
+GENDERS = ('Female', 'Male', 'Non-Binary')
+POPULATION_GENDER_P = (0.45, 0.45, 0.10)  # as observed
+BALANCED_GENDER_P = (1 / 3, 1 / 3, 1 / 3)  # what training balances to
+
+# Score distributions as (mean, std), and the weights of the latent STEM potential
+SCORE_DISTRIBUTIONS = {'math_score': (75, 10), 'science_score': (72, 12), 'project_score': (70, 15)}
+POTENTIAL_WEIGHTS = {'math_score': 0.4, 'science_score': 0.4, 'project_score': 0.2}
+POTENTIAL_NOISE = 5
+
+CHUNK_SIZE = int(os.environ.get('ML_COHORT_CHUNK_SIZE', 1_000_000))
+
+# Synthetic activity logs (see generate_activity), shaped like the Node API's ActivityLog documents
+EVENT_TYPES = ('user.login', 'lesson.completed', 'quiz.submitted', 'project.submitted')
+ACTIVITY_START = np.datetime64('2024-09-02T08:00:00')  # first possible event
+ACTIVE_RATE = 0.8  # share of students with any logged activity
+MEAN_EVENTS = (4, 40)  # expected events for the lowest and highest potential
+
+
+def label_threshold(positive_rate=0.5):
+    """
+    Latent potential cut-off giving the requested share of positive labels.
+
+    The potential is a weighted sum of independent normals, so its quantiles
+    are known in closed form and every chunk can be labelled on its own
+    (the old per-dataset median is the positive_rate=0.5 case).
+    """
+    mean = sum(POTENTIAL_WEIGHTS[f] * SCORE_DISTRIBUTIONS[f][0] for f in POTENTIAL_WEIGHTS)
+    variance = sum((POTENTIAL_WEIGHTS[f] * SCORE_DISTRIBUTIONS[f][1]) ** 2 for f in POTENTIAL_WEIGHTS)
+    std = (variance + POTENTIAL_NOISE ** 2) ** 0.5
+    return NormalDist(mean, std).inv_cdf(1 - positive_rate)
+
+
+def _generate_chunk(rng, start, size, gender_p, threshold):
+    columns = {'id': np.arange(start, start + size, dtype=np.int64)}
+    potential = rng.normal(0, POTENTIAL_NOISE, size)
+    for field, (mean, std) in SCORE_DISTRIBUTIONS.items():
+        columns[field] = rng.normal(mean, std, size)
+        potential += POTENTIAL_WEIGHTS[field] * columns[field]
+
+    columns['gender'] = pd.Categorical.from_codes(rng.choice(len(GENDERS), size, p=gender_p), GENDERS)
+    columns['socioeconomic_index'] = rng.uniform(0, 1, size)
+    columns['stem_potential'] = potential
+    columns['stem_potential_label'] = (potential > threshold).astype(np.int8)
+    return pd.DataFrame(columns)
+
+
+def iter_cohort(n, seed=42, gender_p=BALANCED_GENDER_P, positive_rate=0.5, chunk_size=CHUNK_SIZE):
+    """
+    Yield a synthetic cohort of n students as DataFrames of at most chunk_size rows.
+
+    Columns: id, math_score, science_score, project_score, gender (categorical
+    over GENDERS), socioeconomic_index, stem_potential, stem_potential_label.
+    Each chunk draws from its own child of seed, so output is reproducible for
+    a given (n, seed, chunk_size).
+    """
+    threshold = label_threshold(positive_rate)
+    starts = range(0, n, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    for start, chunk_seed in zip(starts, seeds):
+        size = min(chunk_size, n - start)
+        yield _generate_chunk(np.random.default_rng(chunk_seed), start, size, gender_p, threshold)
+
+
+def generate_cohort(n, seed=42, gender_p=BALANCED_GENDER_P, positive_rate=0.5, chunk_size=CHUNK_SIZE):
+    """The whole cohort of iter_cohort as one DataFrame"""
+    chunks = list(iter_cohort(n, seed, gender_p, positive_rate, chunk_size))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def generate_activity(cohort, seed=42, active_rate=ACTIVE_RATE):
+    """
+    Activity log of every student in a cohort, as lists of ActivityLog documents.
+
+    Students with a higher latent potential log more events, more of them
+    quizzes and projects, with higher quiz scores; the rest of the cohort
+    (1 - active_rate) has no activity at all. Lengths vary from none to
+    dozens of events, like real logs.
+
+    Returns:
+        List with one list of {"eventType", "createdAt", "payload"} dicts per row of cohort
+    """
+    rng = np.random.default_rng(seed)
+    potential = cohort['stem_potential'].to_numpy()
+    # Potential as a percentile-like engagement level in (0, 1)
+    engagement = 1 / (1 + np.exp(-(potential - potential.mean()) / max(potential.std(), 1e-9)))
+    active = rng.random(len(cohort)) < active_rate
+    n_events = np.where(active, 1 + rng.poisson(MEAN_EVENTS[0] + engagement * (MEAN_EVENTS[1] - MEAN_EVENTS[0])), 0)
+    math_scores = cohort['math_score'].to_numpy()
+
+    logs = []
+    for student, count in enumerate(n_events.tolist()):
+        level = engagement[student]
+        type_p = np.array([0.4 - 0.2 * level, 0.3, 0.2 + 0.1 * level, 0.1 + 0.1 * level])
+        types = rng.choice(len(EVENT_TYPES), count, p=type_p / type_p.sum())
+        # More engaged students come back sooner
+        gaps = rng.exponential(3600 * (6 + 42 * (1 - level)), count)
+        times = ACTIVITY_START + (rng.uniform(0, 86400 * 14) + np.cumsum(gaps)).astype('timedelta64[s]')
+        scores = np.clip(rng.normal(math_scores[student], 10, count), 0, 100).round()
+        durations = rng.exponential(900, count).round()
+
+        events = []
+        for event_type, time, score, duration in zip(types.tolist(), times, scores.tolist(), durations.tolist()):
+            payload = {}
+            if event_type == 2:
+                payload = {'score': score, 'durationSeconds': duration}
+            elif event_type in (1, 3):
+                payload = {'durationSeconds': duration}
+            events.append({'eventType': EVENT_TYPES[event_type], 'createdAt': f"{time}Z", 'payload': payload})
+        logs.append(events)
+    return logs
+
+
+def write_parquet(path, n, seed=42, gender_p=BALANCED_GENDER_P, positive_rate=0.5, chunk_size=CHUNK_SIZE):
+    """Stream a cohort to a Parquet file one chunk (row group) at a time"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in iter_cohort(n, seed, gender_p, positive_rate, chunk_size):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help='Parquet file to write')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--population-genders', action='store_true',
+                        help=f'draw genders as observed {POPULATION_GENDER_P} instead of balanced')
+    parser.add_argument('--positive-rate', type=float, default=0.5)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    gender_p = POPULATION_GENDER_P if args.population_genders else BALANCED_GENDER_P
+    write_parquet(args.output, args.rows, args.seed, gender_p, args.positive_rate, args.chunk_size)
+    print(f"✅ Wrote {args.rows} synthetic students to {args.output}")
@@ -0,0 +1,226 @@
+import hashlib
+import threading
+import time
+import numpy as np
+from batch_engine import predict_from_proba
+from behavior_features import BEHAVIOR_BATCH_SIZE, EMPTY_STEPS, length_buckets, pad_sequences, sequence_lengths
+from metrics import stage
+from text_features import DESCRIPTIONS
+
+# Shared by every inference backend; nothing here imports torch
+ENCODE_BATCH_SIZE = 64  # rows per encoder forward pass in batched inference
+DESCRIPTION_CODES = {text: code for code, text in enumerate(DESCRIPTIONS)}  # text -> description table row
+
+# Multimodal artifacts, relative to the service directory
+BUNDLE_PATH = "multimodal_bundle.pkl"  # written by train_multimodal_model.py
+EXPORT_DIR = "encoders_export"  # written by export_encoders.py
+
+
+def file_checksum(path):
+    """SHA-256 of a file's bytes, used as the model version of a saved bundle"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TalentPipeline:
+    """
+    Backend-independent part of the multimodal pipeline: the description
+    embedding table, mini-batching and the XGBoost head.
+
+    Subclasses provide encode_text, encode_features, run_behavior_encoder,
+    get_fused_dim and encoder_checksum for a specific encoder runtime.
+    """
+
+    # run_behavior_encoder takes lengths (packed sequences); otherwise batches
+    # hold sequences of one length only, so no step is padding
+    PACKED_BEHAVIOR = True
+
+    def __init__(self, use_behavior=False, behavior_dim=None):
+        """
+        Args:
+            use_behavior: Whether the XGBoost head was trained on behavior
+                embeddings, which are then part of every fused embedding
+            behavior_dim: Size of one behavior embedding
+        """
+        self._description_table = None
+        self._table_seconds = None
+        self._table_lock = threading.Lock()
+        self.xgb_model = None
+        self.load_timings = {}
+        self.use_behavior = use_behavior
+        self.behavior_dim = behavior_dim
+
+    def encode_text(self, text_list):
+        """Run the text encoder, returning a NumPy array of shape (batch_size, TEXT_EMBED_DIM)"""
+        raise NotImplementedError
+
+    def encode_features(self, text_data, num_data, beh_data=None):
+        raise NotImplementedError
+
+    def run_behavior_encoder(self, padded, lengths):
+        """Embed one (batch, steps, STEP_DIM) batch of non-empty sequences, returning a NumPy array"""
+        raise NotImplementedError
+
+    def encode_behavior(self, sequences):
+        """
+        Embed per-student activity sequences of any length (see behavior_features).
+
+        Sequences are bucketed by length, so an encoder call pads only to the
+        longest sequence of its bucket and compute follows the real events.
+        An empty log embeds as zeros, the GRU's initial state.
+
+        Args:
+            sequences: List of (n_events, STEP_DIM) arrays, or a dense
+                (n_samples, seq_len, STEP_DIM) array; None entries are empty
+
+        Returns:
+            float32 array of shape (len(sequences), behavior_dim)
+        """
+        sequences = [EMPTY_STEPS if sequence is None else sequence for sequence in sequences]
+        lengths = sequence_lengths(sequences)
+        embeddings = np.zeros((len(sequences), self.behavior_dim), dtype=np.float32)
+        for bucket in length_buckets(lengths, BEHAVIOR_BATCH_SIZE, exact=not self.PACKED_BEHAVIOR):
+            bucket = bucket[lengths[bucket] > 0]
+            if len(bucket):
+                padded, bucket_lengths = pad_sequences([sequences[i] for i in bucket])
+                embeddings[bucket] = self.run_behavior_encoder(padded, bucket_lengths)
+        return embeddings
+
+    def behavior_embeddings(self, beh_data, n_samples):
+        """
+        Behavior part of n_samples fused embeddings, or None when it has none:
+        models trained with behavior embed a missing beh_data as empty logs
+        """
+        if beh_data is None and not self.use_behavior:
+            return None
+        with stage('behavior_encoder', rows=n_samples):
+            return self.encode_behavior(beh_data if beh_data is not None else [None] * n_samples)
+
+    def get_fused_dim(self):
+        raise NotImplementedError
+
+    def encoder_checksum(self):
+        raise NotImplementedError
+
+    def description_table(self):
+        """
+        Embedding of every text_features.DESCRIPTIONS entry, indexed by
+        description code. Built by one encoder pass on first use.
+        """
+        if self._description_table is None:
+            with self._table_lock:
+                if self._description_table is None:
+                    start = time.perf_counter()
+                    self._description_table = self.encode_text(list(DESCRIPTIONS))
+                    self._table_seconds = time.perf_counter() - start
+        return self._description_table
+
+    def description_table_stats(self):
+        """Size and build time of the description table for /health"""
+        built = self._description_table is not None
+        return {
+            "built": built,
+            "size": len(DESCRIPTIONS) if built else 0,
+            "build_seconds": round(self._table_seconds, 3) if built else None
+        }
+
+    def text_embeddings(self, text_data):
+        """
+        Text embeddings for text_data, which is either an integer array of
+        description codes (a row lookup in description_table) or a list of
+        text. Texts from DESCRIPTIONS are looked up in the table too; only
+        other free text runs the encoder.
+        """
+        if isinstance(text_data, np.ndarray) and text_data.dtype.kind in 'iu':
+            return self.description_table()[text_data]
+
+        codes = [DESCRIPTION_CODES.get(text) for text in text_data]
+        embeddings = self.description_table()[[0 if code is None else code for code in codes]]
+        free = [i for i, code in enumerate(codes) if code is None]
+        if free:
+            embeddings[free] = self.encode_text([text_data[i] for i in free])
+        return embeddings
+
+    def set_xgb_model(self, model):
+        """Set the trained XGBoost model"""
+        self.xgb_model = model
+
+    def predict(self, text_data, num_data, beh_data=None):
+        """
+        Make predictions using the full pipeline.
+
+        Args:
+            text_data: Description codes or list of text strings
+            num_data: NumPy array of numeric features
+            beh_data: Activity sequences (see encode_behavior) or None
+
+        Returns:
+            Predictions and probabilities from XGBoost
+        """
+        if self.xgb_model is None:
+            raise ValueError("XGBoost model not set. Train the model first.")
+
+        # Get fused embeddings
+        fused_emb = self.encode_features(text_data, num_data, beh_data)
+
+        # Predict
+        with stage('xgboost', rows=len(fused_emb)):
+            predictions = self.xgb_model.predict(fused_emb)
+            probabilities = self.xgb_model.predict_proba(fused_emb)
+
+        return predictions, probabilities
+
+    def encode_features_batched(self, text_data, num_data, beh_data=None, batch_size=ENCODE_BATCH_SIZE):
+        """
+        Encode a large cohort through encode_features in fixed-size mini-batches.
+
+        Keeps tokenizer padding and transformer activations bounded by
+        batch_size instead of the whole cohort. With activity sequences,
+        rows are encoded in order of sequence length, so each mini-batch
+        holds logs of similar length.
+
+        Returns:
+            NumPy array of fused embeddings, stacked in input order
+        """
+        order = None
+        if beh_data is not None and len(beh_data) > batch_size:
+            order = np.argsort(sequence_lengths(beh_data), kind='stable')
+            text_data = text_data[order] if isinstance(text_data, np.ndarray) else [text_data[i] for i in order]
+            num_data = np.asarray(num_data)[order]
+            beh_data = [beh_data[i] for i in order]
+
+        chunks = []
+        for start in range(0, len(text_data), batch_size):
+            end = start + batch_size
+            chunks.append(self.encode_features(
+                text_data[start:end],
+                num_data[start:end],
+                beh_data[start:end] if beh_data is not None else None
+            ))
+
+        if not chunks:
+            return np.empty((0, self.get_fused_dim()), dtype=np.float32)
+        fused_emb = np.concatenate(chunks)
+        if order is not None:
+            fused_emb[order] = fused_emb.copy()
+        return fused_emb
+
+    def predict_batch(self, text_data, num_data, beh_data=None, batch_size=ENCODE_BATCH_SIZE):
+        """
+        Batched counterpart of predict: encode in mini-batches, then run
+        XGBoost once over the stacked embeddings.
+
+        Returns:
+            Predictions and probabilities from XGBoost
+        """
+        if self.xgb_model is None:
+            raise ValueError("XGBoost model not set. Train the model first.")
+
+        fused_emb = self.encode_features_batched(text_data, num_data, beh_data, batch_size)
+        with stage('xgboost', rows=len(fused_emb)):
+            probabilities = self.xgb_model.predict_proba(fused_emb)
+
+        return predict_from_proba(probabilities), probabilities
@@ -0,0 +1,60 @@
+import os
+import sys
+import joblib
+import numpy as np
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_cohort import generate_cohort  # noqa: E402
+from train_config import fit_classifier, split_validation  # noqa: E402
+
+FEATURE_COLUMNS = ['math_score', 'science_score', 'project_score', 'gender_encoded', 'socioeconomic_index']
+
+
+def cohort_features(n, seed=0):
+    """(X, y, label_encoder) for a synthetic cohort, encoded as train_model.py does"""
+    cohort = generate_cohort(n, seed=seed)
+    label_encoder = LabelEncoder().fit(cohort['gender'].cat.categories)
+    cohort['gender_encoded'] = cohort['gender'].cat.codes
+    X = cohort[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    return X, cohort['stem_potential_label'].to_numpy(), label_encoder
+
+
+def students_from(X, label_encoder):
+    """Request dicts for the rows of a cohort_features matrix"""
+    return [
+        {
+            'id': i,
+            'math_score': float(row[0]),
+            'science_score': float(row[1]),
+            'project_score': float(row[2]),
+            'gender': str(label_encoder.classes_[int(row[3])]),
+            'socioeconomic_index': float(row[4])
+        }
+        for i, row in enumerate(X)
+    ]
+
+
+@pytest.fixture(scope='session')
+def baseline_dir(tmp_path_factory):
+    """A directory holding a small baseline model and label encoder, as train_model.py writes them"""
+    directory = tmp_path_factory.mktemp('baseline')
+    X, y, label_encoder = cohort_features(800)
+    X_fit, X_val, y_fit, y_val = split_validation(X, y, seed=0)
+    model, _ = fit_classifier(X_fit, y_fit, X_val, y_val, max_rounds=30)
+    joblib.dump(model, directory / 'stem_talent_model.pkl')
+    joblib.dump(label_encoder, directory / 'label_encoder.pkl')
+    return directory
+
+
+@pytest.fixture(scope='module')
+def baseline_app(baseline_dir, tmp_path_factory):
+    """app.py serving the baseline_dir model, with jobs written to a scratch directory"""
+    import app
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(baseline_dir)
+        patch.setattr(app.jobs, 'job_dir', str(tmp_path_factory.mktemp('jobs')))
+        app.load_model()
+        yield app
@@ -0,0 +1,106 @@
+import json
+import numpy as np
+import pytest
+from batch_engine import NUMERIC_ERROR, encode_students
+from conftest import cohort_features, students_from
+
+
+@pytest.fixture(scope='module')
+def client(baseline_app):
+    return baseline_app.app.test_client()
+
+
+@pytest.fixture(scope='module')
+def students():
+    X, _, label_encoder = cohort_features(60, seed=7)
+    return students_from(X, label_encoder)
+
+
+def test_batch_matches_single_predictions(client, students):
+    response = client.post('/batch-predict', json={'students': students})
+    assert response.status_code == 200
+    batch = response.get_json()['predictions']
+
+    for student, row in zip(students, batch):
+        single = client.post('/predict', json=student).get_json()
+        assert row == {'student_id': student['id'], **single}
+
+
+def test_stream_matches_batch(client, students):
+    body = b''.join(json.dumps(student).encode() + b'\n' for student in students)
+    streamed = [json.loads(line) for line in client.post('/batch-predict/stream', data=body).data.splitlines()]
+    assert streamed == client.post('/batch-predict', json={'students': students}).get_json()['predictions']
+
+
+def test_invalid_rows_keep_their_index(baseline_app, client, students):
+    classes = list(baseline_app.label_encoder.classes_)
+    cohort = [
+        students[0],
+        {**students[1], 'math_score': None},
+        {**students[2], 'gender': 'Unknown'},
+        students[3],
+        {**students[4], 'science_score': [80]},
+        'not a record',
+        {k: v for k, v in students[5].items() if k != 'project_score'},
+        students[6]
+    ]
+    rows = client.post('/batch-predict', json={'students': cohort}).get_json()['predictions']
+
+    assert [row.get('error') for row in rows] == [
+        None,
+        "Missing required fields",
+        f"Invalid gender value. Must be one of: {classes}",
+        None,
+        NUMERIC_ERROR,
+        "Invalid student record",
+        "Missing required fields",
+        None
+    ]
+    assert [row['student_id'] for row in rows] == [0, 1, 2, 3, 4, None, 5, 6]
+    for i in (0, 3, 7):
+        assert rows[i]['confidence'] == client.post('/predict', json=cohort[i]).get_json()['confidence']
+
+
+@pytest.mark.parametrize('value', [
+    "80", "80.5", True, "", {"score": 80},
+    10 ** 400, 1e39, float('nan'), float('inf'), float('-inf')
+])
+def test_non_numbers_are_rejected_not_coerced(baseline_app, client, students, value):
+    student = {**students[0], 'math_score': value}
+
+    _, valid_idx, errors = encode_students([student], baseline_app.label_encoder)
+    assert len(valid_idx) == 0
+    assert errors == {0: NUMERIC_ERROR}
+
+    response = client.post('/predict', json=student)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': NUMERIC_ERROR}
+
+
+def test_integer_and_float_scores_encode_alike(baseline_app, students):
+    as_float = {**students[0], 'math_score': 80.0}
+    as_int = {**students[0], 'math_score': 80}
+    features, valid_idx, errors = encode_students([as_float, as_int], baseline_app.label_encoder)
+    assert not errors and valid_idx.tolist() == [0, 1]
+    np.testing.assert_array_equal(features[0], features[1])
+
+
+@pytest.mark.parametrize('endpoint', ['/batch-predict', '/jobs'])
+@pytest.mark.parametrize('payload, message', [
+    ({'students': 'abc'}, "students must be a list of student records"),
+    ({'students': {'0': {}}}, "students must be a list of student records"),
+    ([{'math_score': 80}], "students must be a list of student records"),
+    ({'students': []}, "No students provided"),
+    ({}, "No students provided")
+])
+def test_non_list_students_are_rejected(client, endpoint, payload, message):
+    response = client.post(endpoint, json=payload)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': message}
+
+
+def test_stream_reports_bad_lines_per_record(client, students):
+    body = b'\n'.join([json.dumps(students[0]).encode(), b'[1, 2]', b'"abc"', b'{not json'])
+    rows = [json.loads(line) for line in client.post('/batch-predict/stream', data=body).data.splitlines()]
+    assert 'confidence' in rows[0]
+    assert rows[1:] == [{'student_id': None, 'error': "Invalid student record"}] * 3
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from bulk_score import bulk_score
+from conftest import cohort_features, students_from
+
+
+def test_missing_model_fails_before_starting_workers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    X, _, label_encoder = cohort_features(5)
+    pd.DataFrame(students_from(X, label_encoder)).to_csv('students.csv', index=False)
+    with pytest.raises(FileNotFoundError, match="No baseline model"):
+        bulk_score('students.csv', 'scores.parquet', 'baseline', workers=2)
+    assert not (tmp_path / 'scores.parquet').exists()
+
+
+def test_scores_match_the_service(baseline_app, tmp_path):
+    X, _, label_encoder = cohort_features(50, seed=2)
+    pd.DataFrame(students_from(X, label_encoder)).to_csv(tmp_path / 'students.csv', index=False)
+
+    rows = bulk_score(str(tmp_path / 'students.csv'), str(tmp_path / 'scores.parquet'), 'baseline', workers=1)
+    scores = pq.read_table(tmp_path / 'scores.parquet').to_pandas()
+    assert rows == len(scores) == 50
+    assert scores['id'].tolist() == [str(i) for i in range(50)]
+    np.testing.assert_allclose(scores['confidence'], baseline_app.active.model.predict_proba(X)[:, 1], atol=1e-6)
@@ -0,0 +1,59 @@
+import shutil
+import joblib
+import pytest
+import service_utils
+from hot_reload import ModelReloader, ReloadInProgress
+
+
+@pytest.fixture
+def app_dir(baseline_app, baseline_dir, tmp_path, monkeypatch):
+    """A scratch copy of the baseline artifacts for the app to reload from, so tests can change them"""
+    for name in ('stem_talent_model.pkl', 'label_encoder.pkl'):
+        shutil.copy(baseline_dir / name, tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_reload_swaps_the_snapshot(baseline_app, app_dir):
+    before = baseline_app.active
+    # Same trees, saved again with a different parameter: a new version
+    model = joblib.load(app_dir / 'stem_talent_model.pkl')
+    model.set_params(verbosity=0)
+    joblib.dump(model, app_dir / 'stem_talent_model.pkl')
+
+    record = baseline_app.reloader.reload('test')
+    assert record['status'] == 'succeeded'
+    assert baseline_app.active is not before
+    assert baseline_app.active.version == record['version'] != before.version
+
+
+def test_failed_reload_keeps_serving(baseline_app, app_dir):
+    before = baseline_app.active
+    (app_dir / 'stem_talent_model.pkl').write_bytes(b'corrupt')
+    with pytest.raises(Exception):
+        baseline_app.reloader.reload('test')
+    assert baseline_app.active is before
+    assert baseline_app.reloader.stats()['last']['status'] == 'failed'
+
+
+def test_reloaded_model_gets_the_worker_thread_limit(baseline_app, monkeypatch):
+    # XGBoost serving, as with ML_COMPILED_PREDICTOR=false
+    monkeypatch.setattr(baseline_app, 'COMPILED_PREDICTOR', False)
+    monkeypatch.setattr(service_utils, '_thread_limit', 2)
+
+    baseline_app.reloader.reload('test')
+    assert baseline_app.active.model.get_params()['n_jobs'] == 2
+
+
+def test_concurrent_reload_is_refused():
+    started = []
+
+    def build(previous):
+        started.append(previous)
+        with pytest.raises(ReloadInProgress):
+            reloader.reload('nested')
+        return object()
+
+    reloader = ModelReloader('reload_test', build, lambda snapshot: None, lambda snapshot: None, [])
+    assert reloader.reload('test')['status'] == 'succeeded'
+    assert started == [None]
@@ -0,0 +1,50 @@
+import time
+import pytest
+from job_queue import JobQueue, JobQueueFull
+
+
+def score(students):
+    return [b'{"student_id":%d}' % student['id'] for student in students]
+
+
+def wait_until_idle(jobs, timeout=5):
+    deadline = time.time() + timeout
+    while jobs.stats()['active'] and time.time() < deadline:
+        time.sleep(0.01)
+    return jobs.stats()['active']
+
+
+def test_job_results_are_written_in_order(tmp_path):
+    jobs = JobQueue(score, job_dir=str(tmp_path), chunk_size=3)
+    status = jobs.submit([{'id': i} for i in range(10)])
+
+    assert wait_until_idle(jobs) == 0
+    assert jobs.status(status['job_id'])['status'] == 'succeeded'
+    with open(jobs.results_path(status['job_id'])) as f:
+        assert f.read() == '{"predictions":[' + ','.join(f'{{"student_id":{i}}}' for i in range(10)) + ']}'
+
+
+def test_pending_limit(tmp_path):
+    jobs = JobQueue(lambda students: time.sleep(0.2) or score(students), job_dir=str(tmp_path), max_pending=2)
+    jobs.submit([{'id': 0}])
+    jobs.submit([{'id': 1}])
+    with pytest.raises(JobQueueFull):
+        jobs.submit([{'id': 2}])
+    assert wait_until_idle(jobs) == 0
+
+
+def test_failed_submit_releases_its_slot(tmp_path):
+    blocker = tmp_path / 'not_a_directory'
+    blocker.write_text('')
+    jobs = JobQueue(score, job_dir=str(blocker), max_pending=2)
+
+    # More failures than max_pending: none of them may hold a slot
+    for _ in range(3):
+        with pytest.raises(OSError):
+            jobs.submit([{'id': 0}])
+    assert jobs.stats()['active'] == 0
+
+    jobs.job_dir = str(tmp_path / 'jobs')
+    status = jobs.submit([{'id': 0}])
+    assert wait_until_idle(jobs) == 0
+    assert jobs.status(status['job_id'])['status'] == 'succeeded'
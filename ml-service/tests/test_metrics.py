@@ -0,0 +1,25 @@
+import time
+from metrics import REQUEST_LATENCY, instrument_app
+
+
+def test_streamed_request_latency_includes_generation():
+    from flask import Flask, Response
+
+    app = instrument_app(Flask('metrics_test'))
+
+    @app.route('/slow-stream')
+    def slow_stream():
+        def generate():
+            for _ in range(3):
+                time.sleep(0.05)
+                yield b'{}\n'
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    with app.test_client() as client:
+        response = client.get('/slow-stream')
+        assert response.data == b'{}\n' * 3
+        response.close()
+
+    snapshot = REQUEST_LATENCY.labels('/slow-stream').snapshot()
+    assert snapshot['count'] == 1
+    assert snapshot['sum'] >= 0.15
@@ -0,0 +1,48 @@
+import threading
+import time
+import pytest
+from micro_batcher import MicroBatcher
+
+
+def test_lone_request_is_not_delayed():
+    batcher = MicroBatcher(lambda items: items, max_wait_ms=200)
+    batcher.submit(0)  # starts the worker thread
+
+    start = time.perf_counter()
+    assert batcher.submit(1) == 1
+    assert time.perf_counter() - start < 0.1
+
+
+def test_concurrent_requests_share_batches():
+    sizes = []
+
+    def score(items):
+        sizes.append(len(items))
+        time.sleep(0.002)
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(score, max_batch_size=8, max_wait_ms=5)
+    results = {}
+
+    def client(n):
+        for i in range(20):
+            results[(n, i)] = batcher.submit(n * 100 + i)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {(n, i): (n * 100 + i) * 2 for n in range(8) for i in range(20)}
+    assert max(sizes) <= 8
+    assert len(sizes) < 160
+
+
+def test_scoring_errors_reach_every_caller():
+    def score(items):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(score)
+    with pytest.raises(ValueError, match="boom"):
+        batcher.submit(1)
@@ -0,0 +1,145 @@
+import json
+import time
+import pytest
+from metrics import SHADOW_COMPARISONS, SHADOW_DROPPED
+from model_registry import ModelRegistry, ServedModel, parse_traffic_split
+
+
+class FakeService:
+    """A ServedModel backed by a fixed confidence, counting what it scored"""
+
+    def __init__(self, name, confidence, ready=True, delay=0.0):
+        self.name = name
+        self.confidence = confidence
+        self.ready = ready
+        self.delay = delay
+        self.scored = []
+
+    def result(self, student):
+        return {"stem_potential": int(self.confidence > 0.5), "confidence": self.confidence}
+
+    def predict_student(self, data):
+        time.sleep(self.delay)
+        self.scored.append(data['id'])
+        return self.result(data), 200
+
+    def score_students(self, students):
+        time.sleep(self.delay)
+        self.scored.extend(student['id'] for student in students)
+        return [json.dumps({"student_id": student['id'], **self.result(student)}).encode() for student in students]
+
+    def served(self):
+        return ServedModel(self.name, self.predict_student, self.score_students,
+                           lambda: self.ready, lambda: f"{self.name}-v1")
+
+
+def make_registry(services, split, shadow=None, **kwargs):
+    registry = ModelRegistry(split, shadow, **kwargs)
+    for service in services:
+        registry.register(service.served())
+    registry.validate()
+    return registry
+
+
+def wait_for_shadow(registry, timeout=5):
+    deadline = time.time() + timeout
+    while registry.stats()['shadow']['pending'] and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_parse_traffic_split():
+    assert parse_traffic_split('a=3, b=1') == {'a': 0.75, 'b': 0.25}
+    assert parse_traffic_split('a') == {'a': 1.0}
+    assert parse_traffic_split('a=1,b=0') == {'a': 1.0}
+    for text in ('a=0', 'a=-1,b=2', ''):
+        with pytest.raises(ValueError):
+            parse_traffic_split(text)
+
+
+def test_unknown_model_is_rejected():
+    with pytest.raises(ValueError, match="Unknown model"):
+        make_registry([FakeService('split_a', 0.9)], 'split_a=1,missing=1')
+
+
+def test_traffic_split_is_sticky_per_student():
+    a, b = FakeService('split_a', 0.9), FakeService('split_b', 0.1)
+    registry = make_registry([a, b], 'split_a=0.75,split_b=0.25')
+
+    routed = [registry.route(i).name for i in range(4000)]
+    assert routed.count('split_b') / len(routed) == pytest.approx(0.25, abs=0.03)
+    assert [registry.route(i).name for i in range(4000)] == routed
+
+    body, status, model = registry.predict({'id': 7})
+    assert (status, model.name) == (200, routed[7])
+    assert body == {'split_a': a, 'split_b': b}[routed[7]].result({})
+
+
+def test_requests_without_id_are_spread():
+    registry = make_registry([FakeService('spread_a', 0.9), FakeService('spread_b', 0.1)], 'spread_a=1,spread_b=1')
+    assert {registry.route().name for _ in range(200)} == {'spread_a', 'spread_b'}
+
+
+def test_not_ready_model_falls_back_to_a_ready_one():
+    default, other = FakeService('fallback_default', 0.9), FakeService('fallback_other', 0.1)
+    registry = make_registry([default, other], 'fallback_default=0.6,fallback_other=0.4')
+
+    # The picked model is loading: the default serves
+    other.ready = False
+    assert {registry.route(i).name for i in range(200)} == {'fallback_default'}
+
+    # The default is loading (e.g. fast start) or failed: the other model still serves
+    other.ready, default.ready = True, False
+    assert {registry.route(i).name for i in range(200)} == {'fallback_other'}
+    body, status, model = registry.predict({'id': 1})
+    assert (status, model.name) == (200, 'fallback_other')
+
+    # Nothing ready: the default, which the app answers with 503
+    other.ready = False
+    assert registry.route(1).name == 'fallback_default'
+
+
+def test_shadow_scores_off_the_response_path():
+    primary, shadow = FakeService('shadow_primary', 0.9), FakeService('shadow_model', 0.2, delay=0.05)
+    registry = make_registry([primary, shadow], 'shadow_primary=1', shadow='shadow_model')
+
+    start = time.perf_counter()
+    body, status, model = registry.predict({'id': 1})
+    assert time.perf_counter() - start < 0.05  # not waiting on the shadow
+    assert (body, status, model.name) == (primary.result({}), 200, 'shadow_primary')
+
+    rows, model = registry.score_students([{'id': 2}, {'id': 3}])
+    assert model.name == 'shadow_primary'
+    assert [json.loads(row)['confidence'] for row in rows] == [0.9, 0.9]
+
+    wait_for_shadow(registry)
+    assert shadow.scored == [1, 2, 3]
+    assert SHADOW_COMPARISONS.labels('shadow_primary', 'shadow_model', 'disagree').value == 3
+    assert registry.stats()['shadow']['disagreement_rate'] == {'shadow_primary': 1.0}
+
+
+def test_shadow_skipped_when_not_ready_or_primary():
+    primary, shadow = FakeService('skip_primary', 0.9), FakeService('skip_shadow', 0.2, ready=False)
+    registry = make_registry([primary, shadow], 'skip_primary=1,skip_shadow=1', shadow='skip_shadow')
+
+    # Still loading: everything routes to the primary, and nothing is shadowed
+    for i in range(20):
+        registry.predict({'id': i})
+    assert shadow.scored == []
+
+    # Ready: students routed to the shadow model are not scored by it a second time
+    shadow.ready = True
+    routed = [registry.predict({'id': i})[2].name for i in range(20, 60)]
+    wait_for_shadow(registry)
+    assert len(shadow.scored) == 40
+    assert SHADOW_COMPARISONS.labels('skip_primary', 'skip_shadow', 'disagree').value == routed.count('skip_primary')
+
+
+def test_shadow_queue_is_bounded():
+    primary, shadow = FakeService('bound_primary', 0.9), FakeService('bound_shadow', 0.2, delay=0.05)
+    registry = make_registry([primary, shadow], 'bound_primary=1', shadow='bound_shadow', max_pending=2)
+
+    for i in range(10):
+        registry.predict({'id': i})
+    wait_for_shadow(registry)
+    assert SHADOW_DROPPED.labels('bound_shadow').value == 10 - len(shadow.scored)
+    assert 1 <= len(shadow.scored) <= 2
@@ -0,0 +1,114 @@
+"""
+Exported encoders (export_encoders.py) against the eager torch pipeline.
+
+Runs on a tiny randomly initialized BERT with the real embedding width, so
+nothing is fetched from the Hugging Face hub.
+"""
+import numpy as np
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('onnxruntime')
+transformers = pytest.importorskip('transformers')
+
+import multimodal_model  # noqa: E402
+from behavior_features import STEP_DIM  # noqa: E402
+from conftest import cohort_features  # noqa: E402
+from export_encoders import export_encoders  # noqa: E402
+from multimodal_model import MultiModalTalentModel, TEXT_EMBED_DIM, TEXT_MAX_LENGTH  # noqa: E402
+from onnx_backend import OnnxTalentModel  # noqa: E402
+from talent_pipeline import file_checksum  # noqa: E402
+from text_features import DESCRIPTIONS, description_codes  # noqa: E402
+from train_config import fit_classifier, split_validation  # noqa: E402
+
+TOLERANCE = 1e-4  # export_encoders.PARITY_TOLERANCE
+
+
+@pytest.fixture(scope='module')
+def tiny_text_model(tmp_path_factory):
+    """Directory holding a one-layer BERT and a vocabulary covering every description"""
+    directory = tmp_path_factory.mktemp('text_model')
+    words = sorted({word for text in DESCRIPTIONS for word in transformers.BasicTokenizer().tokenize(text)})
+    vocab = directory / 'vocab.txt'
+    vocab.write_text('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + words) + '\n')
+    transformers.BertTokenizerFast(vocab_file=str(vocab)).save_pretrained(directory)
+
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=len(words) + 5, hidden_size=TEXT_EMBED_DIM, num_hidden_layers=1, num_attention_heads=4,
+        intermediate_size=64, max_position_embeddings=TEXT_MAX_LENGTH
+    )
+    transformers.BertModel(config).save_pretrained(directory)
+    return directory
+
+
+def make_cohort(n, seed):
+    """(description codes, numeric features, labels, activity sequences of 0-11 steps)"""
+    X, y, _ = cohort_features(n, seed=seed)
+    codes = description_codes(X[:, 0], X[:, 1], X[:, 2])
+    rng = np.random.default_rng(seed)
+    sequences = [rng.normal(0, 1, (length, STEP_DIM)).astype(np.float32) for length in rng.integers(0, 12, n)]
+    return codes, X, y, sequences
+
+
+@pytest.fixture(scope='module')
+def cohort():
+    """Students the exported models are compared on, none of which the XGBoost head was trained on"""
+    return make_cohort(300, seed=4)
+
+
+@pytest.fixture(scope='module', params=[False, True], ids=['numeric_text', 'with_behavior'])
+def exported(request, tiny_text_model, tmp_path_factory):
+    """(eager model, exported model, whether it fuses behavior) for a freshly trained bundle"""
+    use_behavior = request.param
+    codes, X, y, sequences = make_cohort(300, seed=3)
+    sequences = sequences if use_behavior else None
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(multimodal_model, 'TEXT_MODEL_PATH', str(tiny_text_model))
+        eager = MultiModalTalentModel(use_behavior=use_behavior)
+        fused = eager.encode_features_batched(codes, X, sequences)
+        X_fit, X_val, y_fit, y_val = split_validation(fused, y, seed=0)
+        classifier, _ = fit_classifier(X_fit, y_fit, X_val, y_val, max_rounds=20)
+        eager.set_xgb_model(classifier)
+
+        directory = tmp_path_factory.mktemp('export')
+        bundle_path = str(directory / 'multimodal_bundle.pkl')
+        eager.save_bundle(bundle_path, None, {'fused_dim': fused.shape[1]})
+        _, manifest = export_encoders(bundle_path, str(directory / 'encoders_export'))
+
+    model, _, config, checksum = OnnxTalentModel.load_export(str(directory / 'encoders_export'))
+    assert manifest['use_behavior'] == use_behavior
+    assert config == {'fused_dim': fused.shape[1]}
+    assert checksum == file_checksum(bundle_path)
+    return eager, model, use_behavior
+
+
+def test_text_embeddings_match(exported):
+    eager, model, _ = exported
+    texts = list(DESCRIPTIONS)
+    # Two batch sizes, so the dynamic batch and token axes are both exercised
+    for batch in (texts, texts[:1]):
+        np.testing.assert_allclose(model.encode_text(batch), eager.encode_text(batch), atol=TOLERANCE)
+
+
+def test_fused_features_match(exported, cohort):
+    eager, model, use_behavior = exported
+    codes, X, _, sequences = cohort
+    sequences = sequences if use_behavior else None
+    expected = eager.encode_features(codes, X, sequences)
+    actual = model.encode_features(codes, X, sequences)
+    assert actual.shape == expected.shape == (len(X), eager.get_fused_dim())
+    np.testing.assert_allclose(actual, expected, atol=TOLERANCE)
+
+
+def test_predictions_match(exported, cohort):
+    eager, model, use_behavior = exported
+    codes, X, _, sequences = cohort
+    sequences = sequences if use_behavior else None
+    expected_labels, expected = eager.predict_batch(codes, X, sequences, batch_size=64)
+    labels, probabilities = model.predict_batch(codes, X, sequences, batch_size=64)
+    np.testing.assert_allclose(probabilities, expected, atol=TOLERANCE)
+    # Only rows sitting on the decision boundary may flip
+    flipped = labels != expected_labels
+    assert np.all(np.abs(expected[flipped, 1] - 0.5) <= TOLERANCE)
@@ -0,0 +1,31 @@
+import numpy as np
+from prediction_cache import PredictionCache
+
+ROWS = np.array([[80, 90, 1], [55, 60, 0]], dtype=np.float32)
+
+
+def worker_cache(path, **kwargs):
+    """A cache as one gunicorn worker would build it, sharing the disk tier at path"""
+    return PredictionCache('cache_test', path=str(path), **kwargs)
+
+
+def test_variants_do_not_share_disk_entries(tmp_path):
+    path = tmp_path / 'cache.sqlite'
+    torch_worker = worker_cache(path, variant='torch')
+    int8_worker = worker_cache(path, variant='torch-int8')
+
+    torch_worker.store('v1', ROWS, [0.9, 0.2])
+    assert np.isnan(int8_worker.lookup('v1', ROWS)).all()
+    np.testing.assert_allclose(worker_cache(path, variant='torch').lookup('v1', ROWS), [0.9, 0.2])
+
+
+def test_reload_keeps_disk_entries_of_other_workers(tmp_path):
+    path = tmp_path / 'cache.sqlite'
+    reloaded, still_on_v1 = worker_cache(path), worker_cache(path)
+    reloaded.store('v1', ROWS, [0.9, 0.2])
+
+    reloaded.invalidate('v2')
+    assert reloaded.stats()['size'] == 0
+    # Not in its memory tier, so this is read from disk
+    np.testing.assert_allclose(still_on_v1.lookup('v1', ROWS), [0.9, 0.2])
+    assert still_on_v1.stats()['disk_hits'] == 2
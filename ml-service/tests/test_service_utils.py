@@ -0,0 +1,34 @@
+import os
+import re
+import pytest
+from service_utils import ProcessLocal, utc_timestamp
+
+
+def test_utc_timestamp_format():
+    assert re.fullmatch(r'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ', utc_timestamp())
+
+
+def test_built_once_per_process():
+    built = []
+    resource = ProcessLocal(lambda: built.append(os.getpid()) or object())
+    assert not resource.created
+    first = resource.get()
+    assert resource.get() is first and resource.created
+    assert built == [os.getpid()]
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_built_again_after_fork():
+    resource = ProcessLocal(object)
+    parent = resource.get()
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Child: not built here yet, then a new object distinct from the parent's
+        ok = not resource.created and resource.get() is not parent and resource.get() is resource.get()
+        os.write(write_end, b'1' if ok else b'0')
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read_end, 1) == b'1'
+    assert resource.get() is parent
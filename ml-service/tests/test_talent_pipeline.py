@@ -0,0 +1,40 @@
+import numpy as np
+from talent_pipeline import TalentPipeline
+from text_features import DESCRIPTIONS
+
+
+class FakePipeline(TalentPipeline):
+    """Embeds a text as its length, recording every encoder call"""
+
+    def __init__(self):
+        super().__init__()
+        self.encoded = []
+
+    def encode_text(self, text_list):
+        self.encoded.append(list(text_list))
+        return np.array([[len(text), 1.0] for text in text_list], dtype=np.float32)
+
+
+def test_descriptions_come_from_the_table():
+    model = FakePipeline()
+    assert model.description_table_stats() == {"built": False, "size": 0, "build_seconds": None}
+
+    codes = np.array([4, 0, 4, 26])
+    np.testing.assert_array_equal(model.text_embeddings(codes), model.encode_text([DESCRIPTIONS[c] for c in codes]))
+    np.testing.assert_array_equal(model.text_embeddings([DESCRIPTIONS[c] for c in codes]), model.text_embeddings(codes))
+    # One table build plus the expected rows above; text lookups ran no encoder pass
+    assert model.encoded[:1] == [list(DESCRIPTIONS)] and len(model.encoded) == 2
+
+    stats = model.description_table_stats()
+    assert stats["built"] and stats["size"] == len(DESCRIPTIONS) and stats["build_seconds"] >= 0
+
+
+def test_only_free_text_runs_the_encoder():
+    model = FakePipeline()
+    model.description_table()
+    texts = [DESCRIPTIONS[3], "A student who builds robots", DESCRIPTIONS[3], "x"]
+
+    embeddings = model.text_embeddings(texts)
+    assert model.encoded[1:] == [["A student who builds robots", "x"]]
+    np.testing.assert_array_equal(embeddings[:, 0], [len(text) for text in texts])
+    assert not np.shares_memory(embeddings, model.description_table())
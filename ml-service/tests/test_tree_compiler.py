@@ -0,0 +1,119 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.model_selection import train_test_split
+
+xgb = pytest.importorskip('xgboost')
+
+from talent_pipeline import file_checksum  # noqa: E402
+from tree_compiler import CompiledForest, load_or_compile, verification_rows  # noqa: E402
+
+TOLERANCE = 1e-6
+
+
+def training_data(n=3000, seed=0, missing=0.1):
+    """Five numeric features with missing values, labels depending on all of them"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(0, 1, (n, 5)).astype(np.float32)
+    X[:, 3] = rng.integers(0, 3, n)  # a small integer code, like gender_encoded
+    logit = X[:, 0] + 0.5 * X[:, 1] - 0.8 * X[:, 2] * (X[:, 3] == 1) + rng.normal(0, 0.5, n)
+    y = (logit > 0.3).astype(int)
+    X[rng.random(X.shape) < missing] = np.nan
+    return X, y
+
+
+def train(seed=0, **params):
+    X, y = training_data(seed=seed)
+    params = {'n_estimators': 60, 'max_depth': 4, 'learning_rate': 0.2, 'base_score': 0.3, **params}
+    return xgb.XGBClassifier(**params).fit(X, y), X
+
+
+@pytest.mark.parametrize('params', [
+    {},
+    {'max_depth': 2, 'base_score': 0.7},  # uint8 masks
+    {'max_depth': 6, 'n_estimators': 20},  # up to 64 leaves, uint64 masks
+    {'tree_method': 'exact'},
+    {'max_depth': 0, 'max_leaves': 12, 'grow_policy': 'lossguide', 'tree_method': 'hist'}
+], ids=['depth4', 'depth2', 'depth6', 'exact', 'lossguide'])
+def test_matches_xgboost(params):
+    classifier, X = train(**params)
+    forest = CompiledForest.from_booster(classifier.get_booster())
+
+    X_new, _ = training_data(n=2000, seed=1, missing=0.2)
+    for rows in (X_new, X, verification_rows(forest)):
+        expected = classifier.predict_proba(rows)
+        actual = forest.predict_proba(rows)
+        assert actual.shape == expected.shape
+        np.testing.assert_allclose(actual, expected, atol=TOLERANCE, rtol=0)
+        np.testing.assert_array_equal(forest.predict(rows), classifier.predict(rows))
+
+
+def test_missing_values_follow_default_direction():
+    classifier, _ = train()
+    forest = CompiledForest.from_booster(classifier.get_booster())
+    rows = np.full((8, 5), np.nan, dtype=np.float32)
+    rows[1:, 0] = np.linspace(-2, 2, 7)
+    np.testing.assert_allclose(forest.predict_proba(rows), classifier.predict_proba(rows), atol=TOLERANCE, rtol=0)
+
+
+def test_rejects_unsupported_models():
+    X, y = training_data()
+    regressor = xgb.XGBRegressor(n_estimators=5).fit(X, y)
+    with pytest.raises(ValueError, match="objective"):
+        CompiledForest.from_booster(regressor.get_booster())
+
+
+def save_model(classifier, path):
+    joblib.dump(classifier, path)
+    return str(path), file_checksum(path)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    classifier, X = train()
+    model_path, checksum = save_model(classifier, tmp_path / 'model.pkl')
+    compiled_path = str(tmp_path / 'model.npz')
+
+    compiled = load_or_compile(model_path, compiled_path, checksum)
+    reloaded, metadata = CompiledForest.load(compiled_path)
+    assert metadata == {'source_checksum': checksum}
+    np.testing.assert_array_equal(reloaded.predict_proba(X), compiled.predict_proba(X))
+
+
+def test_stale_compiled_model_is_recompiled(tmp_path):
+    old, _ = train(seed=0)
+    new, X = train(seed=5, max_depth=3)
+    compiled_path = str(tmp_path / 'model.npz')
+
+    old_path, old_checksum = save_model(old, tmp_path / 'old.pkl')
+    load_or_compile(old_path, compiled_path, old_checksum)
+
+    # Same compiled path, different booster: the cached arrays must not be served
+    new_path, new_checksum = save_model(new, tmp_path / 'new.pkl')
+    forest = load_or_compile(new_path, compiled_path, new_checksum)
+    assert isinstance(forest, CompiledForest)
+    np.testing.assert_allclose(forest.predict_proba(X), new.predict_proba(X), atol=TOLERANCE, rtol=0)
+    assert CompiledForest.load(compiled_path)[1]['source_checksum'] == new_checksum
+
+
+def test_unreadable_compiled_model_is_recompiled(tmp_path):
+    classifier, X = train()
+    model_path, checksum = save_model(classifier, tmp_path / 'model.pkl')
+    compiled_path = tmp_path / 'model.npz'
+    compiled_path.write_bytes(b'not an npz file')
+
+    forest = load_or_compile(model_path, str(compiled_path), checksum)
+    np.testing.assert_allclose(forest.predict_proba(X), classifier.predict_proba(X), atol=TOLERANCE, rtol=0)
+
+
+def test_early_stopped_model_uses_best_iteration(tmp_path):
+    X, y = training_data()
+    X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=0.2, random_state=0)
+    classifier = xgb.XGBClassifier(
+        n_estimators=300, max_depth=4, learning_rate=0.5, base_score=0.3, early_stopping_rounds=5
+    ).fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+    assert classifier.best_iteration < 299
+
+    model_path, checksum = save_model(classifier, tmp_path / 'model.pkl')
+    forest = load_or_compile(model_path, str(tmp_path / 'model.npz'), checksum)
+    assert forest.n_trees == classifier.best_iteration + 1
+    np.testing.assert_allclose(forest.predict_proba(X), classifier.predict_proba(X), atol=TOLERANCE, rtol=0)
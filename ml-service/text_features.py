@@ -0,0 +1,48 @@
+import numpy as np
+
+# Score bands behind every text description: <= 60, (60, 80], > 80
+BAND_THRESHOLDS = (60, 80)
+N_BANDS = len(BAND_THRESHOLDS) + 1
+
+# Phrases per band, lowest band first
+MATH_PHRASES = ("developing math abilities", "moderate math proficiency", "strong mathematical skills")
+SCIENCE_PHRASES = ("emerging science interest", "good science foundation", "excellent scientific understanding")
+PROJECT_PHRASES = ("growing practical skills", "solid hands-on experience", "outstanding project execution")
+
+# Every description, indexed by description code (math band * 9 + science band * 3 + project band)
+DESCRIPTIONS = tuple(
+    f"Student with {math}, {science}, {project}"
+    for math in MATH_PHRASES
+    for science in SCIENCE_PHRASES
+    for project in PROJECT_PHRASES
+)
+
+
+def score_bands(scores):
+    """Band index (0, 1 or 2) of each score, matching the > 60 / > 80 rules"""
+    scores = np.asarray(scores, dtype=np.float64)
+    return (scores > BAND_THRESHOLDS[0]).astype(np.int64) + (scores > BAND_THRESHOLDS[1])
+
+
+def description_codes(math_score, science_score, project_score):
+    """
+    Vectorized text feature: map score arrays to description codes.
+
+    Args:
+        math_score, science_score, project_score: Scalars or equal-length
+            arrays of raw scores (float64, so no band edge shifts)
+
+    Returns:
+        Integer code(s) indexing DESCRIPTIONS, and the rows of a model's
+        description embedding table
+    """
+    return (
+        score_bands(math_score) * N_BANDS ** 2
+        + score_bands(science_score) * N_BANDS
+        + score_bands(project_score)
+    )
+
+
+def generate_text_description(math_score, science_score, project_score):
+    """Generate a text description based on student scores"""
+    return DESCRIPTIONS[int(description_codes(math_score, science_score, project_score))]
@@ -0,0 +1,111 @@
+import os
+import time
+from contextlib import contextmanager
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+
+# XGBoost training settings shared by train_model.py and train_multimodal_model.py
+N_JOBS = int(os.environ.get('ML_XGB_N_JOBS', os.cpu_count() or 1))
+TREE_METHOD = os.environ.get('ML_XGB_TREE_METHOD', 'hist')
+MAX_BIN = int(os.environ.get('ML_XGB_MAX_BIN', 256))
+MAX_ROUNDS = int(os.environ.get('ML_XGB_MAX_ROUNDS', 500))
+EARLY_STOPPING_ROUNDS = int(os.environ.get('ML_XGB_EARLY_STOPPING_ROUNDS', 20))
+VALIDATION_FRACTION = float(os.environ.get('ML_XGB_VALIDATION_FRACTION', 0.1))  # of the training split
+# Train the multimodal model on activity log sequences too (synthetic, see synthetic_cohort.generate_activity)
+TRAIN_BEHAVIOR = os.environ.get('ML_TRAIN_BEHAVIOR', 'false').lower() == 'true'
+
+XGB_PARAMS = {
+    'objective': 'binary:logistic',
+    'eval_metric': 'logloss',
+    'tree_method': TREE_METHOD,
+    'max_depth': 4,
+    'learning_rate': 0.1,
+    'max_bin': MAX_BIN,
+    'nthread': N_JOBS,
+    'seed': 42
+}
+
+
+class StageTimer:
+    """
+    Log the wall-clock time of each training stage.
+
+        timer = StageTimer()
+        with timer('train'):
+            ...
+        timer.timings  # {'train': 12.3}
+    """
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def __call__(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.timings[name] = round(self.timings.get(name, 0) + seconds, 3)
+            print(f"  ⏱  {name}: {seconds:.2f}s")
+
+    def summary(self):
+        total = sum(self.timings.values())
+        print(f"⏱  Stage timings (s): {self.timings} — total {total:.2f}s")
+
+
+def split_validation(X, y, fraction=VALIDATION_FRACTION, seed=42):
+    """Carve a stratified early-stopping split off the training data"""
+    return train_test_split(X, y, test_size=fraction, random_state=seed, stratify=y)
+
+
+def training_matrix(X, y, ref=None):
+    """
+    XGBoost input for the configured tree method.
+
+    hist/approx get a QuantileDMatrix, which bins X once (sharing ref's bin
+    edges for evaluation data) and never keeps a float copy, so memory-mapped
+    feature store arrays are read straight through. Other methods use a DMatrix.
+    """
+    if TREE_METHOD in ('hist', 'approx'):
+        return xgb.QuantileDMatrix(X, y, ref=ref, max_bin=MAX_BIN, nthread=N_JOBS)
+    return xgb.DMatrix(X, y, nthread=N_JOBS)
+
+
+def fit_classifier(X_train, y_train, X_val, y_val, params=None, max_rounds=MAX_ROUNDS,
+                   early_stopping_rounds=EARLY_STOPPING_ROUNDS, timer=None):
+    """
+    Train a binary XGBoost model with early stopping on (X_val, y_val).
+
+    Args:
+        params: Overrides merged into XGB_PARAMS
+        timer: StageTimer to record 'build_dmatrix' and 'train' into
+
+    Returns:
+        (classifier, info) where classifier is an XGBClassifier holding only
+        the trees up to the best iteration (what load_model and predict_proba
+        expect), and info has best_iteration, best_score and rounds
+    """
+    timer = timer or StageTimer()
+    params = {**XGB_PARAMS, **(params or {})}
+
+    with timer('build_dmatrix'):
+        dtrain = training_matrix(X_train, y_train)
+        dval = training_matrix(X_val, y_val, ref=dtrain)
+
+    with timer('train'):
+        booster = xgb.train(
+            params, dtrain, num_boost_round=max_rounds, evals=[(dval, 'validation')],
+            early_stopping_rounds=early_stopping_rounds, verbose_eval=False
+        )
+
+    info = {
+        'best_iteration': booster.best_iteration,
+        'best_score': booster.best_score,
+        'rounds': booster.num_boosted_rounds()
+    }
+
+    # Drop the rounds after the best one, so every consumer sees the same trees
+    classifier = xgb.XGBClassifier()
+    classifier.load_model(booster[: booster.best_iteration + 1].save_raw('ubj'))
+    return classifier, info
@@ -1,17 +1,21 @@
-import pandas as pd
+import os
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
-from sklearn.utils import resample
-import xgboost as xgb
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
 import torch
-from multimodal_model import MultiModalTalentModel
+from multimodal_model import MultiModalTalentModel, GRU_HIDDEN
+from feature_store import load_or_encode
+from text_features import DESCRIPTIONS, description_codes
+from behavior_features import event_steps, sequence_lengths
+from synthetic_cohort import generate_cohort, generate_activity
+from train_config import TRAIN_BEHAVIOR, StageTimer, fit_classifier, split_validation
 
 # Set random seed for reproducibility
-np.random.seed(42)
-torch.manual_seed(42)
+SEED = 42
+np.random.seed(SEED)
+torch.manual_seed(SEED)
 
 print("="*60)
 print("MULTIMODAL STEM TALENT DETECTION MODEL TRAINING")
@@ -19,99 +23,60 @@ print("="*60)
 
 # --- CREATE SYNTHETIC DATASET ---
 print("\n[1/6] Generating synthetic data...")
-n = 2000  # number of synthetic students
-
-data = pd.DataFrame({
-    'math_score': np.random.normal(75, 10, n),
-    'science_score': np.random.normal(72, 12, n),
-    'project_score': np.random.normal(70, 15, n),
-    'gender': np.random.choice(['Male', 'Female', 'Non-Binary'], n, p=[0.45, 0.45, 0.10]),
-    'socioeconomic_index': np.random.uniform(0, 1, n),
-})
-
-# Create synthetic STEM potential labels
-data['stem_potential'] = (
-    0.4 * data['math_score'] +
-    0.4 * data['science_score'] +
-    0.2 * data['project_score'] +
-    np.random.normal(0, 5, n)
+n = int(os.environ.get('ML_TRAIN_ROWS', 2000))  # number of synthetic students
+timer = StageTimer()
+with timer('generate'):
+    balanced_data = generate_cohort(n, seed=SEED)
+
+# Text feature: one description code per student, binned from the raw scores
+balanced_data['description_code'] = description_codes(
+    balanced_data['math_score'], balanced_data['science_score'], balanced_data['project_score']
 )
-data['stem_potential_label'] = (data['stem_potential'] > data['stem_potential'].median()).astype(int)
-
-# Generate text descriptions for each student
-text_descriptions = []
-for _, row in data.iterrows():
-    desc_parts = []
-
-    # Math ability
-    if row['math_score'] > 80:
-        desc_parts.append("strong mathematical skills")
-    elif row['math_score'] > 60:
-        desc_parts.append("moderate math proficiency")
-    else:
-        desc_parts.append("developing math abilities")
-
-    # Science interest
-    if row['science_score'] > 80:
-        desc_parts.append("excellent scientific understanding")
-    elif row['science_score'] > 60:
-        desc_parts.append("good science foundation")
-    else:
-        desc_parts.append("emerging science interest")
-
-    # Project work
-    if row['project_score'] > 80:
-        desc_parts.append("outstanding project execution")
-    elif row['project_score'] > 60:
-        desc_parts.append("solid hands-on experience")
-    else:
-        desc_parts.append("growing practical skills")
-
-    text_descriptions.append(f"Student with {', '.join(desc_parts)}")
-
-data['text_description'] = text_descriptions
 
 print(f"✓ Generated {n} student records")
-print(f"✓ Label distribution: {data['stem_potential_label'].value_counts().to_dict()}")
+print(f"✓ Label distribution: {balanced_data['stem_potential_label'].value_counts().to_dict()}")
+
+# Behavioral feature: each student's activity log, featurized exactly as the service does
+behavior_sequences = None
+if TRAIN_BEHAVIOR:
+    with timer('generate_activity'):
+        behavior_sequences = [event_steps(events) for events in generate_activity(balanced_data, seed=SEED)]
+    lengths = sequence_lengths(behavior_sequences)
+    print(f"✓ Generated activity logs: {lengths.sum()} events, "
+          f"{lengths.min()}-{lengths.max()} per student, {(lengths == 0).mean():.0%} with none")
 
 # --- BALANCE DATASET ---
-print("\n[2/6] Balancing dataset by gender...")
-female = data[data.gender == 'Female']
-male = data[data.gender == 'Male']
-non_binary = data[data.gender == 'Non-Binary']
-
-max_n = max(len(female), len(male), len(non_binary))
-balanced_data = pd.concat([
-    resample(female, replace=True, n_samples=max_n, random_state=42),
-    resample(male, replace=True, n_samples=max_n, random_state=42),
-    resample(non_binary, replace=True, n_samples=max_n, random_state=42)
-])
-
-print(f"✓ Balanced dataset size: {len(balanced_data)}")
+# Genders are drawn with equal probability, so no resampling (or duplicated students) is needed
+print("\n[2/6] Checking gender balance...")
 print(f"✓ Gender distribution: {balanced_data['gender'].value_counts().to_dict()}")
 
 # --- ENCODE FEATURES ---
 print("\n[3/6] Encoding features...")
-le = LabelEncoder()
-balanced_data['gender_encoded'] = le.fit_transform(balanced_data['gender'])
+# Categories are sorted, so the codes are the LabelEncoder's
+le = LabelEncoder().fit(balanced_data['gender'].cat.categories)
+balanced_data['gender_encoded'] = balanced_data['gender'].cat.codes
 
 # Prepare numeric features
 numeric_features = balanced_data[['math_score', 'science_score', 'project_score', 'gender_encoded', 'socioeconomic_index']].values
 
-# Prepare text features
-text_features = balanced_data['text_description'].tolist()
+# Prepare text features (codes index the model's description embedding table)
+text_features = balanced_data['description_code'].to_numpy()
 
 # Labels
 y = balanced_data['stem_potential_label'].values
 
 print(f"✓ Numeric features shape: {numeric_features.shape}")
-print(f"✓ Text features count: {len(text_features)}")
+print(f"✓ Distinct text descriptions: {len(np.unique(text_features))} of {len(DESCRIPTIONS)}")
 
 # --- SPLIT DATA ---
 print("\n[4/6] Splitting data...")
-X_num_train, X_num_test, X_text_train, X_text_test, y_train, y_test = train_test_split(
-    numeric_features, text_features, y, test_size=0.2, random_state=42, stratify=y
+X_num_train, X_num_test, X_text_train, X_text_test, y_train, y_test, idx_train, idx_test = train_test_split(
+    numeric_features, text_features, y, np.arange(n), test_size=0.2, random_state=SEED, stratify=y
 )
+beh_train = beh_test = None
+if behavior_sequences is not None:
+    beh_train = [behavior_sequences[i] for i in idx_train]
+    beh_test = [behavior_sequences[i] for i in idx_test]
 
 print(f"✓ Train samples: {len(X_num_train)}")
 print(f"✓ Test samples: {len(X_num_test)}")
@@ -119,34 +84,39 @@ print(f"✓ Test samples: {len(X_num_test)}")
 # --- TRAIN MULTIMODAL MODEL ---
 print("\n[5/6] Training multimodal model...")
 print("  → Initializing encoders...")
-model = MultiModalTalentModel()
+model = MultiModalTalentModel(use_behavior=TRAIN_BEHAVIOR)
 
+# Fused embeddings are memory-mapped from the feature store when this encoder
+# version has already encoded the same rows
 print("  → Encoding training data...")
-train_embeddings = model.encode_features(X_text_train, X_num_train)
+with timer('encode_train'):
+    train_embeddings, hit = load_or_encode(model, X_text_train, X_num_train, "train", beh_data=beh_train)
+print(f"    {'loaded from' if hit else 'written to'} feature store")
 
 print("  → Encoding test data...")
-test_embeddings = model.encode_features(X_text_test, X_num_test)
+with timer('encode_test'):
+    test_embeddings, hit = load_or_encode(model, X_text_test, X_num_test, "test", beh_data=beh_test)
+print(f"    {'loaded from' if hit else 'written to'} feature store")
 
 print(f"  → Fused embedding dimension: {train_embeddings.shape[1]}")
 
-print("  → Training XGBoost classifier...")
-xgb_model = xgb.XGBClassifier(
-    n_estimators=100,
-    learning_rate=0.1,
-    max_depth=4,
-    random_state=42,
-    eval_metric='logloss'
-)
+# Early-stopping rows are split by index, so each embedding row is read from the store once
+fit_idx, val_idx, y_fit, y_val = split_validation(np.arange(len(y_train)), y_train, seed=SEED)
 
-xgb_model.fit(train_embeddings, y_train)
+print("  → Training XGBoost classifier (hist, early stopping)...")
+xgb_model, train_info = fit_classifier(
+    train_embeddings[fit_idx], y_fit, train_embeddings[val_idx], y_val, timer=timer
+)
 model.set_xgb_model(xgb_model)
+print(f"  → Best iteration: {train_info['best_iteration']} of {train_info['rounds']} rounds")
 
 print("  ✓ Training complete!")
 
 # --- EVALUATE MODEL ---
 print("\n[6/6] Evaluating model...")
-y_pred = xgb_model.predict(test_embeddings)
-y_prob = xgb_model.predict_proba(test_embeddings)
+with timer('evaluate'):
+    y_pred = xgb_model.predict(test_embeddings)
+    y_prob = xgb_model.predict_proba(test_embeddings)
 
 accuracy = accuracy_score(y_test, y_pred)
 print(f"\n{'='*60}")
@@ -181,16 +151,34 @@ config = {
     'text_embed_dim': 384,
     'num_proj_dim': 64,
     'numeric_input_dim': 5,
+    'behavior_dim': GRU_HIDDEN if TRAIN_BEHAVIOR else 0,
+    'use_behavior': TRAIN_BEHAVIOR,
     'fused_dim': train_embeddings.shape[1],
     'accuracy': float(accuracy),
-    'n_features': train_embeddings.shape[1]
+    'n_features': train_embeddings.shape[1],
+    'encoder_checksum': model.encoder_checksum(),
+    'best_iteration': train_info['best_iteration'],
+    'train_timings': timer.timings
 }
 joblib.dump(config, "model_config.pkl")
 print("✓ Saved: model_config.pkl")
 
+# Held-out split, so quantize_report.py can re-score it without retraining
+holdout = {'numeric': X_num_test, 'codes': X_text_test, 'labels': y_test}
+if beh_test is not None:
+    # Sequences stored end to end, with each one's length (see behavior_features.split_steps)
+    holdout.update(behavior_steps=np.concatenate(beh_test), behavior_lengths=sequence_lengths(beh_test))
+np.savez("multimodal_holdout.npz", **holdout)
+print("✓ Saved: multimodal_holdout.npz")
+
+# Versioned bundle with the projector/encoder weights, so serving matches training
+checksum = model.save_bundle("multimodal_bundle.pkl", le, config)
+print(f"✓ Saved: multimodal_bundle.pkl (sha256 {checksum[:12]})")
+
 print(f"\n{'='*60}")
 print("✅ TRAINING COMPLETE!")
 print(f"{'='*60}")
 print(f"Model accuracy: {accuracy*100:.2f}%")
 print(f"Fused embedding size: {train_embeddings.shape[1]}")
+timer.summary()
 print(f"Ready for deployment!")
@@ -0,0 +1,273 @@
+"""
+Compile a binary:logistic XGBoost model into flat NumPy arrays.
+
+The baseline model is a hundred shallow trees over 5 features, so scoring it
+through XGBClassifier spends most of its time building a DMatrix.
+A CompiledForest evaluates every tree for every row with a few vectorized
+lookups instead of walking nodes (the QuickScorer layout):
+
+- each tree's leaves (at most 64) are numbered left to right as bits of an
+  unsigned integer;
+- every split x >= threshold (go right) rules out the leaves of its left
+  subtree, so for each feature the thresholds are sorted and the leaves
+  ruled out by "x is above the first k of them" are precomputed per tree;
+- a row's exit leaf in a tree is the lowest bit left after ANDing one such
+  mask row per feature.
+
+load_or_compile() caches the arrays next to the pickle (stem_talent_model.npz)
+keyed by the pickle's checksum, and every compile is checked against
+XGBoost's own predictions before it is used or saved.
+"""
+import json
+import os
+import numpy as np
+
+COMPILE_TOLERANCE = float(os.environ.get('ML_COMPILE_TOLERANCE', 1e-6))  # max |Δ probability|
+VERIFY_ROWS = 2000
+MAX_LEAVES = 64  # leaves per tree, one bit each
+BLOCK_ROWS = 1024
+
+
+class CompiledForest:
+    """
+    Predictor over precomputed leaf masks, with the XGBClassifier predict/predict_proba API.
+
+    thresholds[offsets[f]:offsets[f + 1]] are feature f's distinct split
+    values, ascending. Its mask rows start at offsets[f] + 2 * f: row k holds,
+    per tree, the leaves still reachable when the value is at or above the
+    first k thresholds, and the row after the last is for a missing value.
+    Masks use the narrowest unsigned type that has a bit per leaf.
+    """
+
+    ARRAYS = ('thresholds', 'offsets', 'masks', 'leaf_values')
+
+    def __init__(self, thresholds, offsets, masks, leaf_values, base_margin):
+        self.thresholds = thresholds
+        self.offsets = offsets
+        self.masks = masks
+        self.leaf_values = leaf_values
+        self.base_margin = np.float32(base_margin)
+        self.n_features = len(offsets) - 1
+        self.n_trees = leaf_values.shape[0]
+        self._leaf_base = np.arange(self.n_trees) * MAX_LEAVES
+
+    @classmethod
+    def from_booster(cls, booster):
+        """
+        Compile an xgboost.Booster (gbtree, binary:logistic, numerical splits only).
+
+        Raises:
+            ValueError: If the model uses anything this predictor can't evaluate
+        """
+        learner = json.loads(booster.save_raw('json'))['learner']
+        objective = learner['objective']['name']
+        if objective != 'binary:logistic':
+            raise ValueError(f"Unsupported objective: {objective}")
+        if learner['gradient_booster']['name'] != 'gbtree':
+            raise ValueError(f"Unsupported booster: {learner['gradient_booster']['name']}")
+        n_features = int(learner['learner_model_param']['num_feature'])
+
+        trees = learner['gradient_booster']['model']['trees']
+        leaf_values = np.zeros((len(trees), MAX_LEAVES), dtype=np.float32)
+        splits = []  # (feature, threshold, tree, left-subtree leaf bits, default_left)
+        max_leaves = 1
+        for t, tree in enumerate(trees):
+            if any(tree['split_type']):
+                raise ValueError("Categorical splits are not supported")
+            left, right = tree['left_children'], tree['right_children']
+
+            # Number the leaves left to right (depth first, left child first)
+            n_leaves = 0
+            leaf_bits = [0] * len(left)
+            stack = [0]
+            while stack:
+                node = stack.pop()
+                if left[node] == -1:
+                    if n_leaves == MAX_LEAVES:
+                        raise ValueError(f"Tree {t} has more than {MAX_LEAVES} leaves")
+                    # A leaf's value is stored in its split condition
+                    leaf_values[t, n_leaves] = tree['split_conditions'][node]
+                    leaf_bits[node] = 1 << n_leaves
+                    n_leaves += 1
+                else:
+                    stack.extend((right[node], left[node]))
+            max_leaves = max(max_leaves, n_leaves)
+
+            # Children always have larger ids than their parent
+            for node in reversed(range(len(left))):
+                if left[node] != -1:
+                    leaf_bits[node] = leaf_bits[left[node]] | leaf_bits[right[node]]
+                    splits.append((tree['split_indices'][node], tree['split_conditions'][node],
+                                   t, leaf_bits[left[node]], tree['default_left'][node]))
+
+        # Narrowest masks that fit every tree (uint16 for depth-4 trees), so gathers move fewer bytes
+        mask_dtype = next(np.dtype(t) for t in (np.uint8, np.uint16, np.uint32, np.uint64)
+                          if np.dtype(t).itemsize * 8 >= max_leaves)
+        all_leaves = np.iinfo(mask_dtype).max
+
+        thresholds, offsets, masks = [], [0], []
+        for column in range(n_features):
+            column_splits = [split for split in splits if split[0] == column]
+            split_thresholds = np.array([split[1] for split in column_splits], dtype=np.float32)
+            split_trees = np.array([split[2] for split in column_splits], dtype=np.intp)
+            # Going right rules out the left subtree's leaves
+            split_masks = np.array([~split[3] & all_leaves for split in column_splits], dtype=mask_dtype)
+            default_right = np.array([not split[4] for split in column_splits], dtype=bool)
+
+            distinct = np.unique(split_thresholds)
+            rows = np.full((len(distinct) + 2, len(trees)), all_leaves, dtype=mask_dtype)
+            # x >= threshold once x is at or above it, i.e. from row rank + 1 on
+            rank = np.searchsorted(distinct, split_thresholds)
+            np.bitwise_and.at(rows, (rank + 1, split_trees), split_masks)
+            rows[:-1] = np.bitwise_and.accumulate(rows[:-1], axis=0)
+            np.bitwise_and.at(rows, (-1, split_trees[default_right]), split_masks[default_right])
+
+            thresholds.append(distinct)
+            offsets.append(offsets[-1] + len(distinct))
+            masks.append(rows)
+
+        # base_score is a probability (e.g. '[4.965278E-1]'); trees add to its logit
+        base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+        return cls(
+            np.concatenate(thresholds), np.asarray(offsets, dtype=np.int64), np.concatenate(masks),
+            leaf_values, np.log(base_score / (1 - base_score))
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load arrays written by save(), returning (forest, metadata)"""
+        with np.load(path, allow_pickle=False) as data:
+            forest = cls(*(data[name] for name in cls.ARRAYS), data['base_margin'])
+            return forest, {'source_checksum': str(data['source_checksum'])}
+
+    def save(self, path, source_checksum):
+        """Write the arrays atomically, tagged with the checksum of the model they came from"""
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path, **{name: getattr(self, name) for name in self.ARRAYS},
+            base_margin=self.base_margin, source_checksum=np.array(source_checksum)
+        )
+        os.replace(tmp_path, path)
+
+    def feature_thresholds(self, column):
+        return self.thresholds[self.offsets[column]:self.offsets[column + 1]]
+
+    def leaf_indices(self, X):
+        """Exit leaf of every tree, shape (n_rows, n_trees)"""
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        reachable = None
+        for column in range(self.n_features):
+            values = X[:, column]
+            thresholds = self.feature_thresholds(column)
+            # Same test as XGBoost (go right when x >= threshold); missing values take the last row
+            rank = np.searchsorted(thresholds, values, side='right')
+            missing = np.isnan(values)
+            if missing.any():
+                rank[missing] = len(thresholds) + 1
+            rows = np.take(self.masks, self.offsets[column] + 2 * column + rank, axis=0)
+            reachable = rows if reachable is None else np.bitwise_and(reachable, rows, out=reachable)
+
+        lowest = reachable & (~reachable + reachable.dtype.type(1))
+        # Exponent of an exact power of two: 2 ** i has frexp exponent i + 1
+        return np.frexp(lowest.astype(np.float64))[1] - 1
+
+    def decision_function(self, X):
+        """Raw margin: base margin plus the exit leaf value of every tree"""
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        margins = np.empty(len(X))
+        # Blocks of rows keep the (rows, trees) intermediates in cache
+        for start in range(0, len(X), BLOCK_ROWS):
+            leaves = self.leaf_values.ravel()[self._leaf_base + self.leaf_indices(X[start:start + BLOCK_ROWS])]
+            # Summed in float64: XGBoost's float32 running sum differs by rounding only (see verify)
+            margins[start:start + BLOCK_ROWS] = leaves.sum(axis=1, dtype=np.float64) + self.base_margin
+        return margins
+
+    def predict_proba(self, X):
+        """Class probabilities, shape (n_rows, 2), as XGBClassifier.predict_proba"""
+        positive = (1 / (1 + np.exp(-self.decision_function(X)))).astype(np.float32)
+        return np.column_stack([1 - positive, positive])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+
+def verification_rows(forest, n=VERIFY_ROWS, seed=0):
+    """
+    Rows that exercise every split: values drawn around each feature's thresholds,
+    exactly on a threshold, and missing.
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 1, (n, forest.n_features)).astype(np.float32)
+    for column in range(forest.n_features):
+        thresholds = forest.feature_thresholds(column)
+        if len(thresholds) == 0:
+            continue
+        low, high = thresholds[0], thresholds[-1]
+        spread = max(high - low, 1.0)
+        X[:, column] = rng.uniform(low - 0.1 * spread, high + 0.1 * spread, n)
+        on_threshold = rng.random(n) < 0.25
+        X[on_threshold, column] = rng.choice(thresholds, on_threshold.sum())
+    X[rng.random(X.shape) < 0.02] = np.nan
+    return X
+
+
+def verify(forest, classifier, X=None, tolerance=COMPILE_TOLERANCE):
+    """
+    Compare the forest with XGBoost on X (default: verification_rows).
+
+    Returns:
+        Largest absolute difference in positive-class probability
+
+    Raises:
+        ValueError: If any difference exceeds tolerance
+    """
+    X = verification_rows(forest) if X is None else X
+    expected = classifier.predict_proba(X)[:, 1]
+    max_diff = float(np.abs(forest.predict_proba(X)[:, 1] - expected).max())
+    if max_diff > tolerance:
+        raise ValueError(f"Compiled predictions differ from XGBoost by {max_diff:.3g} (tolerance {tolerance:g})")
+    return max_diff
+
+
+def load_or_compile(model_path, compiled_path, checksum):
+    """
+    Load the compiled form of the pickled XGBClassifier at model_path.
+
+    Compiled arrays at compiled_path are reused when they were built from a
+    model with this checksum; otherwise the pickle is compiled, verified and
+    the arrays saved for the next start. Falls back to the XGBClassifier
+    itself if it can't be compiled exactly.
+
+    Returns:
+        CompiledForest, or the XGBClassifier on fallback
+    """
+    if os.path.exists(compiled_path):
+        try:
+            forest, metadata = CompiledForest.load(compiled_path)
+            if metadata['source_checksum'] == checksum:
+                return forest
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️  Ignoring unreadable compiled model {compiled_path}: {e}")
+
+    import joblib
+    classifier = joblib.load(model_path)
+    booster = classifier.get_booster()
+    try:
+        # Early-stopped sklearn models predict with only the trees up to best_iteration
+        booster = booster[: classifier.best_iteration + 1]
+    except AttributeError:
+        pass
+
+    try:
+        forest = CompiledForest.from_booster(booster)
+        max_diff = verify(forest, classifier)
+    except ValueError as e:
+        print(f"⚠️  Serving with XGBoost, model could not be compiled: {e}")
+        return classifier
+
+    print(f"✓ Compiled {forest.n_trees} trees (max |Δ| vs XGBoost {max_diff:.1e})")
+    try:
+        forest.save(compiled_path, checksum)
+    except OSError as e:
+        print(f"⚠️  Could not save compiled model to {compiled_path}: {e}")
+    return forest
@@ -0,0 +1,293 @@
+"""
+Hyperparameter search over the XGBoost head.
+
+    python tune_xgb.py [--model baseline|multimodal] [--trials 27] [--folds 3]
+                       [--workers 4] [--eta 3] [--leaderboard tune_leaderboard.json]
+
+Samples --trials configurations of depth, learning rate, estimators and
+subsampling, and scores each by stratified K-fold cross-validated log loss in a
+process pool. Trials are pruned by successive halving: every rung trains the
+survivors on --eta times more rows and keeps the best 1/--eta of them, so
+weak configurations never see the full training set.
+
+Uses the same synthetic cohort and train/test split as the training scripts.
+The multimodal search encodes the training split once through the feature
+store and every worker memory-maps that file. The winning configuration is
+retrained with early stopping, scored on the held-out test split and saved in
+the format load_model() reads: stem_talent_model.pkl and label_encoder.pkl,
+or multimodal_bundle.pkl (plus the training script's other artifacts).
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import xgboost as xgb
+from sklearn.metrics import accuracy_score, log_loss
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.preprocessing import LabelEncoder
+from synthetic_cohort import generate_cohort
+from train_config import XGB_PARAMS, StageTimer, fit_classifier, split_validation, training_matrix
+
+SEARCH_SPACE = {
+    'max_depth': [3, 4, 5, 6, 8],
+    'learning_rate': [0.03, 0.05, 0.1, 0.2, 0.3],
+    'n_estimators': [50, 100, 200, 400],
+    'subsample': [0.6, 0.8, 1.0],
+    'colsample_bytree': [0.5, 0.8, 1.0]
+}
+NUMERIC_COLUMNS = ['math_score', 'science_score', 'project_score', 'gender_encoded', 'socioeconomic_index']
+SEED = 42
+MIN_RUNG_ROWS = 200  # smallest training subset a rung may use
+
+# Set in each worker by _init_worker
+_X = None
+_y = None
+
+
+def load_dataset(model_kind, n, seed=SEED):
+    """
+    Rebuild the training script's cohort and split.
+
+    Returns:
+        (X_train, y_train, X_test, y_test, context) where context holds what
+        save_best needs. For the multimodal model X_train is the memory-mapped
+        feature store file of fused embeddings.
+    """
+    cohort = generate_cohort(n, seed=seed)
+    le = LabelEncoder().fit(cohort['gender'].cat.categories)
+    cohort['gender_encoded'] = cohort['gender'].cat.codes
+    numeric = cohort[NUMERIC_COLUMNS].values
+    y = cohort['stem_potential_label'].values
+
+    if model_kind == 'baseline':
+        X_train, X_test, y_train, y_test = train_test_split(
+            cohort[NUMERIC_COLUMNS], y, test_size=0.2, random_state=seed
+        )
+        return X_train.to_numpy(), y_train, X_test.to_numpy(), y_test, {'label_encoder': le}
+
+    import torch
+    from behavior_features import event_steps
+    from feature_store import load_or_encode
+    from multimodal_model import MultiModalTalentModel
+    from synthetic_cohort import generate_activity
+    from text_features import description_codes
+    from train_config import TRAIN_BEHAVIOR
+
+    codes = description_codes(cohort['math_score'], cohort['science_score'], cohort['project_score'])
+    X_num_train, X_num_test, X_text_train, X_text_test, y_train, y_test, idx_train, idx_test = train_test_split(
+        numeric, codes, y, np.arange(n), test_size=0.2, random_state=seed, stratify=y
+    )
+    beh_train = beh_test = None
+    if TRAIN_BEHAVIOR:
+        sequences = [event_steps(events) for events in generate_activity(cohort, seed=seed)]
+        beh_train = [sequences[i] for i in idx_train]
+        beh_test = [sequences[i] for i in idx_test]
+
+    # Same seed as train_multimodal_model.py, so the projector weights (and the
+    # feature store entries) are shared with the last training run
+    torch.manual_seed(seed)
+    model = MultiModalTalentModel(use_behavior=TRAIN_BEHAVIOR)
+    train_embeddings, hit = load_or_encode(model, X_text_train, X_num_train, "train", beh_data=beh_train)
+    test_embeddings, _ = load_or_encode(model, X_text_test, X_num_test, "test", beh_data=beh_test)
+    print(f"  → Training embeddings {'loaded from' if hit else 'written to'} feature store")
+    return train_embeddings, y_train, test_embeddings, y_test, {'label_encoder': le, 'model': model}
+
+
+def sample_trials(n_trials, seed=SEED):
+    """Distinct random configurations from SEARCH_SPACE"""
+    rng = np.random.default_rng(seed)
+    n_total = math.prod(len(values) for values in SEARCH_SPACE.values())
+    trials = []
+    seen = set()
+    while len(trials) < min(n_trials, n_total):
+        params = {name: values[rng.integers(len(values))] for name, values in SEARCH_SPACE.items()}
+        key = tuple(params.values())
+        if key not in seen:
+            seen.add(key)
+            trials.append(params)
+    return trials
+
+
+def rung_sizes(n_trials, n_rows, eta):
+    """
+    Training rows per rung, growing by eta up to the full training split.
+
+    One rung per halving of the trials, but never so many that the first rung
+    falls below MIN_RUNG_ROWS (the last rung then keeps more survivors).
+    """
+    n_rungs = 1 + int(math.log(max(n_trials, 1), eta) + 1e-9)
+    n_rungs = min(n_rungs, 1 + int(math.log(max(n_rows / MIN_RUNG_ROWS, 1), eta) + 1e-9))
+    return [int(n_rows / eta ** (n_rungs - 1 - i)) for i in range(n_rungs)]
+
+
+def _init_worker(X, y):
+    global _X, _y
+    # A path means the feature store file: memory-map it instead of copying
+    _X = np.load(X, mmap_mode='r') if isinstance(X, str) else X
+    _y = y
+
+
+def evaluate_trial(params, rows, folds, seed=SEED):
+    """
+    Cross-validate one configuration on a fixed random subset of rows of the
+    training split (the same subset, grown, on every rung).
+
+    Returns:
+        Dict with mean log loss and accuracy over folds, and wall-clock seconds
+    """
+    start = time.perf_counter()
+    # Sorted subset, so memory-mapped rows are read sequentially
+    subset = np.sort(np.random.default_rng(seed).permutation(len(_y))[:rows])
+    X, y = np.asarray(_X[subset]), _y[subset]
+
+    booster_params = {
+        **XGB_PARAMS,
+        'nthread': 1,  # one core per trial; the pool provides the parallelism
+        'max_depth': params['max_depth'],
+        'learning_rate': params['learning_rate'],
+        'subsample': params['subsample'],
+        'colsample_bytree': params['colsample_bytree']
+    }
+
+    losses, accuracies = [], []
+    for train_idx, val_idx in StratifiedKFold(folds, shuffle=True, random_state=seed).split(X, y):
+        dtrain = training_matrix(X[train_idx], y[train_idx])
+        booster = xgb.train(booster_params, dtrain, num_boost_round=params['n_estimators'])
+        proba = booster.predict(training_matrix(X[val_idx], y[val_idx], ref=dtrain))
+        losses.append(log_loss(y[val_idx], proba, labels=[0, 1]))
+        accuracies.append(accuracy_score(y[val_idx], proba > 0.5))
+
+    return {
+        'params': params,
+        'rows': rows,
+        'cv_logloss': float(np.mean(losses)),
+        'cv_logloss_std': float(np.std(losses)),
+        'cv_accuracy': float(np.mean(accuracies)),
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+
+def successive_halving(X_train, y_train, trials, folds, workers, eta):
+    """
+    Run every rung of the search.
+
+    Returns:
+        Leaderboard: every evaluated (trial, rung) result, best first
+    """
+    X_arg = X_train.filename if isinstance(X_train, np.memmap) else X_train
+    sizes = rung_sizes(len(trials), len(y_train), eta)
+    leaderboard = []
+    survivors = trials
+
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker, initargs=(X_arg, y_train)) as pool:
+        for rung, rows in enumerate(sizes):
+            results = list(pool.map(evaluate_trial, survivors, [rows] * len(survivors), [folds] * len(survivors)))
+            results.sort(key=lambda result: result['cv_logloss'])
+            for result in results:
+                result['rung'] = rung
+            leaderboard.extend(results)
+
+            print(f"  rung {rung}: {len(survivors)} trial(s) on {rows} rows, "
+                  f"best cv log loss {results[0]['cv_logloss']:.4f}")
+            if rung < len(sizes) - 1:
+                survivors = [result['params'] for result in results[:max(1, len(results) // eta)]]
+
+    leaderboard.sort(key=lambda result: (-result['rung'], result['cv_logloss']))
+    return leaderboard
+
+
+def save_best(model_kind, params, X_train, y_train, X_test, y_test, context, timer):
+    """
+    Retrain the winning configuration with early stopping and save it where
+    load_model() looks for it.
+
+    Returns:
+        Held-out test accuracy
+    """
+    fit_idx, val_idx, _, _ = split_validation(np.arange(len(y_train)), y_train, seed=SEED)
+    fit_idx, val_idx = np.sort(fit_idx), np.sort(val_idx)
+    booster_params = {name: params[name] for name in ('max_depth', 'learning_rate', 'subsample', 'colsample_bytree')}
+    classifier, info = fit_classifier(
+        X_train[fit_idx], y_train[fit_idx], X_train[val_idx], y_train[val_idx],
+        params=booster_params, max_rounds=params['n_estimators'], timer=timer
+    )
+    accuracy = accuracy_score(y_test, classifier.predict(X_test))
+
+    import joblib
+    if model_kind == 'baseline':
+        joblib.dump(classifier, "stem_talent_model.pkl")
+        joblib.dump(context['label_encoder'], "label_encoder.pkl")
+        print("✓ Saved: stem_talent_model.pkl, label_encoder.pkl")
+    else:
+        model = context['model']
+        model.set_xgb_model(classifier)
+        config = {
+            'text_embed_dim': 384,
+            'num_proj_dim': 64,
+            'numeric_input_dim': 5,
+            'behavior_dim': model.behavior_dim if model.use_behavior else 0,
+            'use_behavior': model.use_behavior,
+            'fused_dim': X_train.shape[1],
+            'accuracy': float(accuracy),
+            'n_features': X_train.shape[1],
+            'encoder_checksum': model.encoder_checksum(),
+            'best_iteration': info['best_iteration'],
+            'xgb_params': params
+        }
+        # Same artifacts as train_multimodal_model.py
+        joblib.dump(classifier, "multimodal_stem_model.pkl")
+        joblib.dump(context['label_encoder'], "label_encoder.pkl")
+        joblib.dump(config, "model_config.pkl")
+        checksum = model.save_bundle("multimodal_bundle.pkl", context['label_encoder'], config)
+        print(f"✓ Saved: multimodal_bundle.pkl (sha256 {checksum[:12]})")
+        print("⚠️  Re-run export_encoders.py before serving with the onnx backend")
+
+    print(f"  → Best iteration: {info['best_iteration']} of {info['rounds']} rounds")
+    return accuracy
+
+
+def print_leaderboard(leaderboard, top=10):
+    print(f"\n{'rung':>4} {'rows':>7} {'logloss':>8} {'±':>6} {'acc':>6}  params")
+    for result in leaderboard[:top]:
+        print(f"{result['rung']:>4} {result['rows']:>7} {result['cv_logloss']:>8.4f} "
+              f"{result['cv_logloss_std']:>6.4f} {result['cv_accuracy']:>6.3f}  {result['params']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', choices=['baseline', 'multimodal'], default='baseline')
+    parser.add_argument('--rows', type=int, default=int(os.environ.get('ML_TRAIN_ROWS', 2000)))
+    parser.add_argument('--trials', type=int, default=27)
+    parser.add_argument('--folds', type=int, default=3)
+    parser.add_argument('--eta', type=int, default=3, help='halving factor between rungs')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--leaderboard', default='tune_leaderboard.json')
+    parser.add_argument('--no-save', action='store_true', help='only write the leaderboard')
+    args = parser.parse_args()
+
+    timer = StageTimer()
+    print(f"Tuning the {args.model} XGBoost head: {args.trials} trials, {args.folds}-fold CV, {args.workers} worker(s)")
+    with timer('load_data'):
+        X_train, y_train, X_test, y_test, context = load_dataset(args.model, args.rows)
+
+    with timer('search'):
+        leaderboard = successive_halving(
+            X_train, y_train, sample_trials(args.trials), args.folds, args.workers, args.eta
+        )
+    print_leaderboard(leaderboard)
+
+    best = leaderboard[0]
+    with open(args.leaderboard, 'w') as f:
+        json.dump({'model': args.model, 'folds': args.folds, 'eta': args.eta, 'leaderboard': leaderboard}, f, indent=2)
+    print(f"\nLeaderboard written to {args.leaderboard}")
+
+    if not args.no_save:
+        with timer('retrain_best'):
+            accuracy = save_best(args.model, best['params'], X_train, y_train, X_test, y_test, context, timer)
+        print(f"✅ Best configuration {best['params']}: held-out accuracy {accuracy:.4f}")
+    timer.summary()
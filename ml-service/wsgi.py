@@ -0,0 +1,65 @@
+"""
+Production entry point for the ML service.
+
+Serve with gunicorn (see gunicorn.conf.py):
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+ML_SERVICE_APP picks the model: "baseline" (app.py, default),
+"multimodal" (app_multimodal.py), or "router" (app_router.py, both models with
+traffic splitting and shadow scoring). With gunicorn's preload_app the model is
+loaded once here in the master process and shared copy-on-write by every
+forked worker.
+"""
+import os
+import sys
+from service_utils import limit_threads, set_thread_limit
+
+SERVICE_APP = os.environ.get('ML_SERVICE_APP', 'baseline')
+
+if SERVICE_APP == 'multimodal':
+    import app_multimodal as service
+elif SERVICE_APP == 'baseline':
+    import app as service
+elif SERVICE_APP == 'router':
+    import app_router as service
+else:
+    raise ValueError(f"Unknown ML_SERVICE_APP {SERVICE_APP!r}, expected 'baseline', 'multimodal' or 'router'")
+
+if getattr(service, 'FAST_START', False):
+    # Loader threads don't survive fork, so fast start is only used without preload
+    service.start_background_load()
+else:
+    service.load_model()
+
+app = service.app
+
+
+def xgb_models():
+    """The XGBoost models currently served by this process"""
+    models = []
+    # The router imports both services
+    multimodal = sys.modules.get('app_multimodal')
+    if multimodal is not None and multimodal.multimodal_model is not None:
+        models.append(multimodal.multimodal_model.xgb_model)
+    baseline = sys.modules.get('app')
+    # The compiled baseline predictor is plain single-threaded NumPy
+    if baseline is not None and hasattr(baseline.model, 'get_booster'):
+        models.append(baseline.model)
+    return models
+
+
+def pin_threads(n_threads):
+    """
+    Cap the CPU threads one worker may use.
+
+    Called in every worker after fork: torch intra-op threads and XGBoost
+    nthread are both set to n_threads, so workers * n_threads stays within
+    the cores available. Models built later by a reload get the same limit
+    (see service_utils.limit_threads).
+    """
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(n_threads)
+    set_thread_limit(n_threads)
+    for xgb_model in xgb_models():
+        limit_threads(xgb_model)